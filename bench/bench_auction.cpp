@@ -0,0 +1,101 @@
+// Continuous matching vs frequent batch auctions on the same order flow.
+//
+// For each cross rate, one stream of generated flow (Hawkes arrivals, so it
+// comes in bursts) is applied to a continuous book and to auction books with
+// several intervals, all on a virtual clock. The table gives engine time per
+// order, the trades and quantity executed, and what is left resting.
+//
+// Build and run:
+//   g++ -O2 -std=c++17 -DORDERBOOK_NO_STATS -Iinclude bench/bench_auction.cpp src/order.cpp src/orderbook.cpp src/ingest.cpp src/journal.cpp src/checkpoint.cpp src/manager.cpp -pthread -o build/bench_auction
+//   ./build/bench_auction [events]
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <vector>
+#include "order.h"
+#include "orderbook.h"
+#include "ingest.h"
+
+using namespace std;
+using bench_clock = chrono::steady_clock;
+
+namespace {
+    const double kTick = 0.01;
+    const double kBasePrice = 100.0;
+    const size_t kChunk = 4096;
+
+    vector<FlowEvent> makeFlow(size_t n, double cross) {
+        FlowGenerator gen(42);
+        FlowConfig cfg = gen.config();
+        cfg.tick_size = kTick;
+        cfg.arrival = ArrivalModel::Hawkes;
+        cfg.rate = 100000.0;
+        cfg.hawkes_alpha = 0.8;
+        cfg.hawkes_beta = 1.0;
+        cfg.cross_prob = cross;
+        cfg.cancel_prob = 0.1;
+        gen.setConfig(cfg);
+        vector<FlowEvent> flow(n);
+        int64_t nextID = 1;
+        gen.generate(flow.data(), n, nextID, kBasePrice, kTick, 0);
+        return flow;
+    }
+
+    struct Run {
+        double ns_per_order;
+        int64_t trades;
+        int64_t volume;
+        int64_t resting;
+    };
+
+    // interval 0 = continuous matching.
+    Run run(const vector<FlowEvent> &flow, int64_t interval) {
+        OrderBook book(kTick);
+        book.clock.mode = ClockMode::Virtual;
+        if (interval > 0) setMatchMode(book, MatchMode::Auction, interval);
+        vector<FlowEvent> chunk(kChunk);
+        auto t0 = bench_clock::now();
+        for (size_t i = 0; i < flow.size(); i += kChunk) {
+            size_t n = min(kChunk, flow.size() - i);
+            copy(flow.begin() + i, flow.begin() + i + n, chunk.begin());
+            applyGenerated(book, chunk.data(), n);
+        }
+        // Clears what the last interval collected.
+        if (interval > 0) setMatchMode(book, MatchMode::Continuous, 0);
+        auto t1 = bench_clock::now();
+
+        Run r{};
+        r.ns_per_order = chrono::duration<double, nano>(t1 - t0).count() / flow.size();
+        r.trades = static_cast<int64_t>(book.trades.size());
+        OrderBook::Trade t;
+        for (size_t i = 0; i < book.trades.size(); ++i) {
+            if (book.trades.read(i, t)) r.volume += t.quantity;
+        }
+        r.resting = static_cast<int64_t>(book.index.size());
+        return r;
+    }
+}
+
+int main(int argc, char **argv) {
+    size_t events = argc > 1 ? strtoull(argv[1], nullptr, 10) : 1000000;
+    const double crosses[] = {0.15, 0.5, 0.9};
+    const int64_t intervals[] = {0, 1000000, 10000000, 100000000};   // ns
+
+    printf("%6s %14s %10s %10s %12s %10s\n", "cross", "mode", "ns/order", "trades", "quantity", "resting");
+    for (double cross : crosses) {
+        vector<FlowEvent> flow = makeFlow(events, cross);
+        for (int64_t interval : intervals) {
+            Run r = run(flow, interval);
+            char mode[32];
+            if (interval == 0) {
+                snprintf(mode, sizeof(mode), "continuous");
+            } else {
+                snprintf(mode, sizeof(mode), "auction/%lldms", static_cast<long long>(interval / 1000000));
+            }
+            printf("%6.2f %14s %10.1f %10lld %12lld %10lld\n", cross, mode, r.ns_per_order,
+                   static_cast<long long>(r.trades), static_cast<long long>(r.volume),
+                   static_cast<long long>(r.resting));
+        }
+    }
+    return 0;
+}
@@ -0,0 +1,212 @@
+"""Cost of the Python side of the engine: ctypes round trips and snapshot exports.
+
+- Round trips: per-call latency (p50/p99/p999) of the calls the app makes
+  on every tick, from a trivial getter up to order entry, through ctypes
+  and through the ``_orderbook`` extension.
+- Snapshots: time to export and parse the trade log and the resting book,
+  CSV snapshot versus columnar export, as the history grows.
+
+Prints a table and writes the results as JSON (compare two runs with
+bench/compare.py).
+
+Usage::
+
+    python bench/bench_bindings.py [out.json]
+"""
+import ctypes
+from ctypes import POINTER, c_int64
+import io
+import json
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from engine import (  # noqa: E402
+    lib, native, native_book, order, OrderBook, TopOfBook, FlowConfig, BOOK_TICK_SIZE, export_book, top_of_book,
+)
+
+CALLS = 200_000
+HISTORY_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+REPEATS = 5
+
+
+def _summary(name, ns, **extra):
+    ns = np.asarray(ns, dtype=np.float64)
+    return {
+        "name": name,
+        **extra,
+        "ops": int(ns.size),
+        "ops_per_sec": float(ns.size / (ns.sum() * 1e-9)),
+        "p50_ns": float(np.percentile(ns, 50)),
+        "p99_ns": float(np.percentile(ns, 99)),
+        "p999_ns": float(np.percentile(ns, 99.9)),
+    }
+
+
+def _per_call(fn, calls=CALLS):
+    clock = time.perf_counter_ns
+    out = np.empty(calls, np.int64)
+    for i in range(calls):
+        t0 = clock()
+        fn()
+        out[i] = clock() - t0
+    return out
+
+
+def _timer_overhead():
+    clock = time.perf_counter_ns
+    samples = [-(clock() - clock()) for _ in range(100_000)]
+    return float(np.median(samples))
+
+
+def round_trips():
+    book = lib.create_book(BOOK_TICK_SIZE)
+    results = []
+    try:
+        metrics = TopOfBook()
+        results.append(_summary("ctypes/get_tick_size", _per_call(lambda: lib.get_tick_size(book))))
+        results.append(_summary("ctypes/get_trade_count", _per_call(lambda: lib.get_trade_count(book))))
+        results.append(_summary(
+            "ctypes/get_top_of_book_metrics",
+            _per_call(lambda: lib.get_top_of_book_metrics(book, ctypes.byref(metrics))),
+        ))
+        results.append(_summary("python/top_of_book", _per_call(lambda: top_of_book(book))))
+
+        # Passive limit orders alternating around 100.00, then cancelled.
+        o = order()
+        ids = iter(range(1, CALLS + 1))
+
+        def add():
+            i = next(ids)
+            lib.make_user_order(i, b"buy" if i % 2 else b"sell", 10,
+                                10000 - 1 - i % 500 if i % 2 else 10000 + 1 + i % 500, b"limit", o)
+            lib.add_order(book, o)
+
+        results.append(_summary("ctypes/make_user_order+add_order", _per_call(add)))
+        ids = iter(range(1, CALLS + 1))
+        results.append(_summary("ctypes/cancel_order", _per_call(lambda: lib.cancel_order(book, next(ids)))))
+        next_id = c_int64(CALLS + 1)
+        results.append(_summary(
+            "ctypes/run_batch(1)",
+            _per_call(lambda: lib.run_batch(book, 1, 100.0, ctypes.byref(next_id)), CALLS // 4),
+        ))
+
+        if native is not None:
+            fast = native_book(book)
+            results.append(_summary("native/trade_count", _per_call(fast.trade_count)))
+            results.append(_summary("native/top_of_book", _per_call(fast.top_of_book)))
+            base = next_id.value
+            ids = iter(range(base, base + CALLS))
+
+            def native_add():
+                i = next(ids)
+                fast.add_order(i, i % 2, 10, 10000 - 1 - i % 500 if i % 2 == 0 else 10000 + 1 + i % 500, 0)
+
+            results.append(_summary("native/add_order", _per_call(native_add)))
+            ids = iter(range(base, base + CALLS))
+            results.append(_summary("native/cancel_order", _per_call(lambda: fast.cancel_order(next(ids)))))
+            nid = [base + CALLS]
+
+            def native_batch():
+                nid[0] = fast.run_batch(1, 100.0, nid[0])
+
+            results.append(_summary("native/run_batch(1)", _per_call(native_batch, CALLS // 4)))
+    finally:
+        lib.destroy_book(book)
+    return results
+
+
+def _best_ms(fn):
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1e3
+
+
+def _trades_columns(book, n):
+    start = lib.get_history_start(book, 0)
+    cols = [np.empty(n, t) for t in (np.int64, np.int64, np.int64, np.int64, np.int32, np.uint8, np.int64)]
+    lib.export_trades_columns(book, start, n, *cols)
+    return cols
+
+
+def snapshots():
+    book = lib.create_book(BOOK_TICK_SIZE)
+    book_ptr = ctypes.cast(book, POINTER(OrderBook))
+    cfg = FlowConfig()
+    lib.get_flow_config(book_ptr, ctypes.byref(cfg))
+    cfg.cancel_prob = 0.0
+    cfg.modify_prob = 0.0
+    cfg.expiry_seconds = 0
+    lib.set_flow_config(book_ptr, ctypes.byref(cfg))
+    lib.seed_random(book_ptr, 1)
+    next_id = c_int64(1)
+    results = []
+    try:
+        for size in HISTORY_SIZES:
+            while lib.get_trade_count(book_ptr) < size:
+                lib.run_batch(book_ptr, 1_000, 100.0, ctypes.byref(next_id))
+            trades = lib.get_trade_count(book_ptr)
+            resting = lib.get_resting_count(book_ptr)
+            extra = {"trades": trades, "resting": resting}
+
+            csv_text = []
+            export_ms = _best_ms(lambda: csv_text.append(lib.get_trades_snapshot(book_ptr)))
+            parse_ms = _best_ms(lambda: pd.read_csv(io.StringIO(csv_text[-1].decode())))
+            results.append({"name": f"snapshot/trades_csv/history={size}", **extra,
+                            "export_ms": export_ms, "parse_ms": parse_ms})
+
+            cols = []
+            export_ms = _best_ms(lambda: cols.append(_trades_columns(book_ptr, trades)))
+            parse_ms = _best_ms(lambda: pd.DataFrame(dict(zip("abcdefg", cols[-1]))))
+            results.append({"name": f"snapshot/trades_columns/history={size}", **extra,
+                            "export_ms": export_ms, "parse_ms": parse_ms})
+
+            csv_text = []
+            export_ms = _best_ms(lambda: csv_text.append(lib.get_orderbook_snapshot(book_ptr)))
+            parse_ms = _best_ms(lambda: pd.read_csv(io.StringIO(csv_text[-1].decode())))
+            results.append({"name": f"snapshot/book_csv/history={size}", **extra,
+                            "export_ms": export_ms, "parse_ms": parse_ms})
+
+            # export_book exports and builds the DataFrames in one call.
+            results.append({"name": f"snapshot/book_columns/history={size}", **extra,
+                            "export_ms": _best_ms(lambda: export_book(book)), "parse_ms": 0.0})
+    finally:
+        lib.destroy_book(book)
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = Path(argv[0] if argv else "build/bench_bindings.json")
+    report = {
+        "suite": "bindings",
+        "timestamp": int(time.time()),
+        "python": sys.version.split()[0],
+        "timer_overhead_ns": _timer_overhead(),
+        "results": round_trips() + snapshots(),
+    }
+
+    print(f"{'benchmark':48} {'ops/s':>12} {'p50 ns':>9} {'p99 ns':>9} {'p999 ns':>9}")
+    for r in report["results"]:
+        if "ops" in r:
+            print(f"{r['name']:48} {r['ops_per_sec']:12.0f} {r['p50_ns']:9.0f} {r['p99_ns']:9.0f} {r['p999_ns']:9.0f}")
+    print(f"\n{'benchmark':48} {'trades':>9} {'resting':>9} {'export ms':>10} {'parse ms':>10}")
+    for r in report["results"]:
+        if "export_ms" in r:
+            print(f"{r['name']:48} {r['trades']:9d} {r['resting']:9d} {r['export_ms']:10.2f} {r['parse_ms']:10.2f}")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    print(f"wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+// Multi-symbol throughput: routes generated flow for many symbols through a
+// BookManager and reports commands per second for 1, 2, 4, ... workers up to
+// the core count. Each symbol gets the same number of fixed-size batches
+// from one producer thread per worker.
+//
+// Build and run:
+//   g++ -O2 -std=c++17 -DORDERBOOK_NO_STATS -Iinclude bench/bench_manager.cpp src/order.cpp src/orderbook.cpp src/ingest.cpp src/journal.cpp src/checkpoint.cpp src/manager.cpp -pthread -o build/bench_manager
+//   ./build/bench_manager [symbols] [events per symbol]
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <thread>
+#include <vector>
+#include "order.h"
+#include "orderbook.h"
+#include "ingest.h"
+#include "manager.h"
+
+using namespace std;
+using bench_clock = chrono::steady_clock;
+
+namespace {
+    const int64_t kBatch = 100;
+
+    double run(size_t symbols, size_t workers, int64_t perSymbol, ManagerStats &stats) {
+        BookManager manager;
+        manager.workers = workers;
+        for (size_t s = 0; s < symbols; ++s) {
+            addSymbol(manager, 0.0001);
+            manager.books[s]->generator.seed(s + 1);
+        }
+        startManager(manager);
+
+        Command cmd{};
+        cmd.kind = CommandKind::Batch;
+        cmd.count = kBatch;
+        cmd.base_price = 100.0;
+        auto start = bench_clock::now();
+        vector<thread> producers;
+        for (size_t p = 0; p < workers; ++p) {
+            producers.emplace_back([&, p] {
+                // Producer p feeds the symbols of shard p.
+                for (int64_t sent = 0; sent < perSymbol; sent += kBatch) {
+                    for (size_t s = p; s < symbols; s += workers) {
+                        while (!routeCommand(manager, static_cast<int32_t>(s), cmd)) this_thread::yield();
+                    }
+                }
+            });
+        }
+        for (auto &t : producers) t.join();
+        stopManager(manager);
+        double seconds = chrono::duration<double>(bench_clock::now() - start).count();
+        managerStats(manager, stats);
+        return seconds;
+    }
+}
+
+int main(int argc, char **argv) {
+    size_t symbols = argc > 1 ? strtoull(argv[1], nullptr, 10) : 256;
+    int64_t perSymbol = argc > 2 ? strtoll(argv[2], nullptr, 10) : 20000;
+    size_t cores = max<size_t>(1, thread::hardware_concurrency());
+
+    printf("symbols=%zu events/symbol=%lld cores=%zu\n", symbols, (long long)perSymbol, cores);
+    printf("%8s %10s %14s %10s %12s\n", "workers", "seconds", "events/s", "speedup", "resting");
+    double base = 0.0;
+    for (size_t workers = 1; workers <= cores; workers *= 2) {
+        ManagerStats stats;
+        double seconds = run(symbols, workers, perSymbol, stats);
+        double rate = static_cast<double>(symbols) * perSymbol / seconds;
+        if (workers == 1) base = rate;
+        printf("%8zu %10.3f %14.0f %9.2fx %12lld\n", workers, seconds, rate, rate / base,
+               (long long)stats.resting);
+    }
+    return 0;
+}
@@ -0,0 +1,81 @@
+// Insert/match cost of the matching engine as a function of resting depth.
+//
+// For each depth the book is pre-filled with that many resting limit orders
+// spread over 1000 bid and 1000 ask levels. Each measured round then submits
+// one passive limit order (insert) and one market order that consumes exactly
+// one resting order (match), so the depth stays constant while timing.
+//
+// Build and run:
+//   g++ -O2 -std=c++17 -DORDERBOOK_NO_STATS -Iinclude bench/bench_orderbook.cpp src/order.cpp src/orderbook.cpp src/ingest.cpp src/journal.cpp src/checkpoint.cpp src/manager.cpp -pthread -o build/bench_orderbook
+//   ./build/bench_orderbook
+#include <chrono>
+#include <cstdio>
+#include <random>
+#include "order.h"
+#include "orderbook.h"
+
+using namespace std;
+using bench_clock = chrono::steady_clock;
+
+namespace {
+    const int kLevels = 1000;
+    const int kQty = 10;
+    const int kRounds = 200000;
+
+    order makeOrder(int64_t id, bool buy, int64_t price, bool market) {
+        order o{};
+        o.id = id;
+        o.side = buy ? Side::Buy : Side::Sell;
+        o.quantity = kQty;
+        o.price = price;
+        o.time = 0;
+        o.expiry = 0;
+        o.type = market ? OrderType::Market : OrderType::Limit;
+        o.status = OrderStatus::Open;
+        return o;
+    }
+
+    // Tick prices around 100.00 with a 0.01 tick.
+    int64_t passivePrice(mt19937 &rng, bool buy) {
+        int level = uniform_int_distribution<int>(1, kLevels)(rng);
+        return buy ? 10000 - level : 10000 + level;
+    }
+}
+
+int main() {
+    const int depths[] = {1000, 10000, 100000, 1000000};
+    printf("%10s %14s %14s\n", "resting", "insert ns/op", "match ns/op");
+
+    for (int depth : depths) {
+        OrderBook book(0.01);
+        mt19937 rng(42);
+        int64_t nextID = 1;
+
+        for (int i = 0; i < depth; ++i) {
+            bool buy = (i % 2) == 0;
+            order o = makeOrder(nextID++, buy, passivePrice(rng, buy), false);
+            addOrder(book, o);
+        }
+
+        double insert_ns = 0.0;
+        double match_ns = 0.0;
+        for (int i = 0; i < kRounds; ++i) {
+            bool buy = (i % 2) == 0;
+
+            order passive = makeOrder(nextID++, buy, passivePrice(rng, buy), false);
+            auto t0 = bench_clock::now();
+            addOrder(book, passive);
+            auto t1 = bench_clock::now();
+
+            order aggressive = makeOrder(nextID++, !buy, 0, true);
+            addOrder(book, aggressive);
+            auto t2 = bench_clock::now();
+
+            insert_ns += chrono::duration<double, nano>(t1 - t0).count();
+            match_ns  += chrono::duration<double, nano>(t2 - t1).count();
+        }
+
+        printf("%10d %14.1f %14.1f\n", depth, insert_ns / kRounds, match_ns / kRounds);
+    }
+    return 0;
+}
@@ -0,0 +1,230 @@
+// Insert, match, cancel and expire cost of the matching engine across
+// resting depths and cross rates, with per-operation latency percentiles.
+// Prints a table and writes the results as JSON for regression tracking
+// (bench/compare.py diffs two such files).
+//
+// Every scenario pre-fills the book with `depth` resting limit orders spread
+// over 1000 bid and 1000 ask levels, then times single engine calls. An
+// untimed companion call after each one keeps the depth constant:
+//   insert/match  an arriving limit order crosses (consumes exactly one
+//                 resting order) with probability `cross`, otherwise it
+//                 rests; a market order or a passive order then restores
+//                 the depth
+//   cancel        cancels a random resting order, then adds a new one
+//   expire        advanceTime expiring exactly one order per call
+// Latencies include one steady_clock read (timer_overhead_ns in the JSON).
+//
+// Build and run:
+//   g++ -O2 -std=c++17 -DORDERBOOK_NO_STATS -Iinclude bench/bench_suite.cpp src/order.cpp src/orderbook.cpp src/ingest.cpp src/journal.cpp src/checkpoint.cpp src/manager.cpp -pthread -o build/bench_suite
+//   ./build/bench_suite [out.json] [rounds]
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <ctime>
+#include <random>
+#include <string>
+#include <vector>
+#include "order.h"
+#include "orderbook.h"
+
+using namespace std;
+using bench_clock = chrono::steady_clock;
+
+namespace {
+    const int kLevels = 1000;
+    const int kQty = 10;
+
+    struct Result {
+        string op;
+        int depth;
+        double cross;
+        size_t ops;
+        double seconds;
+        double p50, p99, p999, max;
+    };
+
+    order makeOrder(int64_t id, bool buy, int64_t price, OrderType type, int64_t expiry = 0) {
+        order o{};
+        o.id = id;
+        o.side = buy ? Side::Buy : Side::Sell;
+        o.quantity = kQty;
+        o.price = price;
+        o.expiry = expiry;
+        o.type = type;
+        o.status = OrderStatus::Open;
+        return o;
+    }
+
+    // Tick prices around 100.00 with a 0.01 tick.
+    int64_t passivePrice(mt19937 &rng, bool buy) {
+        int level = uniform_int_distribution<int>(1, kLevels)(rng);
+        return buy ? 10000 - level : 10000 + level;
+    }
+
+    double percentile(vector<float> &ns, double q) {
+        size_t k = min(ns.size() - 1, static_cast<size_t>(q * ns.size()));
+        nth_element(ns.begin(), ns.begin() + k, ns.end());
+        return ns[k];
+    }
+
+    Result summarize(const string &op, int depth, double cross, vector<float> &ns) {
+        Result r{op, depth, cross, ns.size(), 0.0, 0.0, 0.0, 0.0, 0.0};
+        for (float v : ns) r.seconds += v * 1e-9;
+        r.max = ns.empty() ? 0.0 : *max_element(ns.begin(), ns.end());
+        if (!ns.empty()) {
+            r.p50 = percentile(ns, 0.50);
+            r.p99 = percentile(ns, 0.99);
+            r.p999 = percentile(ns, 0.999);
+        }
+        return r;
+    }
+
+    template <class F>
+    float timed(F &&f) {
+        auto t0 = bench_clock::now();
+        f();
+        return chrono::duration<float, nano>(bench_clock::now() - t0).count();
+    }
+
+    vector<int64_t> fill(OrderBook &book, mt19937 &rng, int depth, int64_t &nextID) {
+        vector<int64_t> live;
+        live.reserve(depth);
+        for (int i = 0; i < depth; ++i) {
+            bool buy = (i % 2) == 0;
+            order o = makeOrder(nextID++, buy, passivePrice(rng, buy), OrderType::Limit);
+            addOrder(book, o);
+            live.push_back(o.id);
+        }
+        return live;
+    }
+
+    void insertMatch(int depth, double cross, int rounds, vector<Result> &out) {
+        OrderBook book(0.01);
+        mt19937 rng(42);
+        bernoulli_distribution crosses(cross);
+        int64_t nextID = 1;
+        fill(book, rng, depth, nextID);
+
+        vector<float> insert_ns, match_ns, mixed_ns;
+        insert_ns.reserve(rounds);
+        match_ns.reserve(rounds);
+        mixed_ns.reserve(rounds);
+        for (int i = 0; i < rounds; ++i) {
+            bool buy = (i % 2) == 0;
+            if (crosses(rng)) {
+                int64_t price = buy ? book.sell.begin()->first : book.buy.begin()->first;
+                order taker = makeOrder(nextID++, buy, price, OrderType::Limit);
+                float ns = timed([&] { addOrder(book, taker); });
+                match_ns.push_back(ns);
+                mixed_ns.push_back(ns);
+                order refill = makeOrder(nextID++, !buy, passivePrice(rng, !buy), OrderType::Limit);
+                addOrder(book, refill);
+            } else {
+                order passive = makeOrder(nextID++, buy, passivePrice(rng, buy), OrderType::Limit);
+                float ns = timed([&] { addOrder(book, passive); });
+                insert_ns.push_back(ns);
+                mixed_ns.push_back(ns);
+                order taker = makeOrder(nextID++, !buy, 0, OrderType::Market);
+                addOrder(book, taker);
+            }
+        }
+        out.push_back(summarize("insert", depth, cross, insert_ns));
+        if (!match_ns.empty()) out.push_back(summarize("match", depth, cross, match_ns));
+        if (cross > 0.0) out.push_back(summarize("mixed", depth, cross, mixed_ns));
+    }
+
+    void cancel(int depth, int rounds, vector<Result> &out) {
+        OrderBook book(0.01);
+        mt19937 rng(42);
+        int64_t nextID = 1;
+        vector<int64_t> live = fill(book, rng, depth, nextID);
+
+        vector<float> ns;
+        ns.reserve(rounds);
+        for (int i = 0; i < rounds; ++i) {
+            size_t k = uniform_int_distribution<size_t>(0, live.size() - 1)(rng);
+            int64_t id = live[k];
+            ns.push_back(timed([&] { cancelOrder(book, id); }));
+            bool buy = (i % 2) == 0;
+            order o = makeOrder(nextID++, buy, passivePrice(rng, buy), OrderType::Limit);
+            addOrder(book, o);
+            live[k] = o.id;
+        }
+        out.push_back(summarize("cancel", depth, 0.0, ns));
+    }
+
+    void expire(int depth, int rounds, vector<Result> &out) {
+        // Order i expires at second i + 1, so each one-second advance expires
+        // exactly one order; its replacement expires `depth` seconds later.
+        OrderBook book(0.01);
+        mt19937 rng(42);
+        int64_t nextID = 1;
+        for (int i = 0; i < depth; ++i) {
+            bool buy = (i % 2) == 0;
+            order o = makeOrder(nextID++, buy, passivePrice(rng, buy), OrderType::Limit, i + 1);
+            addOrder(book, o);
+        }
+
+        vector<float> ns;
+        ns.reserve(rounds);
+        for (int t = 1; t <= rounds; ++t) {
+            ns.push_back(timed([&] { advanceTime(book, t); }));
+            book.now = t;
+            bool buy = (t % 2) == 0;
+            order o = makeOrder(nextID++, buy, passivePrice(rng, buy), OrderType::Limit, t + depth);
+            addOrder(book, o);
+        }
+        out.push_back(summarize("expire", depth, 0.0, ns));
+    }
+
+    double timerOverhead() {
+        const int n = 1000000;
+        auto t0 = bench_clock::now();
+        for (int i = 0; i < n; ++i) bench_clock::now();
+        return chrono::duration<double, nano>(bench_clock::now() - t0).count() / n;
+    }
+}
+
+int main(int argc, char **argv) {
+    string path = argc > 1 ? argv[1] : "build/bench_suite.json";
+    int rounds = argc > 2 ? atoi(argv[2]) : 200000;
+    const int depths[] = {1000, 10000, 100000};
+    const double crosses[] = {0.0, 0.1, 0.5};
+
+    vector<Result> results;
+    for (int depth : depths) {
+        for (double cross : crosses) insertMatch(depth, cross, rounds, results);
+        cancel(depth, rounds, results);
+        expire(depth, rounds, results);
+    }
+    double overhead = timerOverhead();
+
+    printf("%-7s %8s %6s %14s %9s %9s %9s\n", "op", "resting", "cross", "ops/s", "p50 ns", "p99 ns", "p999 ns");
+    for (const Result &r : results) {
+        printf("%-7s %8d %6.2f %14.0f %9.0f %9.0f %9.0f\n", r.op.c_str(), r.depth, r.cross,
+               r.ops / r.seconds, r.p50, r.p99, r.p999);
+    }
+
+    FILE *f = fopen(path.c_str(), "w");
+    if (!f) {
+        perror(path.c_str());
+        return 1;
+    }
+    fprintf(f, "{\n  \"suite\": \"native\",\n  \"timestamp\": %lld,\n  \"rounds\": %d,\n",
+            static_cast<long long>(time(nullptr)), rounds);
+    fprintf(f, "  \"timer_overhead_ns\": %.1f,\n  \"results\": [\n", overhead);
+    for (size_t i = 0; i < results.size(); ++i) {
+        const Result &r = results[i];
+        fprintf(f, "    {\"name\": \"%s/depth=%d/cross=%.2f\", \"op\": \"%s\", \"depth\": %d, \"cross\": %.2f, "
+                   "\"ops\": %zu, \"ops_per_sec\": %.1f, \"p50_ns\": %.1f, \"p99_ns\": %.1f, "
+                   "\"p999_ns\": %.1f, \"max_ns\": %.1f}%s\n",
+                r.op.c_str(), r.depth, r.cross, r.op.c_str(), r.depth, r.cross, r.ops,
+                r.seconds > 0 ? r.ops / r.seconds : 0.0, r.p50, r.p99, r.p999, r.max,
+                i + 1 < results.size() ? "," : "");
+    }
+    fprintf(f, "  ]\n}\n");
+    fclose(f);
+    printf("wrote %s\n", path.c_str());
+    return 0;
+}
@@ -0,0 +1,64 @@
+"""Compares two benchmark JSON files (bench_suite or bench_bindings output).
+
+Matches results by name and prints the relative change of every metric,
+marking changes for the worse beyond the threshold. Exits with status 1 if
+there are any, so it can gate CI.
+
+Usage::
+
+    python bench/compare.py baseline.json current.json [--threshold 10]
+"""
+import argparse
+import json
+import sys
+
+# Metric -> True when larger is better.
+METRICS = {
+    "ops_per_sec": True,
+    "p50_ns": False,
+    "p99_ns": False,
+    "p999_ns": False,
+    "export_ms": False,
+    "parse_ms": False,
+}
+
+
+def compare(baseline, current, threshold):
+    """Returns (rows, regressions) for two loaded reports; each row is
+    (name, metric, old, new, change %, regressed)."""
+    old = {r["name"]: r for r in baseline["results"]}
+    rows = []
+    for r in current["results"]:
+        base = old.get(r["name"])
+        if base is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in r or metric not in base or not base[metric]:
+                continue
+            change = (r[metric] - base[metric]) / base[metric] * 100.0
+            worse = -change if higher_is_better else change
+            rows.append((r["name"], metric, base[metric], r[metric], change, worse > threshold))
+    return rows, sum(1 for row in rows if row[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    args = parser.parse_args(argv)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows, regressions = compare(baseline, current, args.threshold)
+    for name, metric, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:48} {metric:12} {old:14.1f} {new:14.1f} {change:+8.1f}%{flag}")
+    print(f"{len(rows)} metrics compared, {regressions} regressions over {args.threshold:g}%")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
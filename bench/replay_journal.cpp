@@ -0,0 +1,44 @@
+// Replays a recorded command journal into a fresh book at native speed and
+// reports the matcher's throughput on that flow. Record a journal with
+// open_journal (the Streamlit app writes one per session) and pass its path.
+//
+// Build and run:
+//   g++ -O2 -std=c++17 -Iinclude bench/replay_journal.cpp src/order.cpp src/orderbook.cpp src/ingest.cpp src/journal.cpp src/checkpoint.cpp src/manager.cpp -pthread -o build/replay_journal
+//   ./build/replay_journal path/to/journal.obj
+#include <chrono>
+#include <cstdio>
+#include "order.h"
+#include "orderbook.h"
+#include "journal.h"
+
+using namespace std;
+using bench_clock = chrono::steady_clock;
+
+int main(int argc, char **argv) {
+    if (argc < 2) {
+        fprintf(stderr, "usage: %s journal\n", argv[0]);
+        return 2;
+    }
+    JournalHeader h;
+    if (!readJournalHeader(argv[1], h)) {
+        fprintf(stderr, "%s is not a command journal\n", argv[1]);
+        return 1;
+    }
+
+    OrderBook book(h.tick_size);
+    auto start = bench_clock::now();
+    long long applied = replayJournal(book, argv[1]);
+    double seconds = chrono::duration<double>(bench_clock::now() - start).count();
+    if (applied < 0) {
+        fprintf(stderr, "replay of %s failed\n", argv[1]);
+        return 1;
+    }
+
+    printf("commands   %lld\n", applied);
+    printf("seconds    %.3f\n", seconds);
+    printf("ns/command %.1f\n", applied > 0 ? seconds * 1e9 / applied : 0.0);
+    printf("events     %zu\n", book.events.size());
+    printf("trades     %zu\n", book.trades.size());
+    printf("resting    %zu\n", book.index.size());
+    return 0;
+}
@@ -0,0 +1,65 @@
+// Long-running soak through the C ABI: generate_random_order + add_order in a
+// loop, cancelling each order once it is `kWindow` orders old so the resting
+// book stays bounded, and printing resident set size as it goes. History
+// retention is capped at kRetain records per log (older ones are dropped, or
+// spilled to disk if a directory is given), so any growth that remains is a
+// leak in the order path rather than retained history.
+//
+// Build and run (Linux):
+//   g++ -O2 -std=c++17 -Iinclude bench/soak_rss.cpp src/order.cpp src/orderbook.cpp src/ingest.cpp src/journal.cpp src/checkpoint.cpp src/manager.cpp src/wrapper.cpp -pthread -o build/soak_rss
+//   ./build/soak_rss [total_orders=100000000] [spill_dir]
+#include <cstdio>
+#include <cstdlib>
+#include <unistd.h>
+#include "order.h"
+#include "orderbook.h"
+
+extern "C" {
+    OrderBook* create_book(double tick_size);
+    int set_history_retention(OrderBook* book, long long records, const char* spill_dir);
+    void destroy_book(OrderBook* book);
+    void generate_random_order(OrderBook* book, int64_t &nextID, double basePrice, order* out);
+    void add_order(OrderBook* book, order* newOrder);
+    int cancel_order(OrderBook* book, long long orderID);
+}
+
+namespace {
+    long rssKiB() {
+        long pages = 0, resident = 0;
+        FILE *f = fopen("/proc/self/statm", "r");
+        if (!f) return -1;
+        if (fscanf(f, "%ld %ld", &pages, &resident) != 2) resident = -1;
+        fclose(f);
+        return resident * (sysconf(_SC_PAGESIZE) / 1024);
+    }
+}
+
+int main(int argc, char **argv) {
+    long long total = argc > 1 ? atoll(argv[1]) : 100000000LL;
+    const long long chunk = 10000000LL;
+    const long long kWindow = 200000;
+    const long long kRetain = 1 << 20;
+
+    OrderBook *book = create_book(0.01);
+    if (!set_history_retention(book, kRetain, argc > 2 ? argv[2] : nullptr)) {
+        fprintf(stderr, "cannot open spill files in %s\n", argv[2]);
+        return 1;
+    }
+    int64_t nextID = 1;
+    order o;
+
+    printf("%14s %12s %10s\n", "orders", "rss KiB", "resting");
+    for (long long done = 0; done < total;) {
+        long long stop = done + chunk < total ? done + chunk : total;
+        for (; done < stop; ++done) {
+            generate_random_order(book, nextID, 100.0, &o);
+            add_order(book, &o);
+            if (o.id > kWindow) cancel_order(book, o.id - kWindow);
+        }
+        printf("%14lld %12ld %10zu\n", done, rssKiB(), book->index.size());
+        fflush(stdout);
+    }
+
+    destroy_book(book);
+    return 0;
+}
@@ -0,0 +1,225 @@
+#ifndef APPENDLOG_H
+#define APPENDLOG_H
+#include <atomic>
+#include <cstddef>
+#include <cstdint>
+#include <cstdio>
+#include <cstring>
+#include <string>
+using namespace std;
+
+// Header at the start of every spill segment file. Records follow it back to
+// back as raw bytes, so a segment can also be mapped straight into an array
+// (e.g. numpy.memmap with offset=sizeof(SegmentHeader)).
+struct SegmentHeader {
+    char magic[8];          // "OBSEG\0\0\0"
+    uint32_t version;
+    uint32_t record_size;
+    uint64_t first_index;   // log index of the first record in the file
+    uint64_t reserved;
+};
+static_assert(sizeof(SegmentHeader) == 32, "SegmentHeader layout is part of the file format");
+
+const uint32_t kSegmentVersion = 1;
+
+inline SegmentHeader makeSegmentHeader(uint32_t recordSize, uint64_t firstIndex = 0) {
+    SegmentHeader h{};
+    memcpy(h.magic, "OBSEG", 5);
+    h.version = kSegmentVersion;
+    h.record_size = recordSize;
+    h.first_index = firstIndex;
+    return h;
+}
+
+// Copies up to `max` records starting at log index `start` from the segment
+// file at `path` into `out` and returns how many were copied. Reads only the
+// requested range. Returns 0 if the file is missing or not a segment of
+// records of `recordSize` bytes.
+inline size_t readSegment(const char *path, size_t start, size_t max, void *out, size_t recordSize) {
+    FILE *f = fopen(path, "rb");
+    if (!f) return 0;
+    SegmentHeader h;
+    SegmentHeader want = makeSegmentHeader(static_cast<uint32_t>(recordSize));
+    size_t n = 0;
+    if (fread(&h, sizeof(h), 1, f) == 1 && memcmp(h.magic, want.magic, sizeof(h.magic)) == 0 &&
+        h.version == kSegmentVersion && h.record_size == recordSize && start >= h.first_index &&
+        fseek(f, static_cast<long>(sizeof(h) + (start - h.first_index) * recordSize), SEEK_SET) == 0) {
+        n = fread(out, recordSize, max, f);
+    }
+    fclose(f);
+    return n;
+}
+
+// Append-only log with one writer and any number of concurrent readers.
+// Records live in fixed-size chunks that never move. The chunk directory is a
+// fixed table of pages that are allocated on first use and never move either,
+// so an unused log costs a few KiB, and a reader can index anything below
+// size() while the writer keeps appending. size() is published with release ordering after the
+// record is written.
+//
+// Indices are absolute: record i is the i-th record ever appended. With a
+// retention limit only the newest chunks stay in memory and the directory is
+// used as a ring; the oldest chunk is written to the spill segment (if any)
+// and its memory reused. first() is the oldest index still in memory, and the
+// spill file holds exactly the records from where the log started (0, or
+// the index given to start_at) up to first().
+template <typename T, size_t ChunkBits = 14, size_t MaxChunks = (size_t(1) << 16)>
+class AppendLog {
+    static_assert((MaxChunks & (MaxChunks - 1)) == 0, "MaxChunks must be a power of two");
+    // Directory entries per page.
+    static const size_t kPageSize = MaxChunks < 256 ? MaxChunks : 256;
+    static const size_t kPages = MaxChunks / kPageSize;
+    public:
+        static const size_t kChunk = size_t(1) << ChunkBits;
+
+        AppendLog() {
+            for (size_t p = 0; p < kPages; ++p) pages[p].store(nullptr, memory_order_relaxed);
+        }
+        ~AppendLog() {
+            if (spill) fclose(spill);
+            for (size_t p = 0; p < kPages; ++p) {
+                atomic<T*> *page = pages[p].load(memory_order_relaxed);
+                if (!page) continue;
+                for (size_t i = 0; i < kPageSize; ++i) delete[] page[i].load(memory_order_relaxed);
+                delete[] page;
+            }
+        }
+        AppendLog(const AppendLog&) = delete;
+        AppendLog& operator=(const AppendLog&) = delete;
+
+        // Writer only, while nothing is held in memory and before any reader
+        // starts. Keeps at least the newest `records` records in memory (0
+        // keeps everything up to the directory size). Evicted chunks are
+        // appended to a segment file at `spillPath`, or dropped if it is
+        // empty. Returns false if the spill file cannot be created.
+        bool set_retention(size_t records, const string &spillPath = "") {
+            if (size() != first()) return false;
+            size_t ring = MaxChunks;
+            if (records > 0) {
+                // One extra chunk so the chunk being filled never displaces
+                // any of the last `records`.
+                size_t need = (records + kChunk - 1) / kChunk + 1;
+                ring = 2;
+                while (ring < need && ring < MaxChunks) ring <<= 1;
+            }
+            if (spill) {
+                fclose(spill);
+                spill = nullptr;
+            }
+            spill_path = spillPath;
+            if (!spill_path.empty() && !openSpill()) return false;
+            ring_mask = ring - 1;
+            return true;
+        }
+
+        // Writer only.
+        void push_back(const T &value) {
+            size_t n = count.load(memory_order_relaxed);
+            size_t c = n >> ChunkBits;
+            atomic<T*> &entry = slot(c & ring_mask);
+            T *chunk = entry.load(memory_order_relaxed);
+            if (!chunk) {
+                chunk = new T[kChunk];
+                entry.store(chunk, memory_order_release);
+            } else if ((n & (kChunk - 1)) == 0 && c > ring_mask) {
+                evict(chunk, c - ring_mask - 1);
+            }
+            chunk[n & (kChunk - 1)] = value;
+            count.store(n + 1, memory_order_release);
+        }
+
+        // Writer only, and only while no reader is active. Chunks are kept for
+        // reuse, so memory stays at its high-water mark; the spill file is
+        // truncated.
+        void clear() {
+            origin = 0;
+            count.store(0, memory_order_release);
+            head.store(0, memory_order_release);
+            if (spill) {
+                fclose(spill);
+                spill = nullptr;
+                openSpill();
+            }
+        }
+
+        // Writer only, on a log that has never been written. Continues the
+        // log at index `n`, e.g. after a restore, as if `n` records had
+        // already been appended and evicted.
+        void start_at(size_t n) {
+            origin = n;
+            count.store(n, memory_order_release);
+            head.store(n, memory_order_release);
+            if (spill) {
+                fclose(spill);
+                spill = nullptr;
+                openSpill();
+            }
+        }
+
+        size_t size() const { return count.load(memory_order_acquire); }
+        bool empty() const { return size() == 0; }
+        // Oldest index still held in memory; everything before it is on disk.
+        size_t first() const { return head.load(memory_order_acquire); }
+        const string& spill_file() const { return spill_path; }
+
+        // Writer thread, or any thread when nothing has been evicted. Valid
+        // for first() <= i < a size() value observed by this thread.
+        const T& operator[](size_t i) const {
+            size_t c = (i >> ChunkBits) & ring_mask;
+            const atomic<T*> *page = pages[c / kPageSize].load(memory_order_acquire);
+            return page[c % kPageSize].load(memory_order_acquire)[i & (kChunk - 1)];
+        }
+
+        // Any thread. Copies record i (i < an observed size()) into `out`;
+        // returns false if it was evicted before or while it was copied.
+        bool read(size_t i, T &out) const {
+            out = (*this)[i];
+            atomic_thread_fence(memory_order_acquire);
+            return i >= head.load(memory_order_relaxed);
+        }
+
+    private:
+        // Writer only. Directory entry of chunk slot `c`, allocating its page
+        // on first use.
+        atomic<T*>& slot(size_t c) {
+            atomic<T*> *page = pages[c / kPageSize].load(memory_order_relaxed);
+            if (!page) {
+                page = new atomic<T*>[kPageSize];
+                for (size_t i = 0; i < kPageSize; ++i) page[i].store(nullptr, memory_order_relaxed);
+                pages[c / kPageSize].store(page, memory_order_release);
+            }
+            return page[c % kPageSize];
+        }
+
+        bool openSpill() {
+            spill = fopen(spill_path.c_str(), "wb");
+            if (!spill) return false;
+            SegmentHeader h = makeSegmentHeader(sizeof(T), head.load(memory_order_relaxed));
+            fwrite(&h, sizeof(h), 1, spill);
+            fflush(spill);
+            return true;
+        }
+
+        // Called before `chunk`, which holds chunk number `old`, is reused.
+        // Moves first() past it first, so a reader that copies from the
+        // chunk after this point sees that its index is gone.
+        void evict(T *chunk, size_t old) {
+            if (spill) {
+                // A log continued with start_at may begin mid-chunk.
+                size_t skip = (old << ChunkBits) < origin ? origin - (old << ChunkBits) : 0;
+                fwrite(chunk + skip, sizeof(T), kChunk - skip, spill);
+                fflush(spill);
+            }
+            head.store((old + 1) << ChunkBits, memory_order_relaxed);
+            atomic_thread_fence(memory_order_release);
+        }
+
+        atomic<atomic<T*>*> pages[kPages];
+        size_t ring_mask = MaxChunks - 1;
+        atomic<size_t> count{0};
+        atomic<size_t> head{0};
+        size_t origin = 0;      // index the log started at (see start_at)
+        FILE *spill = nullptr;
+        string spill_path;
+};
+#endif
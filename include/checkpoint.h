@@ -0,0 +1,39 @@
+#ifndef CHECKPOINT_H
+#define CHECKPOINT_H
+#include <string>
+#include "order.h"
+#include "orderbook.h"
+using namespace std;
+
+// File header of a book checkpoint. The resting orders follow it as raw
+// `order` records, bids then asks, each side in priority order (best level
+// first, FIFO within a level), so the file can be mapped and walked in place.
+// Orders collected for the next auction come last, in arrival order.
+struct CheckpointHeader {
+    char magic[8];              // "OBCKPT\0\0"
+    uint32_t version;
+    uint32_t order_size;
+    double tick_size;
+    int64_t now;                // engine clock, ns
+    int64_t next_trade_id;
+    int64_t next_order_id;
+    int64_t events;             // last event seq
+    int64_t trades;             // trade log length
+    int64_t fulfilled;          // fulfilled log length
+    int64_t journal_records;    // position in the book's journal, -1 if none
+    int64_t bid_orders;
+    int64_t ask_orders;
+    FlowConfig flow_config;     // of the book's generator
+    ClockMode clock_mode;       // a virtual clock resumes from `now`
+    MatchMode match_mode;
+    uint8_t reserved[6];
+    int64_t auction_interval;   // ns; 0 under continuous matching
+    int64_t next_auction;       // ns
+    int64_t auction_orders;     // collected for the next auction
+};
+static_assert(sizeof(CheckpointHeader) == 232, "CheckpointHeader layout is part of the file format");
+
+bool saveCheckpoint(const OrderBook &book, const string &path);
+bool readCheckpointHeader(const string &path, CheckpointHeader &header);
+OrderBook* loadCheckpoint(const string &path);
+#endif
@@ -0,0 +1,44 @@
+#ifndef CLOCK_H
+#define CLOCK_H
+#include <atomic>
+#include <chrono>
+#include <cstdint>
+using namespace std;
+
+const int64_t kNanosPerSecond = 1000000000;
+
+// Where the engine clock comes from. Every engine timestamp is in
+// nanoseconds.
+//   Wall     the system clock, nanoseconds since the Unix epoch
+//   Virtual  moves only when the simulation moves it: AdvanceTime commands,
+//            generated flow (each event happens at its arrival time) and
+//            journal replay (recorded timestamps). Runs with expiring
+//            orders are then not tied to real time.
+enum class ClockMode : uint8_t { Wall = 0, Virtual = 1 };
+
+inline int64_t wallNanos() {
+    return chrono::duration_cast<chrono::nanoseconds>(
+        chrono::system_clock::now().time_since_epoch()).count();
+}
+
+// A book's clock. The mode is changed only while the book is idle; the
+// virtual time is advanced by the thread applying commands and may be read
+// from any thread.
+struct EngineClock {
+    ClockMode mode = ClockMode::Wall;
+    atomic<int64_t> virtual_ns{0};
+
+    int64_t now() const {
+        return mode == ClockMode::Wall ? wallNanos() : virtual_ns.load(memory_order_relaxed);
+    }
+
+    // Moves virtual time forward to `ns`; never backwards.
+    void advanceTo(int64_t ns) {
+        if (ns > virtual_ns.load(memory_order_relaxed)) virtual_ns.store(ns, memory_order_relaxed);
+    }
+
+    void advanceBy(int64_t ns) {
+        if (ns > 0) virtual_ns.store(virtual_ns.load(memory_order_relaxed) + ns, memory_order_relaxed);
+    }
+};
+#endif
@@ -0,0 +1,171 @@
+#ifndef INGEST_H
+#define INGEST_H
+#include <atomic>
+#include <chrono>
+#include <memory>
+#include <thread>
+#include <vector>
+#include "order.h"
+#include "orderbook.h"
+using namespace std;
+
+// Bounded lock-free queue (Vyukov). Any number of producers may push; the
+// matching thread is the only consumer.
+template <typename T>
+class MpscRing {
+    public:
+        explicit MpscRing(size_t capacity) {
+            size_t size = 2;
+            while (size < capacity) size <<= 1;
+            cells = vector<Cell>(size);
+            mask = size - 1;
+            for (size_t i = 0; i < size; ++i) cells[i].seq.store(i, memory_order_relaxed);
+        }
+
+        bool try_push(const T &value) {
+            size_t pos = enqueue_pos.load(memory_order_relaxed);
+            for (;;) {
+                Cell &cell = cells[pos & mask];
+                size_t seq = cell.seq.load(memory_order_acquire);
+                intptr_t diff = (intptr_t)seq - (intptr_t)pos;
+                if (diff == 0) {
+                    if (enqueue_pos.compare_exchange_weak(pos, pos + 1, memory_order_relaxed)) {
+                        cell.data = value;
+                        cell.seq.store(pos + 1, memory_order_release);
+                        return true;
+                    }
+                } else if (diff < 0) {
+                    return false;   // full
+                } else {
+                    pos = enqueue_pos.load(memory_order_relaxed);
+                }
+            }
+        }
+
+        // Consumer only.
+        bool try_pop(T &out) {
+            size_t pos = dequeue_pos.load(memory_order_relaxed);
+            Cell &cell = cells[pos & mask];
+            size_t seq = cell.seq.load(memory_order_acquire);
+            if ((intptr_t)seq - (intptr_t)(pos + 1) < 0) {
+                return false;   // empty
+            }
+            out = cell.data;
+            cell.seq.store(pos + mask + 1, memory_order_release);
+            dequeue_pos.store(pos + 1, memory_order_relaxed);
+            return true;
+        }
+
+        // Commands claimed by producers but not yet popped. Any thread may
+        // ask; the answer is a snapshot that may be stale by a few commands.
+        size_t backlog() const {
+            size_t head = dequeue_pos.load(memory_order_relaxed);
+            size_t tail = enqueue_pos.load(memory_order_relaxed);
+            return tail > head ? tail - head : 0;
+        }
+
+        size_t capacity() const { return mask + 1; }
+
+    private:
+        struct Cell {
+            atomic<size_t> seq;
+            T data;
+        };
+        vector<Cell> cells;
+        size_t mask;
+        alignas(64) atomic<size_t> enqueue_pos{0};
+        // Written only by the consumer; atomic so backlog() can read it.
+        alignas(64) atomic<size_t> dequeue_pos{0};
+};
+
+enum class CommandKind : uint8_t { Add = 0, Cancel = 1, Modify = 2, Batch = 3, AdvanceTime = 4 };
+
+// One inbound command for the matching thread. Trivially copyable so it can
+// sit in the ring by value.
+struct Command {
+    CommandKind kind;
+    order o;            // Add
+    int64_t id;         // Cancel, Modify
+    int32_t quantity;   // Modify
+    int64_t price;      // Modify (ticks)
+    int64_t count;      // Batch: events (with window, at most this many)
+    double base_price;  // Batch
+    double window;      // Batch: seconds of generator time, 0 = exactly count
+    int64_t now;        // AdvanceTime (engine clock, ns)
+};
+
+// Orders of one price level in FIFO order, as of the view's instant.
+struct ViewLevel {
+    int64_t price;
+    uint64_t version;       // PriceLevel::version the copy was taken at
+    shared_ptr<const vector<order>> orders;
+};
+
+// Immutable copy of the resting orders in priority order (best level first,
+// FIFO within a level). The matching thread builds a fresh one and swaps the
+// pointer in; readers keep whichever copy they loaded, so they never see a
+// book mid-update and never hold up the writer.
+//
+// A new view shares the order vectors of every level that has not changed
+// since the previous one, so building it costs O(levels) plus a copy of the
+// levels touched in between, not a copy of the whole book.
+struct BookView {
+    vector<ViewLevel> buy;
+    vector<ViewLevel> sell;
+    size_t buy_orders = 0;
+    size_t sell_orders = 0;
+    // Aggregated levels (best first) and metrics for the same instant.
+    vector<DepthLevel> bid_levels;
+    vector<DepthLevel> ask_levels;
+    TopOfBook top;
+    // Book counters at the same instant, so a checkpoint taken from the view
+    // is consistent with its orders.
+    int64_t now;
+    int64_t next_trade_id;
+    int64_t next_order_id;
+    int64_t events;             // last event seq
+    int64_t trades;
+    int64_t fulfilled;
+    int64_t journal_records;    // -1 without an open journal
+    int64_t next_auction;
+    vector<order> auction_orders;   // collected for the next auction, arrival order
+};
+
+struct Shard;
+
+struct Ingest {
+    explicit Ingest(size_t capacity) : ring(capacity) {}
+    MpscRing<Command> ring;
+    thread matcher;
+    atomic<bool> running{false};
+    shared_ptr<const BookView> view;
+    // Set while the book is matched by a BookManager worker instead of its
+    // own thread; commands are then forwarded to that shard (manager.h).
+    Shard *shard = nullptr;
+    int32_t symbol = 0;
+};
+
+// Commands a matcher applies before it checks whether to publish. While
+// commands keep arriving, views are published at most every
+// kPublishInterval, and no sooner than kPublishCostShare times the last
+// publish took, so a deep book costs the busy matcher at most about
+// 1/kPublishCostShare of its time. An idle matcher publishes as soon as its
+// queue runs dry; views are incremental (see BookView), so that only copies
+// the levels changed since the last one.
+const size_t kDrainBatch = 4096;
+const chrono::milliseconds kPublishInterval(20);
+const int kPublishCostShare = 10;
+const chrono::microseconds kIdleSleep(50);
+
+void startIngest(OrderBook &book, size_t capacity);
+void stopIngest(OrderBook &book);
+bool submitCommand(OrderBook &book, const Command &cmd);
+void applyFlow(OrderBook &book, const FlowEvent *events, size_t n);
+void applyGenerated(OrderBook &book, FlowEvent *events, size_t n);
+size_t applyBatch(OrderBook &book, const Command &cmd);
+bool applyCommand(OrderBook &book, const Command &cmd);
+bool executeCommand(OrderBook &book, const Command &cmd);
+shared_ptr<const BookView> buildView(const OrderBook &book, const BookView *previous = nullptr);
+void publishView(OrderBook &book);
+shared_ptr<const BookView> currentView(const OrderBook &book);
+#endif
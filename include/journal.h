@@ -0,0 +1,49 @@
+#ifndef JOURNAL_H
+#define JOURNAL_H
+#include <cstdio>
+#include <string>
+#include "order.h"
+#include "orderbook.h"
+#include "ingest.h"
+using namespace std;
+
+// File header of a command journal. Records follow it back to back.
+struct JournalHeader {
+    char magic[8];          // "OBJRNL\0\0"
+    uint32_t version;
+    uint32_t record_size;
+    double tick_size;       // of the book that recorded it
+    int64_t auction_interval;   // ns between its auctions; 0 = continuous matching
+};
+static_assert(sizeof(JournalHeader) == 32, "JournalHeader layout is part of the file format");
+
+// One applied command. Batches are recorded as the commands they generated, so
+// a journal replays without the random generator.
+struct JournalRecord {
+    int64_t time;           // engine clock (ns) when the command was applied
+    int64_t id;             // Cancel, Modify
+    int64_t price;          // Modify (ticks)
+    int64_t now;            // AdvanceTime (ns)
+    int32_t quantity;       // Modify
+    CommandKind kind;       // Add, Cancel, Modify or AdvanceTime
+    uint8_t reserved[3];
+    order o;                // Add
+};
+static_assert(sizeof(JournalRecord) == 80, "JournalRecord layout is part of the file format");
+
+// Journal being written for a book. Records go through a large stdio buffer
+// that is flushed when the matching thread goes idle and when the journal is
+// closed.
+struct Journal {
+    FILE *file = nullptr;
+    string path;
+    int64_t records = 0;    // written so far; a replay position
+};
+
+bool openJournal(OrderBook &book, const string &path);
+void closeJournal(OrderBook &book);
+void flushJournal(OrderBook &book);
+void journalCommand(OrderBook &book, const Command &cmd);
+bool readJournalHeader(const string &path, JournalHeader &header);
+long long replayJournal(OrderBook &book, const string &path, size_t from = 0);
+#endif
@@ -0,0 +1,91 @@
+#ifndef MANAGER_H
+#define MANAGER_H
+#include <atomic>
+#include <memory>
+#include <thread>
+#include <vector>
+#include "order.h"
+#include "orderbook.h"
+#include "ingest.h"
+using namespace std;
+
+// Command addressed to one book of a manager.
+struct RoutedCommand {
+    int32_t symbol;
+    Command cmd;
+};
+
+// A worker thread and its inbound queue. Symbol s belongs to shard
+// s % shards, so each book is only ever touched by one worker.
+struct Shard {
+    explicit Shard(size_t capacity) : ring(capacity) {}
+    MpscRing<RoutedCommand> ring;
+    vector<int32_t> symbols;
+    thread worker;
+    atomic<bool> running{false};
+};
+
+// Per-book figures, updated by the owning worker whenever it publishes the
+// book's view. Read with relaxed loads from any thread. Copied out by
+// get_symbol_stats, so the layout is part of the C ABI.
+struct SymbolStats {
+    int64_t resting;
+    int64_t bid_levels;
+    int64_t ask_levels;
+    int64_t best_bid;       // ticks, 0 if the side is empty
+    int64_t best_ask;
+    int64_t events;
+    int64_t trades;
+    int64_t commands;
+};
+static_assert(sizeof(SymbolStats) == 64, "SymbolStats layout is part of the C ABI");
+
+// Totals across every book of a manager (get_manager_stats). Layout is part
+// of the C ABI.
+struct ManagerStats {
+    int64_t books;
+    int64_t shards;
+    int64_t resting;
+    int64_t bid_levels;
+    int64_t ask_levels;
+    int64_t events;
+    int64_t trades;
+    int64_t commands;
+};
+static_assert(sizeof(ManagerStats) == 64, "ManagerStats layout is part of the C ABI");
+
+// Atomic twin of SymbolStats, one cache line per book so workers never
+// share a line.
+struct alignas(64) SymbolCounters {
+    atomic<int64_t> resting{0};
+    atomic<int64_t> bid_levels{0};
+    atomic<int64_t> ask_levels{0};
+    atomic<int64_t> best_bid{0};
+    atomic<int64_t> best_ask{0};
+    atomic<int64_t> events{0};
+    atomic<int64_t> trades{0};
+    atomic<int64_t> commands{0};
+};
+
+// Many books keyed by a dense symbol id (0, 1, ...), matched by a fixed
+// pool of worker threads. While the manager runs, its books take commands
+// through routeCommand or the usual submitCommand (which forwards to the
+// owning shard), and readers use currentView as for a single threaded book.
+struct BookManager {
+    vector<unique_ptr<OrderBook>> books;
+    vector<unique_ptr<SymbolCounters>> counters;
+    vector<unique_ptr<Shard>> shards;
+    size_t workers = 0;         // 0 = one per hardware thread
+    size_t capacity = 65536;    // per shard queue
+    atomic<int64_t> running_shards{0};
+    ~BookManager();
+};
+
+int32_t addSymbol(BookManager &manager, double tickSize);
+void startManager(BookManager &manager);
+void stopManager(BookManager &manager);
+bool routeCommand(BookManager &manager, int32_t symbol, const Command &cmd);
+bool routeCommand(Shard &shard, int32_t symbol, const Command &cmd);
+void symbolStats(const BookManager &manager, int32_t symbol, SymbolStats &out);
+void managerStats(const BookManager &manager, ManagerStats &out);
+#endif
@@ -2,25 +2,142 @@
 #define ORDER_H
 #include <iostream>
 #include <string>
+#include <cstdint>
+#include <memory>
+#include <random>
+#include <vector>
+#include <type_traits>
 using namespace std;
-class order{
+
+enum class Side : uint8_t { Buy = 0, Sell = 1 };
+enum class OrderType : uint8_t { Limit = 0, Market = 1 };
+enum class OrderStatus : uint8_t { Open = 0, Closed = 1, Expired = 2, Cancelled = 3 };
+
+// Fixed-size, trivially copyable order record. Field order is part of the C
+// ABI: the ctypes `order` Structure in src/main.py mirrors it exactly.
+struct order{
+    int64_t id;
+    int64_t time;       // engine clock, ns (clock.h)
+    int64_t expiry;     // engine clock, ns; 0 = GTC
+    int64_t price;      // integer tick count; see OrderBook::tick_size
+    int32_t quantity;
+    Side side;
+    OrderType type;
+    OrderStatus status;
+    uint8_t reserved;
+    bool operator==(const order& rhs) const { return id == rhs.id; }
+};
+static_assert(is_trivially_copyable<order>::value, "order must stay POD");
+static_assert(sizeof(order) == 40, "order layout is mirrored by ctypes");
+
+// String forms are only used at the export/import boundary.
+const char* sideName(Side side);
+const char* typeName(OrderType type);
+const char* statusName(OrderStatus status);
+Side parseSide(const char* side);
+OrderType parseType(const char* type);
+
+enum class FlowAction : uint8_t { Add = 0, Cancel = 1, Modify = 2 };
+
+// One generated order-flow event. Add carries the new order; Cancel and
+// Modify target an order the same generator added earlier (o.id), and Modify
+// carries the new quantity and price in o. Layout is mirrored by ctypes.
+struct FlowEvent {
+    order o;
+    double arrival;         // seconds on the generator's own clock
+    FlowAction action;
+    uint8_t reserved[7];
+};
+static_assert(sizeof(FlowEvent) == 56, "FlowEvent layout is mirrored by ctypes");
+
+// How event arrival times are drawn: evenly spaced at `rate`, Poisson at
+// `rate`, or a Hawkes process with baseline `rate` where every event adds
+// `hawkes_alpha` to the intensity and the excess decays at `hawkes_beta`.
+enum class ArrivalModel : uint8_t { Regular = 0, Poisson = 1, Hawkes = 2 };
+
+// Parameters of one FlowGenerator. Layout is mirrored by ctypes and stored
+// in checkpoints.
+struct FlowConfig {
+    double tick_size = 0.01;
+    double price_sigma = 1.5;
+    double market_prob = 0.1;
+    double cross_prob = 0.15;
+    double size_mu = 3.0;       // log-normal order size
+    double size_sigma = 0.6;
+    double rate = 100.0;        // events per second
+    double hawkes_alpha = 0.5;
+    double hawkes_beta = 1.0;
+    double cancel_prob = 0.0;   // share of events that cancel a live order
+    double modify_prob = 0.0;   // share of events that modify one
+    int32_t expiry_seconds = 0; // 0 = GTC
+    int32_t min_qty = 1;
+    int32_t max_qty = 200;
+    ArrivalModel arrival = ArrivalModel::Regular;
+    uint8_t reserved[3];
+};
+static_assert(sizeof(FlowConfig) == 104, "FlowConfig layout is mirrored by ctypes");
+
+// Random order-flow source with its own seed, config and state, so any
+// number of books can generate in parallel and a given seed, config and call
+// sequence always produce the same flow. Only the config may be changed from
+// another thread while the generator is in use.
+class FlowGenerator {
     public:
-        int id;
-        string side;
-        int quantity;
-        float price;
-        time_t time;
-        time_t expiry;
-        string type;
-        string status;
-        bool operator==(const order& rhs) const { return id == rhs.id; }
+        explicit FlowGenerator(uint64_t seed = random_device{}());
+        FlowGenerator(const FlowGenerator&) = delete;
+        FlowGenerator& operator=(const FlowGenerator&) = delete;
+
+        // Restarts the flow: reseeds and resets the clock and live orders.
+        void seed(uint64_t seed);
+        // Invalid fields keep their current value. Takes effect at the next
+        // generate call.
+        void setConfig(const FlowConfig &cfg);
+        // Installs a saved config as is (checkpoint restore).
+        void restoreConfig(const FlowConfig &cfg);
+        FlowConfig config() const;
+        double clock() const { return t; }
+
+        // Fills out[0..n) with the next `n` events. Prices are snapped to
+        // the generator tick in units of `bookTick`; new ids come from
+        // `nextID`, timestamps from `now` (the engine clock, ns).
+        size_t generate(FlowEvent *out, size_t n, int64_t &nextID, double basePrice, double bookTick, int64_t now);
+        // Like generate, but stops at the first event arriving `window`
+        // seconds or more after the previous window ended (at most `max`
+        // events), so the count per window follows the arrival model.
+        size_t generateWindow(double window, FlowEvent *out, size_t max, int64_t &nextID,
+                              double basePrice, double bookTick, int64_t now);
+        // The two halves of generateWindow, for callers that want to know
+        // how many events are coming before handing out ids: drawWindow
+        // sets only the arrival times, fillEvents the rest.
+        size_t drawWindow(double window, FlowEvent *out, size_t max);
+        void fillEvents(FlowEvent *out, size_t n, int64_t &nextID, double basePrice,
+                        double bookTick, int64_t now);
+        // A single new order, without an arrival draw.
+        order nextOrder(int64_t &nextID, double basePrice, double bookTick, int64_t now);
+
+    private:
+        struct Live {
+            int64_t id;
+            int64_t price;
+            Side side;
+        };
+
+        double nextArrival(const FlowConfig &cfg);
+        void nextEvent(const FlowConfig &cfg, FlowEvent &e, int64_t &nextID,
+                       double basePrice, double bookTick, int64_t now);
+        order makeOrder(const FlowConfig &cfg, int64_t &nextID, double basePrice, double bookTick, int64_t now);
+        int64_t drawPrice(const FlowConfig &cfg, Side side, bool cross, double basePrice, double bookTick);
+        int32_t drawQuantity(const FlowConfig &cfg);
+
+        mt19937_64 rng;
+        normal_distribution<double> normal{0.0, 1.0};
+        exponential_distribution<double> exponential{1.0};
+        uniform_real_distribution<double> uniform{0.0, 1.0};
+        shared_ptr<const FlowConfig> cfg;
+        double t = 0.0;             // time of the last arrival draw
+        double window_end = 0.0;
+        double excitation = 0.0;    // Hawkes intensity above the baseline at t
+        double pending = -1.0;      // drawn arrival not emitted yet, or -1
+        vector<Live> live;          // limit orders that cancels/modifies may target
 };
-order randomOrder(int &nextID, float basePrice);
-void setRandomConfig(float tick_size,
-                     float price_sigma,
-                     float market_prob,
-                     float cross_prob,
-                     int expiry_seconds,
-                     int min_qty,
-                     int max_qty);
 #endif
@@ -2,32 +2,207 @@
 #define ORDERBOOK_H
 #include <iostream>
 #include <vector>
+#include <map>
+#include <list>
+#include <unordered_map>
+#include <queue>
+#include <atomic>
+#include <memory>
+#include <string>
 #include "order.h"
+#include "appendlog.h"
+#include "stats.h"
+#include "clock.h"
 using namespace std;
 
+struct Ingest;
+struct Journal;
+struct BookView;
+
+enum class EventKind : uint8_t { Add = 0, Fill = 1, Cancel = 2, Expire = 3, Amend = 4, Replace = 5 };
+
+// How incoming orders are matched.
+//   Continuous  each order is matched on arrival in price-time priority
+//   Auction     frequent batch auction: orders are collected for an interval
+//               and then cleared all at once at a single price (runAuction)
+enum class MatchMode : uint8_t { Continuous = 0, Auction = 1 };
+
+// One entry of the book's sequenced event journal. Field order is part of the
+// C ABI (get_events_since copies whole records).
+//   Add      order came to rest: quantity is its open quantity
+//   Fill     one side of an execution: order_id traded `quantity` at `price`
+//            against other_id (each execution emits two Fills, taker first)
+//   Cancel   resting order cancelled: quantity is what was left open
+//   Expire   resting order expired: quantity is what was left open
+//   Amend    resting order reduced in place: quantity is the new open quantity
+//   Replace  resting order pulled for cancel/replace; it is re-submitted next
+// In auction mode Cancel, Amend and Replace also apply to orders collected
+// for the next auction; an order only gets an Add once an auction leaves it
+// resting.
+struct Event {
+    int64_t seq;
+    int64_t order_id;
+    int64_t other_id;
+    int64_t time;
+    int64_t price;
+    int32_t quantity;
+    EventKind kind;
+    Side side;
+    uint8_t reserved[2];
+};
+static_assert(sizeof(Event) == 48, "Event layout is part of the C ABI");
+
+// All resting orders at one price, oldest first (time priority).
+struct PriceLevel {
+    list<order> orders;
+    // Open quantity of every order at this price, kept in step with `orders`.
+    int64_t quantity = 0;
+    // Book-wide stamp (OrderBook::level_version) of the last change to
+    // `orders`; a view reuses its copy of a level while this is unchanged.
+    uint64_t version = 0;
+};
+
+// One aggregated (L2) price level. Price is in book ticks.
+struct DepthLevel {
+    int64_t price;
+    int64_t quantity;
+    int64_t orders;
+};
+static_assert(sizeof(DepthLevel) == 24, "DepthLevel layout is part of the C ABI");
+
+// Top-of-book and whole-side metrics, read in O(1) from the level aggregates
+// and running side totals. Prices are decimals (ticks * tick_size); a side
+// with no levels reports zeros, as do metrics that need both sides.
+struct TopOfBook {
+    int64_t bid_levels;
+    int64_t ask_levels;
+    int64_t best_bid_qty;      // open quantity at the best level
+    int64_t best_ask_qty;
+    int64_t depth_bid;         // open quantity across the whole side
+    int64_t depth_ask;
+    double best_bid;
+    double best_ask;
+    double midprice;
+    double relative_spread;
+    double obi;                // (depth_bid - depth_ask) / (depth_bid + depth_ask)
+    double ofi;                // best_bid * best_bid_qty - best_ask * best_ask_qty
+    double queue_pressure;     // best_bid_qty / depth_bid
+    double microprice;
+    double vwap_bid;           // over every resting bid
+    double vwap_ask;
+};
+static_assert(sizeof(TopOfBook) == 128, "TopOfBook layout is part of the C ABI");
+
+// Orders ladder levels best-first: descending for bids, ascending for asks.
+struct LadderOrder {
+    bool descending;
+    bool operator()(int64_t a, int64_t b) const { return descending ? a > b : a < b; }
+};
+typedef map<int64_t, PriceLevel, LadderOrder> Ladder;
+
+// Where a resting order lives; both iterators stay valid until the order
+// leaves the book.
+struct OrderLocation {
+    Ladder::iterator level;
+    list<order>::iterator it;
+};
+
 class OrderBook{
     public:
-        vector<order> buy;
-        vector<order> sell;
-        vector<order> fulfilled; 
+        // Decimal value of one price tick. Every price inside the engine is an
+        // integer number of ticks; decimals only appear at the export boundary.
+        double tick_size;
+        // Price ladders: begin() is always the best level (O(1) best bid/ask),
+        // a new level is found or created in O(log levels).
+        Ladder buy;
+        Ladder sell;
+        // id -> resting order, kept in sync on every insert, fill, cancel and expiry.
+        unordered_map<int64_t, OrderLocation> index;
+        // Running open quantity and price * quantity (in ticks) per side,
+        // updated with the level aggregates on every rest, fill, amend and
+        // removal.
+        int64_t bid_depth = 0;
+        int64_t ask_depth = 0;
+        int64_t bid_notional = 0;
+        int64_t ask_notional = 0;
+        // Last stamp handed to a PriceLevel; bumped on every level change.
+        uint64_t level_version = 0;
+        // Cancelled/expired orders and trades are append-only logs so other
+        // threads can read them while the matching thread appends. Their
+        // in-memory size can be bounded with setRetention.
+        AppendLog<order> fulfilled;
+        // One fixed-size record per execution, naming both orders; `side` is
+        // the aggressor's and is converted to text only on export.
         struct Trade {
-            int trade_id;
-            int order_id;
-            string side;
-            float price;
-            int quantity;
-            time_t time;
+            int64_t trade_id;
+            int64_t taker_id;
+            int64_t maker_id;
+            int64_t time;
+            int64_t price;
+            int32_t quantity;
+            Side side;
         };
-        vector<Trade> trades;
-        int next_trade_id = 1;
-
-    OrderBook(){
-        buy.reserve(1024);
-        sell.reserve(1024);
-        fulfilled.reserve(4096);
-        trades.reserve(8192);
-    }
+        static_assert(sizeof(Trade) == 48, "Trade records are written raw to spill segments");
+        AppendLog<Trade> trades;
+        // Sequenced journal of every change to the book; seq n is events[n - 1].
+        AppendLog<Event> events;
+        int64_t next_trade_id = 1;
+        // Order ids handed out by the book (next_order_id in the C ABI and
+        // batches run on the matching thread); safe to take from any thread.
+        atomic<int64_t> next_order_id{1};
+        // Min-heap of (expiry, id) for resting orders that can expire. Entries
+        // for orders that already left the book are dropped when they surface.
+        typedef pair<int64_t, int64_t> ExpiryEntry;
+        priority_queue<ExpiryEntry, vector<ExpiryEntry>, greater<ExpiryEntry>> expiries;
+        // Engine clock (ns) of the command being applied, read from `clock`.
+        // Every timestamp the engine writes comes from here, so a replayed
+        // journal reproduces them exactly.
+        int64_t now = 0;
+        EngineClock clock;
+        // Generator time of the last event applied from `generator`; under
+        // a virtual clock each event advances the clock by the gap to it.
+        double flow_clock = 0.0;
+        // Order flow created inside the engine (batches), with its own seed
+        // and config. Seeded from random_device unless seeded explicitly.
+        FlowGenerator generator;
+        // Matching thread and command queue; null while the book is driven
+        // synchronously by its caller. See ingest.h.
+        unique_ptr<Ingest> ingest;
+        // Last view built by currentView while the book is driven
+        // synchronously; the next one reuses its unchanged levels.
+        mutable shared_ptr<const BookView> sync_view;
+        // Command journal being recorded, or null. See journal.h.
+        unique_ptr<Journal> journal;
+        // Latency histograms and counters (get_engine_stats). See stats.h.
+        EngineInstruments stats;
+        // Matching mode (setMatchMode). In Auction mode incoming orders are
+        // collected in `auction_orders` (arrival order; a cancelled or
+        // replaced one is left with quantity 0), unseen by the ladders and
+        // views, and reach the book only if an auction leaves them unfilled.
+        // An auction runs on the first command at or after `next_auction`
+        // (engine clock, ns); auctions fall on multiples of
+        // `auction_interval`.
+        MatchMode match_mode = MatchMode::Continuous;
+        int64_t auction_interval = 0;
+        int64_t next_auction = 0;
+        vector<order> auction_orders;
+        unordered_map<int64_t, size_t> auction_index;   // id -> auction_orders slot
+
+    explicit OrderBook(double tick = 0.0001);
+    ~OrderBook();
 };
 void addOrder(OrderBook &book, order &newOrder);
+void restOrder(OrderBook &book, const order &o);
+bool cancelOrder(OrderBook &book, int64_t orderID);
+bool modifyOrder(OrderBook &book, int64_t orderID, int quantity, int64_t price);
+double ticksToPrice(const OrderBook &book, int64_t ticks);
+int64_t priceToTicks(const OrderBook &book, double price);
+size_t eventsSince(const OrderBook &book, int64_t seq, Event *out, size_t max);
+bool setRetention(OrderBook &book, size_t records, const string &spillDir);
+TopOfBook topOfBook(const OrderBook &book);
+size_t l2Depth(const OrderBook &book, Side side, size_t levels, DepthLevel *out);
+bool setMatchMode(OrderBook &book, MatchMode mode, int64_t interval);
+int64_t runAuction(OrderBook &book);
 void orderExpiry(OrderBook &book);
+void advanceTime(OrderBook &book, int64_t now);
 #endif
@@ -0,0 +1,200 @@
+#ifndef STATS_H
+#define STATS_H
+#include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <cstdint>
+#include <initializer_list>
+using namespace std;
+
+// Engine instrumentation: latency histograms for the hot paths and event
+// counters. Only the thread applying commands records; any thread may read
+// with relaxed loads. Counters see every call; add, match and cancel
+// latency is timed on one call in kLatencySampleEvery, since a clock read
+// costs about as much as a passive insert. Building with
+// -DORDERBOOK_NO_STATS swaps in empty stubs, so the calls compile to
+// nothing (benchmark builds use this).
+
+// Summary of one histogram. Layout is part of the C ABI.
+struct LatencySummary {
+    int64_t count;              // calls timed
+    int64_t p50_ns;
+    int64_t p90_ns;
+    int64_t p99_ns;
+    int64_t p999_ns;
+    int64_t max_ns;
+    int64_t total_ns;
+    double mean_ns;
+};
+static_assert(sizeof(LatencySummary) == 64, "LatencySummary layout is part of the C ABI");
+
+// Everything get_engine_stats reports. Layout is part of the C ABI.
+struct EngineStats {
+    int64_t enabled;            // 0 in -DORDERBOOK_NO_STATS builds (all zeros)
+    int64_t orders_added;       // addOrder calls, including modify resubmits
+    int64_t orders_matched;     // ... of which traded at least once
+    int64_t fills;              // executions
+    int64_t levels_walked;      // price levels visited while matching
+    int64_t level_erases;       // price levels emptied and removed
+    int64_t order_erases;       // orders that left the book for any reason
+    int64_t cancels;
+    int64_t expiries;
+    int64_t queue_backlog;      // commands waiting for the matcher, 0 when synchronous
+    int64_t queue_capacity;
+    int64_t reserved[5];
+    LatencySummary add;         // addOrder that rested without trading
+    LatencySummary match;       // addOrder that traded
+    LatencySummary cancel;
+    LatencySummary expire;      // advanceTime calls that expired something
+};
+static_assert(sizeof(EngineStats) == 384, "EngineStats layout is part of the C ABI");
+
+enum class StatsOp : int { Add = 0, Match = 1, Cancel = 2, Expire = 3 };
+
+#ifndef ORDERBOOK_NO_STATS
+
+const bool kEngineStats = true;
+const uint32_t kLatencySampleEvery = 8;     // power of two
+
+// Single-writer counter; the increment is a plain load and store.
+struct StatCounter {
+    atomic<int64_t> value{0};
+    void add(int64_t n) { value.store(value.load(memory_order_relaxed) + n, memory_order_relaxed); }
+    int64_t get() const { return value.load(memory_order_relaxed); }
+    void reset() { value.store(0, memory_order_relaxed); }
+};
+
+// Log-linear (HDR style) latency histogram in nanoseconds. Values below 32
+// get a bucket each; above that every power of two is split into 16
+// buckets, so a bucket's bounds are within 1/16 of each other. Covers up
+// to 2^41 ns; longer values land in the last bucket.
+struct LatencyHistogram {
+    static const int kSubBits = 4;
+    static const int kSub = 1 << kSubBits;
+    static const int kMaxBits = 41;
+    static const int kBuckets = (kMaxBits - kSubBits + 1) * kSub;
+
+    atomic<uint64_t> counts[kBuckets] = {};
+    StatCounter count, total, max;
+
+    static int bucket(int64_t ns) {
+        uint64_t v = ns < 0 ? 0 : static_cast<uint64_t>(ns);
+        if (v >= (uint64_t(1) << kMaxBits)) v = (uint64_t(1) << kMaxBits) - 1;
+        if (v < static_cast<uint64_t>(kSub)) return static_cast<int>(v);
+        int msb = 63 - __builtin_clzll(v);
+        int shift = msb - kSubBits;
+        return (shift + 1) * kSub + static_cast<int>((v >> shift) - kSub);
+    }
+
+    // Largest value that falls into bucket `i`.
+    static int64_t upperBound(int i) {
+        int block = i / kSub, sub = i % kSub;
+        if (block == 0) return sub;
+        int shift = block - 1;
+        return ((static_cast<int64_t>(kSub + sub) << shift) + (int64_t(1) << shift)) - 1;
+    }
+
+    void record(int64_t ns) {
+        atomic<uint64_t> &c = counts[bucket(ns)];
+        c.store(c.load(memory_order_relaxed) + 1, memory_order_relaxed);
+        count.add(1);
+        total.add(ns);
+        if (ns > max.get()) max.value.store(ns, memory_order_relaxed);
+    }
+
+    // Quantiles are bucket upper bounds, capped at the largest value seen.
+    LatencySummary summary() const {
+        LatencySummary s{};
+        s.count = count.get();
+        s.total_ns = total.get();
+        s.max_ns = max.get();
+        s.mean_ns = s.count ? static_cast<double>(s.total_ns) / s.count : 0.0;
+        const double qs[] = {0.5, 0.9, 0.99, 0.999};
+        int64_t *outs[] = {&s.p50_ns, &s.p90_ns, &s.p99_ns, &s.p999_ns};
+        uint64_t seen = 0;
+        int q = 0;
+        for (int i = 0; i < kBuckets && q < 4 && s.count > 0; ++i) {
+            seen += counts[i].load(memory_order_relaxed);
+            while (q < 4 && seen >= qs[q] * static_cast<double>(s.count)) {
+                *outs[q++] = min(upperBound(i), s.max_ns);
+            }
+        }
+        return s;
+    }
+
+    void reset() {
+        for (auto &c : counts) c.store(0, memory_order_relaxed);
+        count.reset();
+        total.reset();
+        max.reset();
+    }
+};
+
+inline int64_t statsClock() {
+    return chrono::duration_cast<chrono::nanoseconds>(
+        chrono::steady_clock::now().time_since_epoch()).count();
+}
+
+// Picks the calls whose latency is timed.
+struct LatencySampler {
+    uint32_t tick = 0;
+    // Start time for a sampled call, else 0.
+    int64_t start() { return (++tick & (kLatencySampleEvery - 1)) == 0 ? statsClock() : 0; }
+    static void finish(LatencyHistogram &h, int64_t started) {
+        if (started) h.record(statsClock() - started);
+    }
+};
+
+#else
+
+const bool kEngineStats = false;
+
+struct StatCounter {
+    void add(int64_t) {}
+    int64_t get() const { return 0; }
+    void reset() {}
+};
+
+struct LatencyHistogram {
+    static const int kBuckets = 0;
+    static int64_t upperBound(int) { return 0; }
+    void record(int64_t) {}
+    LatencySummary summary() const { return LatencySummary{}; }
+    void reset() {}
+};
+
+inline int64_t statsClock() { return 0; }
+
+struct LatencySampler {
+    int64_t start() { return 0; }
+    static void finish(LatencyHistogram &, int64_t) {}
+};
+
+#endif
+
+// Per-book instruments, a member of OrderBook.
+struct EngineInstruments {
+    LatencyHistogram add, match, cancel, expire;
+    StatCounter orders_added, orders_matched, fills, levels_walked;
+    StatCounter level_erases, order_erases, cancels, expiries;
+    LatencySampler sampler;     // matcher thread only
+
+    const LatencyHistogram *histogram(StatsOp op) const {
+        switch (op) {
+            case StatsOp::Add: return &add;
+            case StatsOp::Match: return &match;
+            case StatsOp::Cancel: return &cancel;
+            case StatsOp::Expire: return &expire;
+        }
+        return nullptr;
+    }
+
+    // Not atomic as a whole: a reset while the matcher runs may keep a few
+    // counts recorded at the same moment.
+    void reset() {
+        for (LatencyHistogram *h : {&add, &match, &cancel, &expire}) h->reset();
+        for (StatCounter *c : {&orders_added, &orders_matched, &fills, &levels_walked,
+                               &level_erases, &order_erases, &cancels, &expiries}) c->reset();
+    }
+};
+#endif
@@ -1,7 +1,4 @@
 #!/usr/bin/env bash
 set -e
 
-mkdir -p build
-g++ -shared -fPIC -o build/orderbook.so \
-  src/order.cpp src/orderbook.cpp src/wrapper.cpp \
-  -Iinclude -std=c++17
\ No newline at end of file
+python3 src/build_native.py
@@ -0,0 +1,116 @@
+"""Builds the native engine as one optimized shared library.
+
+The library holds the engine, its C ABI (loaded with ctypes) and the
+``_orderbook`` CPython extension (src/pymodule.cpp). It is compiled with
+``-O3`` and link-time optimization into ``build/_orderbook-<hash><ext>``.
+The hash covers every engine source and header, the compiler flags and
+the Python version, so editing any of them triggers a rebuild on the next
+import, and an unchanged tree loads the cached file without touching the
+compiler. Concurrent builds (e.g. sweep workers starting together) are
+serialized with a lock file and publish the result with an atomic rename.
+
+Only the standard library is used, so deploy hooks can run it before the
+Python requirements are installed::
+
+    python src/build_native.py          # builds if needed, prints the path
+    python src/build_native.py --force  # rebuilds
+"""
+import argparse
+import hashlib
+import os
+from pathlib import Path
+import platform
+import subprocess
+import sys
+import sysconfig
+
+ROOT = Path(__file__).resolve().parents[1]
+BUILD_DIR = ROOT / "build"
+SOURCES = [
+    "src/order.cpp",
+    "src/orderbook.cpp",
+    "src/ingest.cpp",
+    "src/journal.cpp",
+    "src/checkpoint.cpp",
+    "src/manager.cpp",
+    "src/wrapper.cpp",
+    "src/pymodule.cpp",
+]
+CXXFLAGS = ["-O3", "-flto", "-DNDEBUG", "-std=c++17", "-pthread", "-shared", "-fPIC"]
+PREFIX = "_orderbook-"
+
+
+def _flags():
+    flags = [os.environ.get("CXX", "g++"), *CXXFLAGS]
+    if platform.system() == "Darwin":
+        # Python symbols are resolved from the interpreter at load time.
+        flags += ["-undefined", "dynamic_lookup"]
+    return flags
+
+
+def _command(out):
+    return [*_flags(), "-o", str(out), *(str(ROOT / s) for s in SOURCES),
+            "-I", str(ROOT / "include"), "-I", sysconfig.get_paths()["include"]]
+
+
+def source_hash():
+    """Hash of the compiler command, the Python ABI and every engine source
+    and header."""
+    h = hashlib.sha256()
+    h.update(" ".join(_flags()).encode())
+    h.update(sysconfig.get_config_var("EXT_SUFFIX").encode())
+    files = [ROOT / s for s in SOURCES] + sorted((ROOT / "include").glob("*.h"))
+    for path in files:
+        h.update(path.relative_to(ROOT).as_posix().encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()[:16]
+
+
+def library_path():
+    return BUILD_DIR / f"{PREFIX}{source_hash()}{sysconfig.get_config_var('EXT_SUFFIX')}"
+
+
+def build_library(force=False):
+    """Returns the path of the library for the current sources, compiling
+    it first if there is none. Raises RuntimeError if the build fails."""
+    path = library_path()
+    if path.exists() and not force:
+        return path
+    BUILD_DIR.mkdir(parents=True, exist_ok=True)
+    with open(BUILD_DIR / ".build.lock", "w") as lock:
+        try:
+            import fcntl
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        except ImportError:
+            pass
+        # Another process may have built it while we waited for the lock.
+        if path.exists() and not force:
+            return path
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        cmd = _command(tmp)
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0 or not tmp.exists():
+            tmp.unlink(missing_ok=True)
+            raise RuntimeError(
+                "Native library build failed.\n"
+                f"Command: {' '.join(cmd)}\n"
+                f"stdout:\n{result.stdout}\n"
+                f"stderr:\n{result.stderr}"
+            )
+        os.replace(tmp, path)
+        # Builds of older sources are never loaded again.
+        for old in BUILD_DIR.glob(PREFIX + "*"):
+            if old != path:
+                old.unlink(missing_ok=True)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--force", action="store_true", help="rebuild even if the cached library is current")
+    args = parser.parse_args(argv)
+    print(build_library(force=args.force))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#include <cstdio>
+#include <cstring>
+#include <vector>
+#ifndef _WIN32
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+#include "order.h"
+#include "orderbook.h"
+#include "ingest.h"
+#include "checkpoint.h"
+
+using namespace std;
+
+namespace {
+    const uint32_t kCheckpointVersion = 4;
+
+    bool validHeader(const CheckpointHeader &h) {
+        return memcmp(h.magic, "OBCKPT", 6) == 0 && h.version == kCheckpointVersion &&
+               h.order_size == sizeof(order) && h.tick_size > 0.0 &&
+               h.bid_orders >= 0 && h.ask_orders >= 0 && h.auction_orders >= 0;
+    }
+
+    bool writeLevels(FILE *f, const vector<ViewLevel> &levels) {
+        for (auto &level : levels) {
+            const vector<order> &orders = *level.orders;
+            if (fwrite(orders.data(), sizeof(order), orders.size(), f) != orders.size()) return false;
+        }
+        return true;
+    }
+
+    // Rebuilds a book from a header and its orders.
+    OrderBook* restore(const CheckpointHeader &h, const order *orders) {
+        OrderBook *book = new OrderBook(h.tick_size);
+        book->now = h.now;
+        book->clock.mode = h.clock_mode;
+        book->clock.virtual_ns.store(h.now, memory_order_relaxed);
+        book->next_trade_id = h.next_trade_id;
+        book->next_order_id.store(h.next_order_id, memory_order_relaxed);
+        book->events.start_at(static_cast<size_t>(h.events));
+        book->trades.start_at(static_cast<size_t>(h.trades));
+        book->fulfilled.start_at(static_cast<size_t>(h.fulfilled));
+        book->index.reserve(static_cast<size_t>(h.bid_orders + h.ask_orders));
+        for (int64_t i = 0; i < h.bid_orders + h.ask_orders; ++i) {
+            restOrder(*book, orders[i]);
+        }
+        const order *collected = orders + h.bid_orders + h.ask_orders;
+        for (int64_t i = 0; i < h.auction_orders; ++i) {
+            book->auction_index[collected[i].id] = book->auction_orders.size();
+            book->auction_orders.push_back(collected[i]);
+        }
+        book->match_mode = h.match_mode;
+        book->auction_interval = h.auction_interval;
+        book->next_auction = h.next_auction;
+        book->generator.restoreConfig(h.flow_config);
+        return book;
+    }
+}
+
+// Writes the book's resting orders and counters to `path`. Safe while the
+// matching thread runs: everything comes from one published view. The file
+// is written next to `path` and renamed over it, so a crash never leaves a
+// half-written checkpoint behind.
+bool saveCheckpoint(const OrderBook &book, const string &path) {
+    shared_ptr<const BookView> view = currentView(book);
+
+    CheckpointHeader h{};
+    memcpy(h.magic, "OBCKPT", 6);
+    h.version = kCheckpointVersion;
+    h.order_size = sizeof(order);
+    h.tick_size = book.tick_size;
+    h.now = view->now;
+    h.next_trade_id = view->next_trade_id;
+    h.next_order_id = view->next_order_id;
+    h.events = view->events;
+    h.trades = view->trades;
+    h.fulfilled = view->fulfilled;
+    h.journal_records = view->journal_records;
+    h.bid_orders = static_cast<int64_t>(view->buy_orders);
+    h.ask_orders = static_cast<int64_t>(view->sell_orders);
+    h.flow_config = book.generator.config();
+    h.clock_mode = book.clock.mode;
+    h.match_mode = book.match_mode;
+    h.auction_interval = book.auction_interval;
+    h.next_auction = view->next_auction;
+    h.auction_orders = static_cast<int64_t>(view->auction_orders.size());
+
+    string tmp = path + ".tmp";
+    FILE *f = fopen(tmp.c_str(), "wb");
+    if (!f) return false;
+    bool ok = fwrite(&h, sizeof(h), 1, f) == 1 &&
+              writeLevels(f, view->buy) && writeLevels(f, view->sell) &&
+              fwrite(view->auction_orders.data(), sizeof(order), view->auction_orders.size(), f) ==
+                  view->auction_orders.size();
+    ok = (fclose(f) == 0) && ok;
+    if (ok) {
+        remove(path.c_str());
+        ok = rename(tmp.c_str(), path.c_str()) == 0;
+    }
+    if (!ok) remove(tmp.c_str());
+    return ok;
+}
+
+bool readCheckpointHeader(const string &path, CheckpointHeader &header) {
+    FILE *f = fopen(path.c_str(), "rb");
+    if (!f) return false;
+    bool ok = fread(&header, sizeof(header), 1, f) == 1 && validHeader(header);
+    fclose(f);
+    return ok;
+}
+
+// Creates a new book from the checkpoint at `path`, or returns null if it is
+// missing, truncated or of another version. Orders are read in place from a
+// memory map and rested without matching; the book's logs continue at the
+// saved lengths so event seqs and trade ids carry on where they left off.
+OrderBook* loadCheckpoint(const string &path) {
+    CheckpointHeader h;
+    if (!readCheckpointHeader(path, h)) return nullptr;
+    size_t count = static_cast<size_t>(h.bid_orders + h.ask_orders + h.auction_orders);
+    size_t expected = sizeof(h) + count * sizeof(order);
+#ifndef _WIN32
+    int fd = open(path.c_str(), O_RDONLY);
+    if (fd < 0) return nullptr;
+    struct stat st;
+    if (fstat(fd, &st) != 0 || static_cast<size_t>(st.st_size) < expected) {
+        close(fd);
+        return nullptr;
+    }
+    void *base = mmap(nullptr, expected, PROT_READ, MAP_PRIVATE, fd, 0);
+    close(fd);
+    if (base == MAP_FAILED) return nullptr;
+    madvise(base, expected, MADV_SEQUENTIAL);
+    OrderBook *book = restore(h, reinterpret_cast<const order*>(static_cast<const char*>(base) + sizeof(h)));
+    munmap(base, expected);
+    return book;
+#else
+    FILE *f = fopen(path.c_str(), "rb");
+    if (!f) return nullptr;
+    vector<order> orders(count);
+    fseek(f, sizeof(h), SEEK_SET);
+    size_t got = fread(orders.data(), sizeof(order), orders.size(), f);
+    fclose(f);
+    if (got != orders.size()) return nullptr;
+    return restore(h, orders.data());
+#endif
+}
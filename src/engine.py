@@ -0,0 +1,482 @@
+"""Bindings for the native order book engine.
+
+The full C ABI is bound with ctypes. The calls made on every tick (order
+entry, top of book, flow runs and the column exports) also go through the
+``_orderbook`` extension module built into the same library: it takes
+typed arguments, writes exports straight into NumPy buffers and releases
+the GIL while flow runs. The helpers below use it when it is available.
+
+Shared by the Streamlit app (main.py) and the headless runner
+(headless.py). Importing this module loads the library, building it first
+if needed (see build_native.py).
+"""
+import ctypes
+from ctypes import c_int, c_int32, c_int64, c_uint8, c_double, c_char_p, c_void_p, POINTER, Structure
+import importlib.util
+from pathlib import Path
+import platform
+import time
+
+import numpy as np
+import pandas as pd
+
+from build_native import build_library
+
+
+def load_library():
+    """Loads the native engine and returns (ctypes library, extension
+    module). Elsewhere the library is the cached optimized build from
+    build_native (rebuilt whenever an engine source changes), and the
+    extension module is loaded from the same file. On Windows a prebuilt
+    build/orderbook.dll is loaded through ctypes only and the module is
+    None.
+
+    Raises RuntimeError if it cannot be built or found.
+    """
+    if platform.system() == "Windows":
+        lib_path = Path(__file__).resolve().parents[1] / "build" / "orderbook.dll"
+        if not lib_path.exists():
+            raise RuntimeError(
+                f"Native library not found: {lib_path}\n"
+                "Make sure it is built on this system before running the app."
+            )
+        return ctypes.CDLL(str(lib_path)), None
+
+    lib_path = build_library()
+    spec = importlib.util.spec_from_file_location("_orderbook", lib_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # The same file, so both share one engine.
+    return ctypes.CDLL(str(lib_path)), module
+
+
+lib, native = load_library()
+
+SIDE_BUY, SIDE_SELL = 0, 1
+TYPE_LIMIT, TYPE_MARKET = 0, 1
+
+
+class order(Structure):
+    # Mirrors `struct order` in include/order.h field for field.
+    _fields_ = [
+        ("id", c_int64),
+        ("time", c_int64),
+        ("expiry", c_int64),
+        ("price", c_int64),
+        ("quantity", c_int32),
+        ("side", c_uint8),
+        ("type", c_uint8),
+        ("status", c_uint8),
+        ("reserved", c_uint8),
+    ]
+
+
+assert ctypes.sizeof(order) == 40
+
+# Price quantum of the native book. Generator tick sizes set in the sidebar
+# are snapped to whole multiples of it.
+BOOK_TICK_SIZE = 0.0001
+
+
+EVENT_ADD, EVENT_FILL, EVENT_CANCEL, EVENT_EXPIRE, EVENT_AMEND, EVENT_REPLACE = range(6)
+
+
+class DepthLevel(Structure):
+    # Mirrors `struct DepthLevel` in include/orderbook.h.
+    _fields_ = [("price", c_int64), ("quantity", c_int64), ("orders", c_int64)]
+
+
+class TopOfBook(Structure):
+    # Mirrors `struct TopOfBook` in include/orderbook.h.
+    _fields_ = [
+        ("bid_levels", c_int64),
+        ("ask_levels", c_int64),
+        ("best_bid_qty", c_int64),
+        ("best_ask_qty", c_int64),
+        ("depth_bid", c_int64),
+        ("depth_ask", c_int64),
+        ("best_bid", c_double),
+        ("best_ask", c_double),
+        ("midprice", c_double),
+        ("relative_spread", c_double),
+        ("obi", c_double),
+        ("ofi", c_double),
+        ("queue_pressure", c_double),
+        ("microprice", c_double),
+        ("vwap_bid", c_double),
+        ("vwap_ask", c_double),
+    ]
+
+
+assert ctypes.sizeof(DepthLevel) == 24
+assert ctypes.sizeof(TopOfBook) == 128
+
+SIDE_NAMES = np.array(["buy", "sell"])
+
+
+class FlowConfig(Structure):
+    # Mirrors `struct FlowConfig` in include/order.h.
+    _fields_ = [
+        ("tick_size", c_double),
+        ("price_sigma", c_double),
+        ("market_prob", c_double),
+        ("cross_prob", c_double),
+        ("size_mu", c_double),
+        ("size_sigma", c_double),
+        ("rate", c_double),
+        ("hawkes_alpha", c_double),
+        ("hawkes_beta", c_double),
+        ("cancel_prob", c_double),
+        ("modify_prob", c_double),
+        ("expiry_seconds", c_int32),
+        ("min_qty", c_int32),
+        ("max_qty", c_int32),
+        ("arrival", c_uint8),
+        ("reserved", c_uint8 * 3),
+    ]
+
+
+assert ctypes.sizeof(FlowConfig) == 104
+
+
+class LatencySummary(Structure):
+    # Mirrors `struct LatencySummary` in include/stats.h.
+    _fields_ = [
+        ("count", c_int64),
+        ("p50_ns", c_int64),
+        ("p90_ns", c_int64),
+        ("p99_ns", c_int64),
+        ("p999_ns", c_int64),
+        ("max_ns", c_int64),
+        ("total_ns", c_int64),
+        ("mean_ns", c_double),
+    ]
+
+
+# Operations with a latency histogram, in the order of `op` in the C ABI.
+STATS_OPS = ["add", "match", "cancel", "expire"]
+
+
+class EngineStats(Structure):
+    # Mirrors `struct EngineStats` in include/stats.h.
+    _fields_ = [
+        ("enabled", c_int64),
+        ("orders_added", c_int64),
+        ("orders_matched", c_int64),
+        ("fills", c_int64),
+        ("levels_walked", c_int64),
+        ("level_erases", c_int64),
+        ("order_erases", c_int64),
+        ("cancels", c_int64),
+        ("expiries", c_int64),
+        ("queue_backlog", c_int64),
+        ("queue_capacity", c_int64),
+        ("reserved", c_int64 * 5),
+    ] + [(op, LatencySummary) for op in STATS_OPS]
+
+
+assert ctypes.sizeof(EngineStats) == 384
+
+ARRIVAL_MODELS = {"Regular": 0, "Poisson": 1, "Hawkes": 2}
+CLOCK_MODES = {"wall": 0, "virtual": 1}
+MATCH_MODES = {"continuous": 0, "auction": 1}
+
+
+class OrderBook(Structure):
+    pass
+
+
+lib.creatBook.restype = POINTER(OrderBook)
+lib.create_book.argtypes = [c_double]
+lib.create_book.restype = POINTER(OrderBook)
+lib.get_tick_size.argtypes = [POINTER(OrderBook)]
+lib.get_tick_size.restype = c_double
+lib.destroy_book.argtypes = [POINTER(OrderBook)]
+lib.generate_random_order.argtypes = [POINTER(OrderBook), POINTER(c_int64), c_double, POINTER(order)]
+lib.set_flow_config.argtypes = [POINTER(OrderBook), POINTER(FlowConfig)]
+lib.get_flow_config.argtypes = [POINTER(OrderBook), POINTER(FlowConfig)]
+lib.add_order.argtypes = [POINTER(OrderBook), POINTER(order)]
+lib.get_orderbook_snapshot.argtypes = [POINTER(OrderBook)]
+lib.get_orderbook_snapshot.restype = ctypes.c_char_p
+lib.get_fulfilled_snapshot.argtypes = [POINTER(OrderBook)]
+lib.get_fulfilled_snapshot.restype = ctypes.c_char_p
+lib.get_trades_snapshot.argtypes = [POINTER(OrderBook)]
+lib.get_trades_snapshot.restype = ctypes.c_char_p
+lib.make_user_order.argtypes = [c_int64, c_char_p, c_int, c_int64, c_char_p, POINTER(order)]
+lib.run_batch.argtypes = [POINTER(OrderBook), ctypes.c_longlong, c_double, POINTER(c_int64)]
+lib.add_orders.argtypes = [POINTER(OrderBook), POINTER(order), ctypes.c_longlong]
+lib.advance_time.argtypes = [POINTER(OrderBook), ctypes.c_longlong]
+lib.set_clock.argtypes = [POINTER(OrderBook), c_int, ctypes.c_longlong]
+lib.set_clock.restype = c_int
+lib.get_clock.argtypes = [POINTER(OrderBook)]
+lib.get_clock.restype = ctypes.c_longlong
+lib.get_clock_mode.argtypes = [POINTER(OrderBook)]
+lib.get_clock_mode.restype = c_int
+lib.set_match_mode.argtypes = [POINTER(OrderBook), c_int, ctypes.c_longlong]
+lib.set_match_mode.restype = c_int
+lib.get_match_mode.argtypes = [POINTER(OrderBook)]
+lib.get_match_mode.restype = c_int
+lib.get_auction_interval.argtypes = [POINTER(OrderBook)]
+lib.get_auction_interval.restype = ctypes.c_longlong
+lib.cancel_order.argtypes = [POINTER(OrderBook), c_int64]
+lib.cancel_order.restype = c_int
+lib.modify_order.argtypes = [POINTER(OrderBook), c_int64, c_int, c_int64]
+lib.modify_order.restype = c_int
+_i64 = np.ctypeslib.ndpointer(np.int64, flags="C_CONTIGUOUS")
+_i32 = np.ctypeslib.ndpointer(np.int32, flags="C_CONTIGUOUS")
+_u8 = np.ctypeslib.ndpointer(np.uint8, flags="C_CONTIGUOUS")
+lib.export_book_columns.argtypes = [POINTER(OrderBook), ctypes.c_longlong, _i64, _i64, _i32, _u8, _i64]
+lib.export_book_columns.restype = ctypes.c_longlong
+lib.export_trades_columns.argtypes = [
+    POINTER(OrderBook), ctypes.c_longlong, ctypes.c_longlong, _i64, _i64, _i64, _i64, _i32, _u8, _i64
+]
+lib.export_trades_columns.restype = ctypes.c_longlong
+lib.export_fulfilled_columns.argtypes = [
+    POINTER(OrderBook), ctypes.c_longlong, ctypes.c_longlong, _i64, _i64, _i32, _u8, _u8, _u8, _i64
+]
+lib.export_fulfilled_columns.restype = ctypes.c_longlong
+lib.export_events_columns.argtypes = [
+    POINTER(OrderBook), ctypes.c_longlong, ctypes.c_longlong, _i64, _i64, _i64, _i64, _i64, _i32, _u8, _u8
+]
+lib.export_events_columns.restype = ctypes.c_longlong
+lib.get_last_event_seq.argtypes = [POINTER(OrderBook)]
+lib.get_last_event_seq.restype = ctypes.c_longlong
+lib.get_engine_stats.argtypes = [POINTER(OrderBook), POINTER(EngineStats)]
+lib.get_latency_histogram.argtypes = [POINTER(OrderBook), c_int, ctypes.c_longlong, _i64, _i64]
+lib.get_latency_histogram.restype = ctypes.c_longlong
+lib.reset_engine_stats.argtypes = [POINTER(OrderBook)]
+lib.get_resting_count.argtypes = [POINTER(OrderBook)]
+lib.get_resting_count.restype = ctypes.c_longlong
+lib.get_trade_count.argtypes = [POINTER(OrderBook)]
+lib.get_trade_count.restype = ctypes.c_longlong
+lib.get_top_of_book_metrics.argtypes = [POINTER(OrderBook), POINTER(TopOfBook)]
+lib.get_l2_depth.argtypes = [
+    POINTER(OrderBook), ctypes.c_longlong,
+    POINTER(DepthLevel), POINTER(ctypes.c_longlong), POINTER(DepthLevel), POINTER(ctypes.c_longlong),
+]
+lib.set_history_retention.argtypes = [POINTER(OrderBook), ctypes.c_longlong, c_char_p]
+lib.set_history_retention.restype = c_int
+lib.get_history_start.argtypes = [POINTER(OrderBook), c_int]
+lib.get_history_start.restype = ctypes.c_longlong
+lib.read_spilled.argtypes = [POINTER(OrderBook), c_int, ctypes.c_longlong, ctypes.c_longlong, ctypes.c_void_p]
+lib.read_spilled.restype = ctypes.c_longlong
+lib.seed_random.argtypes = [POINTER(OrderBook), ctypes.c_ulonglong]
+lib.open_journal.argtypes = [POINTER(OrderBook), c_char_p]
+lib.open_journal.restype = c_int
+lib.close_journal.argtypes = [POINTER(OrderBook)]
+lib.replay.argtypes = [c_char_p]
+lib.replay.restype = POINTER(OrderBook)
+lib.replay_journal.argtypes = [POINTER(OrderBook), c_char_p]
+lib.replay_journal.restype = ctypes.c_longlong
+lib.replay_journal_from.argtypes = [POINTER(OrderBook), c_char_p, ctypes.c_longlong]
+lib.replay_journal_from.restype = ctypes.c_longlong
+lib.save_checkpoint.argtypes = [POINTER(OrderBook), c_char_p]
+lib.save_checkpoint.restype = c_int
+lib.load_checkpoint.argtypes = [c_char_p]
+lib.load_checkpoint.restype = POINTER(OrderBook)
+lib.get_checkpoint_journal_position.argtypes = [c_char_p]
+lib.get_checkpoint_journal_position.restype = ctypes.c_longlong
+lib.start_matching_thread.argtypes = [POINTER(OrderBook), ctypes.c_longlong]
+lib.stop_matching_thread.argtypes = [POINTER(OrderBook)]
+lib.next_order_id.argtypes = [POINTER(OrderBook)]
+lib.next_order_id.restype = ctypes.c_longlong
+lib.submit_order.argtypes = [POINTER(OrderBook), POINTER(order)]
+lib.submit_order.restype = c_int
+lib.submit_cancel.argtypes = [POINTER(OrderBook), c_int64]
+lib.submit_cancel.restype = c_int
+lib.submit_modify.argtypes = [POINTER(OrderBook), c_int64, c_int, c_int64]
+lib.submit_modify.restype = c_int
+lib.submit_batch.argtypes = [POINTER(OrderBook), ctypes.c_longlong, c_double]
+lib.submit_batch.restype = c_int
+lib.submit_flow.argtypes = [POINTER(OrderBook), c_double, ctypes.c_longlong, c_double]
+lib.submit_flow.restype = c_int
+lib.run_flow.argtypes = [POINTER(OrderBook), c_double, ctypes.c_longlong, c_double]
+lib.run_flow.restype = ctypes.c_longlong
+lib.submit_advance_time.argtypes = [POINTER(OrderBook), ctypes.c_longlong]
+lib.submit_advance_time.restype = c_int
+
+
+class BookColumns:
+    """Resting orders exported from the engine's published view."""
+
+    def __init__(self, rows):
+        self.id = np.empty(rows, np.int64)
+        self.price = np.empty(rows, np.int64)
+        self.quantity = np.empty(rows, np.int32)
+        self.side = np.empty(rows, np.uint8)
+        self.time = np.empty(rows, np.int64)
+
+
+def export_book(book):
+    """Returns (buy_df, sell_df) in priority order, best price first."""
+    book_ptr = ctypes.cast(book, POINTER(OrderBook))
+    tick = lib.get_tick_size(book_ptr)
+    rows = 4096
+    while True:
+        c = BookColumns(rows)
+        total = lib.export_book_columns(book_ptr, rows, c.id, c.price, c.quantity, c.side, c.time)
+        if total <= rows:
+            break
+        # The book grew past the buffers; retry with room to spare.
+        rows = 2 * total
+    df = pd.DataFrame({
+        "ID": c.id[:total],
+        "SIDE": np.where(c.side[:total] == SIDE_BUY, "BUY", "SELL"),
+        "PRICE": c.price[:total] * tick,
+        "QTY": c.quantity[:total],
+        "TYPE": "limit",
+    })
+    # Bids come first in the export, so the split point is the bid count.
+    bids = int(np.count_nonzero(c.side[:total] == SIDE_BUY))
+    return df.iloc[:bids], df.iloc[bids:].reset_index(drop=True)
+
+
+def l2_depth(book, levels):
+    """Returns (bids, asks) DataFrames of the best `levels` aggregated levels."""
+    book_ptr = ctypes.cast(book, POINTER(OrderBook))
+    tick = lib.get_tick_size(book_ptr)
+    bids, asks = (DepthLevel * levels)(), (DepthLevel * levels)()
+    n_bids, n_asks = ctypes.c_longlong(), ctypes.c_longlong()
+    lib.get_l2_depth(book_ptr, levels, bids, ctypes.byref(n_bids), asks, ctypes.byref(n_asks))
+    frames = []
+    for buf, n in ((bids, n_bids.value), (asks, n_asks.value)):
+        rows = np.ctypeslib.as_array(buf)[:n]
+        frames.append(pd.DataFrame({
+            "PRICE": rows["price"] * tick,
+            "QTY": rows["quantity"],
+            "ORDERS": rows["orders"],
+        }))
+    return frames[0], frames[1]
+
+
+def native_book(book):
+    """Returns the extension's Book for `book` (a ctypes book pointer or a
+    Book already), or `book` itself without the extension. The helpers
+    here accept either. The Book does not own the engine's book; keep the
+    pointer alive and free it with destroy_book as usual. Hot loops should
+    create it once."""
+    if native is None or isinstance(book, native.Book):
+        return book
+    return native.Book(ctypes.cast(book, c_void_p).value)
+
+
+def run_flow(book, window, max_events, base_price):
+    """Generates and applies flow on the calling thread (run_flow in the C
+    ABI) and returns the number of events applied. Other Python threads
+    keep running meanwhile when the extension is available."""
+    if native is not None:
+        return native_book(book).run_flow(window, max_events, base_price)
+    return lib.run_flow(ctypes.cast(book, POINTER(OrderBook)), c_double(window), max_events, c_double(base_price))
+
+
+def top_of_book(book):
+    """Returns the engine's TopOfBook metrics for `book`."""
+    if native is not None:
+        return native_book(book).top_of_book()
+    metrics = TopOfBook()
+    lib.get_top_of_book_metrics(ctypes.cast(book, POINTER(OrderBook)), ctypes.byref(metrics))
+    return metrics
+
+
+def engine_stats(book):
+    """Returns the EngineStats of `book` (counters and latency summaries)."""
+    stats = EngineStats()
+    lib.get_engine_stats(ctypes.cast(book, POINTER(OrderBook)), ctypes.byref(stats))
+    return stats
+
+
+def latency_table(stats):
+    """Returns one row per operation of an EngineStats: calls timed and
+    latency quantiles in microseconds."""
+    rows = []
+    for op in STATS_OPS:
+        s = getattr(stats, op)
+        rows.append({
+            "OP": op,
+            "TIMED": s.count,
+            "MEAN_US": s.mean_ns / 1e3,
+            "P50_US": s.p50_ns / 1e3,
+            "P90_US": s.p90_ns / 1e3,
+            "P99_US": s.p99_ns / 1e3,
+            "P999_US": s.p999_ns / 1e3,
+            "MAX_US": s.max_ns / 1e3,
+        })
+    return pd.DataFrame(rows)
+
+
+def latency_histogram(book, op):
+    """Returns the non-empty buckets of one latency histogram (`op` from
+    STATS_OPS) as a DataFrame of bucket upper bound (ns) and count."""
+    n = 1024
+    counts, upper = np.empty(n, np.int64), np.empty(n, np.int64)
+    k = lib.get_latency_histogram(ctypes.cast(book, POINTER(OrderBook)), STATS_OPS.index(op), n, counts, upper)
+    df = pd.DataFrame({"UPPER_NS": upper[:k], "COUNT": counts[:k]})
+    return df[df["COUNT"] > 0].reset_index(drop=True)
+
+
+def submit(fn, *args):
+    # The command queue is bounded; back off briefly while it is full.
+    while not fn(*args):
+        time.sleep(0.001)
+
+
+class _Columns:
+    # Keeps the extension's Book for the last book polled, so repeated
+    # fills of the same book skip the handle conversion.
+    _source = None
+    _book = None
+
+    def _native(self, book_ptr):
+        if book_ptr is not self._source:
+            self._source, self._book = book_ptr, native_book(book_ptr)
+        return self._book
+
+
+class EventColumns(_Columns):
+    """Reusable column buffers for one export_events_columns call."""
+
+    def __init__(self, rows):
+        self.seq = np.empty(rows, np.int64)
+        self.order_id = np.empty(rows, np.int64)
+        self.other_id = np.empty(rows, np.int64)
+        self.time = np.empty(rows, np.int64)
+        self.price = np.empty(rows, np.int64)
+        self.quantity = np.empty(rows, np.int32)
+        self.kind = np.empty(rows, np.uint8)
+        self.side = np.empty(rows, np.uint8)
+
+    def fill(self, book_ptr, seq):
+        if native is not None:
+            return self._native(book_ptr).export_events(
+                seq, self.seq, self.order_id, self.other_id,
+                self.time, self.price, self.quantity, self.kind, self.side,
+            )
+        return lib.export_events_columns(
+            book_ptr, seq, len(self.seq), self.seq, self.order_id, self.other_id,
+            self.time, self.price, self.quantity, self.kind, self.side,
+        )
+
+
+class TradeColumns(_Columns):
+    """Reusable column buffers for one export_trades_columns call. Each row
+    is one execution; `side` is the aggressor's."""
+
+    def __init__(self, rows):
+        self.trade_id = np.empty(rows, np.int64)
+        self.taker_id = np.empty(rows, np.int64)
+        self.maker_id = np.empty(rows, np.int64)
+        self.price = np.empty(rows, np.int64)
+        self.quantity = np.empty(rows, np.int32)
+        self.side = np.empty(rows, np.uint8)
+        self.time = np.empty(rows, np.int64)
+
+    def fill(self, book_ptr, start):
+        if native is not None:
+            return self._native(book_ptr).export_trades(
+                start, self.trade_id, self.taker_id, self.maker_id,
+                self.price, self.quantity, self.side, self.time,
+            )
+        return lib.export_trades_columns(
+            book_ptr, start, len(self.trade_id), self.trade_id, self.taker_id, self.maker_id,
+            self.price, self.quantity, self.side, self.time,
+        )
@@ -0,0 +1,357 @@
+"""Headless simulation runner.
+
+Drives the native engine without Streamlit, either as fast as it can or at a
+target event rate, for a fixed duration and/or number of events, and writes
+everything to a run directory:
+
+- ``journal.obj``: every applied command (replayable with ``lib.replay``).
+- ``trades.seg``, ``fulfilled.seg``, ``events.seg``: history spilled past
+  the retention limit.
+- ``latest.obk``: a checkpoint of the book, rewritten every
+  ``checkpoint_every`` seconds and at the end.
+- ``status.json``: progress and top-of-book metrics, rewritten with each
+  checkpoint.
+- ``trades.npz``: trade columns still held in memory at the end, one row
+  per execution (taker and maker ids, aggressor side).
+
+A Streamlit session can attach to a running (or finished) run with
+``streamlit run src/main.py -- --attach RUN_DIR``.
+
+Usage::
+
+    python src/headless.py runs/demo --duration 60
+    python src/headless.py runs/demo --events 10000000 --seed 7
+    python src/headless.py runs/demo --duration 30 --rate 5000 --arrival hawkes
+    python src/headless.py runs/demo --events 10000000 --clock virtual --expiry-seconds 30
+    python src/headless.py runs/demo --events 1000000 --clock virtual --auction-interval 0.01
+"""
+import argparse
+import ctypes
+from ctypes import POINTER
+import json
+import os
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+
+from engine import (
+    lib, OrderBook, FlowConfig, ARRIVAL_MODELS, CLOCK_MODES, MATCH_MODES, BOOK_TICK_SIZE, EVENT_ADD,
+    EventColumns, TradeColumns, native_book, run_flow, top_of_book,
+)
+
+STATUS_FILE = "status.json"
+CHECKPOINT_FILE = "latest.obk"
+JOURNAL_FILE = "journal.obj"
+
+# Events per native call when running flat out (and the cap per step when
+# paced), and the pause between paced steps.
+DEFAULT_BATCH = 10_000
+RATE_STEP_SECONDS = 0.01
+# Trades, fulfilled orders and events kept in memory; older ones are spilled
+# to the run directory.
+DEFAULT_RETENTION = 1 << 20
+# Rows per export when tallying new events after each step.
+EVENT_CHUNK = 1 << 16
+
+FLOW_FIELDS = [name for name, _ in FlowConfig._fields_ if name not in ("arrival", "reserved")]
+
+
+def flow_config(**overrides):
+    """Returns a FlowConfig with the engine defaults, updated from
+    `overrides` (FlowConfig field names; `arrival` may be a model name)."""
+    cfg = FlowConfig()
+    book = lib.create_book(BOOK_TICK_SIZE)
+    lib.get_flow_config(book, ctypes.byref(cfg))
+    lib.destroy_book(book)
+    for name, value in overrides.items():
+        if name == "arrival" and isinstance(value, str):
+            value = ARRIVAL_MODELS[value.capitalize()]
+        setattr(cfg, name, value)
+    return cfg
+
+
+def _config_dict(cfg):
+    out = {name: getattr(cfg, name) for name in FLOW_FIELDS}
+    out["arrival"] = {v: k for k, v in ARRIVAL_MODELS.items()}[cfg.arrival]
+    return out
+
+
+def _write_json(path, data):
+    # Written beside the target and renamed over it, so a reader never sees
+    # a partial file.
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2))
+    os.replace(tmp, path)
+
+
+def read_status(run_dir):
+    """Returns the run's status.json as a dict, or None if it has none yet."""
+    try:
+        return json.loads((Path(run_dir) / STATUS_FILE).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _tally_events(book_ptr, seq, cols, tally):
+    # Reads the events appended since `seq` (well inside the retention
+    # window, since this runs after every step) and returns the new cursor.
+    while True:
+        n = cols.fill(book_ptr, seq)
+        if n == 0:
+            return seq
+        kind, qty = cols.kind[:n], cols.quantity[:n]
+        tally["posted"] += int(qty[kind == EVENT_ADD].sum())
+        seq = int(cols.seq[n - 1])
+
+
+def _tally_trades(book_ptr, start, cols, tally):
+    # Same for the trade log, one row per execution; trade ids count from 1,
+    # so the last id read is the next index.
+    while True:
+        n = cols.fill(book_ptr, start)
+        if n == 0:
+            return start
+        tally["traded"] += int(cols.quantity[:n].sum())
+        start = int(cols.trade_id[n - 1])
+
+
+def _save_trades(book_ptr, path):
+    start = lib.get_history_start(book_ptr, 0)
+    n = lib.get_trade_count(book_ptr) - start
+    cols = {
+        "trade_id": np.empty(n, np.int64),
+        "taker_id": np.empty(n, np.int64),
+        "maker_id": np.empty(n, np.int64),
+        "price": np.empty(n, np.int64),
+        "quantity": np.empty(n, np.int32),
+        "side": np.empty(n, np.uint8),
+        "time": np.empty(n, np.int64),
+    }
+    if n:
+        lib.export_trades_columns(
+            book_ptr, start, n, cols["trade_id"], cols["taker_id"], cols["maker_id"],
+            cols["price"], cols["quantity"], cols["side"], cols["time"],
+        )
+    np.savez(path, tick_size=lib.get_tick_size(book_ptr), **cols)
+
+
+def run(
+    out_dir,
+    *,
+    events=None,
+    duration=None,
+    rate=None,
+    batch=DEFAULT_BATCH,
+    seed=None,
+    config=None,
+    base_price=100.0,
+    anchor_mid=True,
+    checkpoint_every=1.0,
+    journal=True,
+    retention=DEFAULT_RETENTION,
+    clock="wall",
+    auction_interval=None,
+    stop=None,
+):
+    """Runs one simulation into `out_dir` and returns its final status.
+
+    Stops after `events` flow events, after `duration` seconds, or when the
+    `stop` threading.Event is set, whichever comes first (at least one is
+    required). With `rate` (events per second) the flow is paced in real
+    time and follows the configured arrival model; without it, batches of
+    `batch` events are generated back to back. `config` is a FlowConfig or
+    a dict of its fields.
+
+    `clock` is the engine clock: "wall" stamps orders with real time, so
+    orders expire after `expiry_seconds` of real time; "virtual" starts at 0
+    and follows the generator's arrival times, so a flat-out run covers as
+    much simulated time as its events span (`sim_seconds` in the status).
+
+    `auction_interval` (seconds on the engine clock) switches the book to
+    frequent batch auctions: orders are collected and cleared together at
+    one price every interval. None keeps continuous matching.
+
+    Besides progress, the status holds the means of the relative spread and
+    of each side's depth over all steps, and the fill rate: the share of
+    quantity posted to the book that later traded.
+    """
+    if events is None and duration is None and stop is None:
+        raise ValueError("give events, duration or stop")
+    if clock not in CLOCK_MODES:
+        raise ValueError(f"clock must be one of {sorted(CLOCK_MODES)}, got {clock!r}")
+    if auction_interval is not None and auction_interval <= 0:
+        raise ValueError(f"auction_interval must be positive, got {auction_interval!r}")
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    cfg = config if isinstance(config, FlowConfig) else flow_config(**(config or {}))
+    if rate is not None:
+        cfg.rate = rate
+
+    book = lib.create_book(BOOK_TICK_SIZE)
+    book_ptr = ctypes.cast(book, POINTER(OrderBook))
+    try:
+        lib.set_history_retention(book_ptr, retention, str(out).encode())
+        if auction_interval is not None:
+            # Before the journal opens, so its header records the mode.
+            lib.set_match_mode(book_ptr, MATCH_MODES["auction"], round(auction_interval * 1e9))
+        if journal:
+            lib.open_journal(book_ptr, str(out / JOURNAL_FILE).encode())
+        if seed is not None:
+            lib.seed_random(book_ptr, seed)
+        lib.set_flow_config(book_ptr, ctypes.byref(cfg))
+        lib.set_clock(book_ptr, CLOCK_MODES[clock], 0)
+        clock_start = lib.get_clock(book_ptr)
+
+        started = time.time()
+        applied = 0
+        base = float(base_price)
+        last_step = last_checkpoint = time.perf_counter()
+        t0 = last_step
+        status = {}
+        cols = EventColumns(EVENT_CHUNK)
+        trade_cols = TradeColumns(EVENT_CHUNK)
+        seq = lib.get_last_event_seq(book_ptr)
+        trade_start = lib.get_trade_count(book_ptr)
+        # Typed handle for the per-step calls; run_flow releases the GIL, so
+        # a thread driving `stop` stays responsive.
+        fast = native_book(book_ptr)
+        tally = {"posted": 0, "traded": 0}
+        samples = spread_samples = 0
+        spread_sum = depth_bid_sum = depth_ask_sum = 0.0
+
+        def write_status(state):
+            elapsed = time.perf_counter() - t0
+            metrics = top_of_book(book)
+            status.update({
+                "state": state,
+                "pid": os.getpid(),
+                "started": started,
+                "elapsed": elapsed,
+                "events": applied,
+                "events_per_second": applied / elapsed if elapsed > 0 else 0.0,
+                "trades": lib.get_trade_count(book_ptr),
+                "last_event_seq": lib.get_last_event_seq(book_ptr),
+                "resting": lib.get_resting_count(book_ptr),
+                "bid_levels": metrics.bid_levels,
+                "ask_levels": metrics.ask_levels,
+                "best_bid": metrics.best_bid,
+                "best_ask": metrics.best_ask,
+                "midprice": metrics.midprice,
+                "relative_spread": metrics.relative_spread,
+                "mean_relative_spread": spread_sum / spread_samples if spread_samples else None,
+                "mean_depth_bid": depth_bid_sum / samples if samples else 0.0,
+                "mean_depth_ask": depth_ask_sum / samples if samples else 0.0,
+                "posted_quantity": tally["posted"],
+                "traded_quantity": tally["traded"],
+                "fill_rate": tally["traded"] / tally["posted"] if tally["posted"] else 0.0,
+                "clock": clock,
+                "sim_seconds": (lib.get_clock(book_ptr) - clock_start) / 1e9,
+                "match_mode": "continuous" if auction_interval is None else "auction",
+                "auction_interval": auction_interval,
+                "seed": seed,
+                "rate": rate,
+                "config": _config_dict(cfg),
+            })
+            lib.save_checkpoint(book_ptr, str(out / CHECKPOINT_FILE).encode())
+            _write_json(out / STATUS_FILE, status)
+
+        write_status("running")
+        while True:
+            now = time.perf_counter()
+            if duration is not None and now - t0 >= duration:
+                break
+            if events is not None and applied >= events:
+                break
+            if stop is not None and stop.is_set():
+                break
+
+            lib.advance_time(book_ptr, lib.get_clock(book_ptr))
+            m = top_of_book(fast)
+            two_sided = m.bid_levels and m.ask_levels
+            if anchor_mid and two_sided:
+                base = m.midprice
+            if applied:
+                samples += 1
+                depth_bid_sum += m.depth_bid
+                depth_ask_sum += m.depth_ask
+                if two_sided:
+                    spread_samples += 1
+                    spread_sum += m.relative_spread
+            cap = batch if events is None else min(batch, events - applied)
+            if rate is None:
+                applied += run_flow(fast, 0.0, cap, base)
+            else:
+                # Generator time follows wall time: each step emits the
+                # events that arrived since the previous one.
+                applied += run_flow(fast, now - last_step, cap, base)
+                last_step = now
+                time.sleep(RATE_STEP_SECONDS)
+            seq = _tally_events(fast, seq, cols, tally)
+            trade_start = _tally_trades(fast, trade_start, trade_cols, tally)
+
+            if now - last_checkpoint >= checkpoint_every:
+                write_status("running")
+                last_checkpoint = now
+
+        lib.close_journal(book_ptr)
+        _save_trades(book_ptr, out / "trades.npz")
+        write_status("finished")
+        return status
+    finally:
+        lib.destroy_book(book)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("out_dir", help="run directory (created if missing)")
+    parser.add_argument("--events", type=int, help="stop after this many flow events")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--rate", type=float, help="target events per second (default: flat out)")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="max events per native call")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--base-price", type=float, default=100.0)
+    parser.add_argument("--no-anchor-mid", action="store_true", help="keep prices around --base-price")
+    parser.add_argument("--checkpoint-every", type=float, default=1.0, help="seconds between checkpoints")
+    parser.add_argument("--no-journal", action="store_true")
+    parser.add_argument("--retention", type=int, default=DEFAULT_RETENTION, help="history records kept in memory")
+    parser.add_argument("--arrival", choices=[m.lower() for m in ARRIVAL_MODELS])
+    parser.add_argument("--clock", choices=list(CLOCK_MODES), default="wall",
+                        help="engine clock: real time, or simulated time from the flow's arrivals")
+    parser.add_argument("--auction-interval", type=float, metavar="SECONDS",
+                        help="clear orders in frequent batch auctions this far apart (default: continuous matching)")
+    for name in FLOW_FIELDS:
+        if name != "rate":
+            kind = int if name in ("expiry_seconds", "min_qty", "max_qty") else float
+            parser.add_argument("--" + name.replace("_", "-"), type=kind, dest=name)
+    args = parser.parse_args(argv)
+    if args.events is None and args.duration is None:
+        parser.error("give --events and/or --duration")
+
+    overrides = {name: getattr(args, name) for name in FLOW_FIELDS if name != "rate"}
+    overrides = {k: v for k, v in overrides.items() if v is not None}
+    if args.arrival:
+        overrides["arrival"] = args.arrival
+    status = run(
+        args.out_dir,
+        events=args.events,
+        duration=args.duration,
+        rate=args.rate,
+        batch=args.batch,
+        seed=args.seed,
+        config=overrides,
+        base_price=args.base_price,
+        anchor_mid=not args.no_anchor_mid,
+        checkpoint_every=args.checkpoint_every,
+        journal=not args.no_journal,
+        retention=args.retention,
+        clock=args.clock,
+        auction_interval=args.auction_interval,
+    )
+    json.dump(status, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include "order.h"
+#include "orderbook.h"
+#include "ingest.h"
+#include "journal.h"
+#include "manager.h"
+
+using namespace std;
+
+namespace {
+    void matchLoop(OrderBook *book) {
+        Ingest &in = *book->ingest;
+        Command cmd;
+        bool dirty = false;
+        auto last_publish = chrono::steady_clock::now();
+        chrono::steady_clock::duration publish_gap{0};
+
+        for (;;) {
+            size_t applied = 0;
+            while (applied < kDrainBatch && in.ring.try_pop(cmd)) {
+                applyCommand(*book, cmd);
+                ++applied;
+            }
+            if (applied > 0) dirty = true;
+
+            auto now = chrono::steady_clock::now();
+            auto since = now - last_publish;
+            if (dirty && (applied == 0 || (since >= kPublishInterval && since >= publish_gap))) {
+                // An idle matcher also pushes buffered journal records to
+                // disk, so a session that is never closed keeps its journal.
+                if (applied == 0) flushJournal(*book);
+                publishView(*book);
+                dirty = false;
+                last_publish = chrono::steady_clock::now();
+                publish_gap = (last_publish - now) * kPublishCostShare;
+            }
+
+            if (applied == 0) {
+                if (!in.running.load(memory_order_acquire)) break;
+                this_thread::sleep_for(kIdleSleep);
+            }
+        }
+    }
+}
+
+// Runs one command against the book using the engine clock as it stands.
+// Returns false for a cancel or modify of an order that is not resting.
+bool executeCommand(OrderBook &book, const Command &cmd) {
+    switch (cmd.kind) {
+        case CommandKind::Add: {
+            order o = cmd.o;
+            o.time = book.now;
+            addOrder(book, o);
+            return true;
+        }
+        case CommandKind::Cancel:
+            return cancelOrder(book, cmd.id);
+        case CommandKind::Modify:
+            return modifyOrder(book, cmd.id, cmd.quantity, cmd.price);
+        case CommandKind::Batch:
+            return false;   // expanded by applyCommand
+        case CommandKind::AdvanceTime:
+            advanceTime(book, cmd.now);
+            return true;
+    }
+    return false;
+}
+
+// Applies generated flow events to the book as adds, cancels and modifies.
+void applyFlow(OrderBook &book, const FlowEvent *events, size_t n) {
+    Command cmd{};
+    for (size_t i = 0; i < n; ++i) {
+        const FlowEvent &e = events[i];
+        switch (e.action) {
+            case FlowAction::Add:
+                cmd.kind = CommandKind::Add;
+                cmd.o = e.o;
+                break;
+            case FlowAction::Cancel:
+                cmd.kind = CommandKind::Cancel;
+                cmd.id = e.o.id;
+                break;
+            case FlowAction::Modify:
+                cmd.kind = CommandKind::Modify;
+                cmd.id = e.o.id;
+                cmd.quantity = e.o.quantity;
+                cmd.price = e.o.price;
+                break;
+        }
+        applyCommand(book, cmd);
+    }
+}
+
+// Applies events drawn from the book's own generator. Under a virtual clock
+// each event first moves the clock on by the generator time since the
+// previous one, and an add is stamped with that time (its expiry moves with
+// it), so expiries fall where they would in real time.
+void applyGenerated(OrderBook &book, FlowEvent *events, size_t n) {
+    if (n == 0) return;
+    if (book.clock.mode != ClockMode::Virtual) {
+        applyFlow(book, events, n);
+        book.flow_clock = events[n - 1].arrival;
+        return;
+    }
+    for (size_t i = 0; i < n; ++i) {
+        FlowEvent &e = events[i];
+        book.clock.advanceBy(llround((e.arrival - book.flow_clock) * kNanosPerSecond));
+        book.flow_clock = e.arrival;
+        int64_t stamp = book.clock.now();
+        if (e.o.expiry > 0) e.o.expiry += stamp - e.o.time;
+        e.o.time = stamp;
+        applyFlow(book, &e, 1);
+    }
+}
+
+// Generates a batch from the book's generator and applies it; returns the
+// number of events applied.
+size_t applyBatch(OrderBook &book, const Command &cmd) {
+    static thread_local vector<FlowEvent> flow;
+    size_t count = static_cast<size_t>(max<int64_t>(0, cmd.count));
+    if (flow.size() < count) flow.resize(count);
+    // Ids are reserved for every event of the batch before it is
+    // generated; cancels and modifies leave harmless gaps.
+    size_t n = cmd.window > 0.0 ? book.generator.drawWindow(cmd.window, flow.data(), count) : count;
+    int64_t nextID = book.next_order_id.fetch_add(static_cast<int64_t>(n));
+    if (cmd.window > 0.0) {
+        book.generator.fillEvents(flow.data(), n, nextID, cmd.base_price, book.tick_size, book.clock.now());
+    } else {
+        book.generator.generate(flow.data(), n, nextID, cmd.base_price, book.tick_size, book.clock.now());
+    }
+    applyGenerated(book, flow.data(), n);
+    return n;
+}
+
+// Live entry point for every change to the book: stamps the engine clock,
+// appends the command to the journal (if one is open) and executes it. A
+// batch is generated here from the book's generator and journaled as the
+// individual commands it produced, so replay does not depend on the
+// generator.
+bool applyCommand(OrderBook &book, const Command &cmd) {
+    if (cmd.kind == CommandKind::Batch) {
+        applyBatch(book, cmd);
+        return true;
+    }
+    if (cmd.kind == CommandKind::AdvanceTime) book.clock.advanceTo(cmd.now);
+    book.now = book.clock.now();
+    if (book.journal) journalCommand(book, cmd);
+    return executeCommand(book, cmd);
+}
+
+namespace {
+    // Copies one ladder into `out`, taking the order vector of each level
+    // that `previous` (the same side of an older view, also best first)
+    // already holds at the same version. Returns the number of orders.
+    size_t viewLevels(const Ladder &ladder, const vector<ViewLevel> *previous, vector<ViewLevel> &out) {
+        out.reserve(ladder.size());
+        size_t orders = 0, j = 0;
+        for (auto &level : ladder) {
+            if (previous) {
+                while (j < previous->size() && ladder.key_comp()((*previous)[j].price, level.first)) ++j;
+            }
+            const PriceLevel &pl = level.second;
+            if (previous && j < previous->size() && (*previous)[j].price == level.first &&
+                (*previous)[j].version == pl.version) {
+                out.push_back((*previous)[j]);
+            } else {
+                out.push_back({level.first, pl.version,
+                               make_shared<const vector<order>>(pl.orders.begin(), pl.orders.end())});
+            }
+            orders += out.back().orders->size();
+        }
+        return orders;
+    }
+}
+
+// Builds a view of the book as it stands. With `previous` (an older view of
+// the same book), levels unchanged since it are shared rather than copied.
+shared_ptr<const BookView> buildView(const OrderBook &book, const BookView *previous) {
+    auto view = make_shared<BookView>();
+    view->buy_orders = viewLevels(book.buy, previous ? &previous->buy : nullptr, view->buy);
+    view->sell_orders = viewLevels(book.sell, previous ? &previous->sell : nullptr, view->sell);
+    view->bid_levels.resize(book.buy.size());
+    view->ask_levels.resize(book.sell.size());
+    l2Depth(book, Side::Buy, book.buy.size(), view->bid_levels.data());
+    l2Depth(book, Side::Sell, book.sell.size(), view->ask_levels.data());
+    view->top = topOfBook(book);
+    view->now = book.now;
+    view->next_trade_id = book.next_trade_id;
+    view->next_order_id = book.next_order_id.load(memory_order_relaxed);
+    view->events = static_cast<int64_t>(book.events.size());
+    view->trades = static_cast<int64_t>(book.trades.size());
+    view->fulfilled = static_cast<int64_t>(book.fulfilled.size());
+    view->journal_records = book.journal ? book.journal->records : -1;
+    view->next_auction = book.next_auction;
+    for (auto &o : book.auction_orders) {
+        if (o.quantity > 0) view->auction_orders.push_back(o);
+    }
+    return view;
+}
+
+// Matching thread (or the manager worker that owns the book).
+void publishView(OrderBook &book) {
+    shared_ptr<const BookView> previous = atomic_load(&book.ingest->view);
+    if (!previous) previous = atomic_load(&book.sync_view);
+    atomic_store(&book.ingest->view, buildView(book, previous.get()));
+}
+
+// In synchronous mode the view is built on demand, reusing the levels of
+// the last one built here, so repeated reads of a quiet book cost
+// O(levels).
+shared_ptr<const BookView> currentView(const OrderBook &book) {
+    if (book.ingest) return atomic_load(&book.ingest->view);
+    shared_ptr<const BookView> view = buildView(book, atomic_load(&book.sync_view).get());
+    atomic_store(&book.sync_view, view);
+    return view;
+}
+
+// Starts the matching thread. From here on the book must only be changed
+// through submitCommand; readers use currentView and the append-only logs.
+void startIngest(OrderBook &book, size_t capacity) {
+    if (book.ingest) return;
+    book.ingest.reset(new Ingest(capacity));
+    publishView(book);
+    book.ingest->running.store(true, memory_order_release);
+    book.ingest->matcher = thread(matchLoop, &book);
+}
+
+// Stops the matching thread after it drains the commands already queued.
+// Producers must have stopped submitting before this is called.
+void stopIngest(OrderBook &book) {
+    // A managed book is stopped by its manager (stopManager).
+    if (!book.ingest || book.ingest->shard) return;
+    book.ingest->running.store(false, memory_order_release);
+    if (book.ingest->matcher.joinable()) book.ingest->matcher.join();
+    book.ingest.reset();
+}
+
+// Queues a command for the matching thread; returns false if the queue is
+// full. Without a matching thread the command is applied immediately.
+bool submitCommand(OrderBook &book, const Command &cmd) {
+    if (!book.ingest) {
+        applyCommand(book, cmd);
+        return true;
+    }
+    if (book.ingest->shard) return routeCommand(*book.ingest->shard, book.ingest->symbol, cmd);
+    return book.ingest->ring.try_push(cmd);
+}
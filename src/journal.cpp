@@ -0,0 +1,150 @@
+#include <cstring>
+#include <vector>
+#ifndef _WIN32
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+#include "order.h"
+#include "orderbook.h"
+#include "ingest.h"
+#include "journal.h"
+
+using namespace std;
+
+namespace {
+    const uint32_t kJournalVersion = 3;
+    const size_t kWriteBuffer = 1 << 20;
+
+    bool validHeader(const JournalHeader &h) {
+        return memcmp(h.magic, "OBJRNL", 6) == 0 && h.version == kJournalVersion &&
+               h.record_size == sizeof(JournalRecord) && h.tick_size > 0.0;
+    }
+
+    // Applies `n` records at `records` to the book in order.
+    long long applyRecords(OrderBook &book, const JournalRecord *records, size_t n) {
+        Command cmd{};
+        for (size_t i = 0; i < n; ++i) {
+            const JournalRecord &r = records[i];
+            cmd.kind = r.kind;
+            cmd.o = r.o;
+            cmd.id = r.id;
+            cmd.quantity = r.quantity;
+            cmd.price = r.price;
+            cmd.now = r.now;
+            book.now = r.time;
+            book.clock.advanceTo(r.time);
+            if (r.kind == CommandKind::Add && r.o.id >= book.next_order_id.load(memory_order_relaxed)) {
+                book.next_order_id.store(r.o.id + 1, memory_order_relaxed);
+            }
+            if (book.journal) journalCommand(book, cmd);
+            executeCommand(book, cmd);
+        }
+        return static_cast<long long>(n);
+    }
+}
+
+// Starts recording every command applied to the book into a new journal at
+// `path`. Call while the book is idle (before its matching thread starts) and
+// after setting its match mode, which the header records.
+bool openJournal(OrderBook &book, const string &path) {
+    closeJournal(book);
+    FILE *f = fopen(path.c_str(), "wb");
+    if (!f) return false;
+    unique_ptr<Journal> journal(new Journal());
+    journal->file = f;
+    journal->path = path;
+    setvbuf(f, nullptr, _IOFBF, kWriteBuffer);
+
+    JournalHeader h{};
+    memcpy(h.magic, "OBJRNL", 6);
+    h.version = kJournalVersion;
+    h.record_size = sizeof(JournalRecord);
+    h.tick_size = book.tick_size;
+    if (book.match_mode == MatchMode::Auction) h.auction_interval = book.auction_interval;
+    fwrite(&h, sizeof(h), 1, f);
+    book.journal = move(journal);
+    return true;
+}
+
+void closeJournal(OrderBook &book) {
+    if (!book.journal) return;
+    fclose(book.journal->file);
+    book.journal.reset();
+}
+
+void flushJournal(OrderBook &book) {
+    if (book.journal) fflush(book.journal->file);
+}
+
+void journalCommand(OrderBook &book, const Command &cmd) {
+    JournalRecord r{};
+    r.time = book.now;
+    r.kind = cmd.kind;
+    switch (cmd.kind) {
+        case CommandKind::Add:         r.o = cmd.o; break;
+        case CommandKind::Cancel:      r.id = cmd.id; break;
+        case CommandKind::Modify:      r.id = cmd.id; r.quantity = cmd.quantity; r.price = cmd.price; break;
+        case CommandKind::AdvanceTime: r.now = cmd.now; break;
+        case CommandKind::Batch:       return;
+    }
+    fwrite(&r, sizeof(r), 1, book.journal->file);
+    ++book.journal->records;
+}
+
+bool readJournalHeader(const string &path, JournalHeader &header) {
+    FILE *f = fopen(path.c_str(), "rb");
+    if (!f) return false;
+    bool ok = fread(&header, sizeof(header), 1, f) == 1 && validHeader(header);
+    fclose(f);
+    return ok;
+}
+
+// Feeds the records of the journal at `path` from index `from` on to `book`,
+// with the engine clock set from each record, and returns how many were
+// applied (-1 if the file is not a journal for a book with this tick size).
+// Replaying from the start puts the book in the recorded match mode; a book
+// resuming from a checkpoint already has it. The file is memory-mapped, so
+// nothing is copied or parsed on the way in.
+long long replayJournal(OrderBook &book, const string &path, size_t from) {
+    JournalHeader h;
+    if (!readJournalHeader(path, h) || h.tick_size != book.tick_size) return -1;
+    if (from == 0 && h.auction_interval > 0) setMatchMode(book, MatchMode::Auction, h.auction_interval);
+#ifndef _WIN32
+    int fd = open(path.c_str(), O_RDONLY);
+    if (fd < 0) return -1;
+    struct stat st;
+    if (fstat(fd, &st) != 0) {
+        close(fd);
+        return -1;
+    }
+    size_t bytes = static_cast<size_t>(st.st_size);
+    size_t n = (bytes - sizeof(JournalHeader)) / sizeof(JournalRecord);
+    if (n <= from) {
+        close(fd);
+        return 0;
+    }
+    void *base = mmap(nullptr, bytes, PROT_READ, MAP_PRIVATE, fd, 0);
+    close(fd);
+    if (base == MAP_FAILED) return -1;
+    madvise(base, bytes, MADV_SEQUENTIAL);
+    const JournalRecord *records = reinterpret_cast<const JournalRecord*>(
+        static_cast<const char*>(base) + sizeof(JournalHeader));
+    long long applied = applyRecords(book, records + from, n - from);
+    munmap(base, bytes);
+    return applied;
+#else
+    FILE *f = fopen(path.c_str(), "rb");
+    if (!f) return -1;
+    fseek(f, static_cast<long>(sizeof(JournalHeader) + from * sizeof(JournalRecord)), SEEK_SET);
+    vector<JournalRecord> records(1 << 16);
+    long long applied = 0;
+    size_t n;
+    while ((n = fread(records.data(), sizeof(JournalRecord), records.size(), f)) > 0) {
+        applied += applyRecords(book, records.data(), n);
+    }
+    fclose(f);
+    return applied;
+#endif
+}
@@ -1,14 +1,14 @@
 import ctypes
-from ctypes import c_int, c_float, c_char_p, POINTER, Structure
+from ctypes import c_double, POINTER
 from pathlib import Path
 import streamlit as st
 import pandas as pd
+import numpy as np
+import sys
 import time
-import platform
-import subprocess
+import tempfile
 from threading import Thread
 import threading
-from io import StringIO
 
 st.set_page_config(
     page_title="Orderbook Simulator",
@@ -110,85 +110,43 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-def _load_native_lib() -> ctypes.CDLL:
-    root = Path(__file__).resolve().parents[1]
-    build_dir = root / "build"
-    system = platform.system()
-    if system == "Windows":
-        lib_path = build_dir / "orderbook.dll"
-    elif system == "Darwin":
-        lib_path = build_dir / "liborderbook.dylib"
-    else:
-        lib_path = build_dir / "orderbook.so"
-
-    if not lib_path.exists():
-        if system != "Windows":
-            build_dir.mkdir(parents=True, exist_ok=True)
-            cmd = [
-                "g++",
-                "-shared",
-                "-fPIC",
-                "-o",
-                str(lib_path),
-                str(root / "src" / "order.cpp"),
-                str(root / "src" / "orderbook.cpp"),
-                str(root / "src" / "wrapper.cpp"),
-                "-I",
-                str(root / "include"),
-                "-std=c++17",
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0 or not lib_path.exists():
-                st.error(
-                    "Native library build failed.\n"
-                    f"Command: {' '.join(cmd)}\n"
-                    f"stdout:\n{result.stdout}\n"
-                    f"stderr:\n{result.stderr}"
-                )
-                st.stop()
-        else:
-            st.error(
-                f"Native library not found: {lib_path}\n"
-                "Make sure it is built on this system before running the app."
-            )
-            st.stop()
+try:
+    from engine import (
+        lib, order, OrderBook, FlowConfig, ARRIVAL_MODELS, BOOK_TICK_SIZE,
+        EVENT_CANCEL, EVENT_EXPIRE, SIDE_NAMES, STATS_OPS, EventColumns, TradeColumns,
+        export_book, l2_depth, top_of_book, submit, engine_stats, latency_table, latency_histogram,
+    )
+    from headless import CHECKPOINT_FILE, read_status
+except RuntimeError as exc:
+    st.error(str(exc))
+    st.stop()
 
-    return ctypes.CDLL(str(lib_path))
+from streamlit_autorefresh import st_autorefresh
 
+from portfolio import Portfolio
 
-lib = _load_native_lib()
+# Events pulled per native call, and how many recent trades / order events the
+# tables keep (full history stays in the engine).
+EVENT_BATCH = 65536
+TABLE_ROWS = 1000
 
-from streamlit_autorefresh import st_autorefresh
+# Trades, fulfilled orders and events each kept in engine memory; older
+# records are spilled to segment files in a per-session temp directory.
+HISTORY_RETENTION = 1 << 20
 
-class order(Structure):
-    _fields_ = [
-        ("id", c_int),
-        ("side", c_char_p),
-        ("quantity", c_int),
-        ("price", c_float),
-        ("time", c_int),
-        ("type", c_char_p),
-        ("status", c_char_p),
-    ]
-
-
-class OrderBook(Structure):
-    pass
-
-
-lib.creatBook.restype = POINTER(OrderBook)
-lib.generate_random_order.argtypes = [POINTER(c_int), c_float]
-lib.generate_random_order.restype = POINTER(order)
-lib.set_random_config.argtypes = [c_float, c_float, c_float, c_float, c_int, c_int, c_int]
-lib.add_order.argtypes = [POINTER(OrderBook), POINTER(order)]
-lib.get_orderbook_snapshot.argtypes = [POINTER(OrderBook)]
-lib.get_orderbook_snapshot.restype = ctypes.c_char_p
-lib.get_fulfilled_snapshot.argtypes = [POINTER(OrderBook)]
-lib.get_fulfilled_snapshot.restype = ctypes.c_char_p
-lib.get_trades_snapshot.argtypes = [POINTER(OrderBook)]
-lib.get_trades_snapshot.restype = ctypes.c_char_p
-lib.make_user_order.argtypes = [c_int, c_char_p, c_int, c_float, c_char_p]
-lib.make_user_order.restype = POINTER(order)
+# Saved by the sidebar button and loaded when a new session starts.
+CHECKPOINT_PATH = Path(__file__).resolve().parents[1] / "build" / "checkpoint.obk"
+
+# Aggregated levels shown per side in the depth table.
+DEPTH_LEVELS = 10
+
+TRADE_COLUMNS = ["TRADE_ID", "TAKER_ID", "MAKER_ID", "SIDE", "PRICE", "QUANTITY", "TIME"]
+ORDER_EVENT_COLUMNS = ["ID", "SIDE", "PRICE", "QUANTITY", "TYPE", "STATUS"]
+
+# Seconds of generator time per simulation tick, and the cap on events one
+# tick may generate (a Hawkes burst can far exceed the mean).
+TICK_SECONDS = 0.5
+MAX_TICK_EVENTS = 50000
 
 st.markdown(
     """
@@ -203,43 +161,116 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+
+def show_market_snapshot(metrics):
+    st.markdown('<div class="section-card"><div class="section-title">Market Snapshot</div>', unsafe_allow_html=True)
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        st.metric("Best Bid", f"${metrics.best_bid:.4f}")
+        st.metric("Best Ask", f"${metrics.best_ask:.4f}")
+        st.metric("Midprice", f"${metrics.midprice:.4f}")
+    with c2:
+        st.metric("OBI", f"{metrics.obi:.4f}")
+        st.metric("Relative Spread", f"{metrics.relative_spread:.4f}")
+        st.metric("Depth Bid", f"{metrics.depth_bid}")
+    with c3:
+        st.metric("Depth Ask", f"{metrics.depth_ask}")
+        st.metric("VWAP Bid", f"${metrics.vwap_bid:.4f}")
+        st.metric("VWAP Ask", f"${metrics.vwap_ask:.4f}")
+    with c4:
+        st.metric("OFI", f"{metrics.ofi:.2f}")
+        st.metric("Queue Pressure", f"{metrics.queue_pressure:.4f}")
+        st.metric("Microprice", f"${metrics.microprice:.4f}")
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
+def show_depth(book):
+    st.markdown('<div class="section-card"><div class="section-title">Depth (L2)</div>', unsafe_allow_html=True)
+    bid_levels, ask_levels = l2_depth(book, DEPTH_LEVELS)
+    d1, d2 = st.columns(2)
+    with d1:
+        st.subheader("Bids")
+        st.dataframe(bid_levels, use_container_width=True)
+    with d2:
+        st.subheader("Asks")
+        st.dataframe(ask_levels, use_container_width=True)
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
+def _attach_dir():
+    """Run directory given as `streamlit run src/main.py -- --attach DIR`."""
+    args = sys.argv[1:]
+    if "--attach" in args and args.index("--attach") + 1 < len(args):
+        return Path(args[args.index("--attach") + 1])
+    return None
+
+
+ATTACH_DIR = _attach_dir()
+if ATTACH_DIR is not None:
+    # Viewer mode: follow a headless run (src/headless.py) through the status
+    # file and checkpoint it rewrites, without simulating anything here.
+    st_autorefresh(interval=1000, key="refresh")
+    status = read_status(ATTACH_DIR)
+    if status is None:
+        st.info(f"Waiting for a run in {ATTACH_DIR} ...")
+        st.stop()
+    st.sidebar.header("Attached Run")
+    st.sidebar.caption(f"`{ATTACH_DIR}`")
+    st.sidebar.metric("State", status["state"])
+    st.sidebar.metric("Elapsed", f"{status['elapsed']:.1f} s")
+    st.sidebar.metric("Events", f"{status['events']:,}")
+    st.sidebar.metric("Events / s", f"{status['events_per_second']:,.0f}")
+    st.sidebar.metric("Trades", f"{status['trades']:,}")
+    st.sidebar.metric("Resting Orders", f"{status['resting']:,}")
+    if status.get("match_mode") == "auction":
+        st.sidebar.caption(f"Batch auctions every {status['auction_interval'] * 1e3:g} ms")
+    book = lib.load_checkpoint(str(ATTACH_DIR / CHECKPOINT_FILE).encode())
+    if book:
+        try:
+            show_market_snapshot(top_of_book(book))
+            show_depth(book)
+        finally:
+            lib.destroy_book(book)
+    st.stop()
+
 if "initialized" not in st.session_state:
-    st.session_state.book = lib.creatBook()
-    st.session_state.nextID = c_int(1)
+    # Pick up where the last saved checkpoint left off, if there is one.
+    restored = lib.load_checkpoint(str(CHECKPOINT_PATH).encode()) if CHECKPOINT_PATH.exists() else None
+    st.session_state.restored = bool(restored)
+    st.session_state.book = restored if restored else lib.create_book(BOOK_TICK_SIZE)
+    st.session_state.history_dir = tempfile.mkdtemp(prefix="orderbook-")
+    lib.set_history_retention(
+        st.session_state.book, HISTORY_RETENTION, st.session_state.history_dir.encode()
+    )
+    # Every command the session applies is journaled, so the run can be
+    # replayed offline (bench/replay_journal or lib.replay).
+    st.session_state.journal_path = str(Path(st.session_state.history_dir) / "session.obj")
+    lib.open_journal(st.session_state.book, st.session_state.journal_path.encode())
+    # The book's own matching thread applies every change; this script and
+    # the generator thread only queue commands and read the event journal.
+    lib.start_matching_thread(st.session_state.book, 1 << 16)
 
-    st.session_state.starting_cash = 10_000.0
-    st.session_state.cash = st.session_state.starting_cash
-    st.session_state.position_qty = 0
-    st.session_state.avg_cost = 0.0
-    st.session_state.realized_pnl = 0.0
+    # Cash, position and P&L of the user's orders, booked from the trade log.
+    st.session_state.portfolio = Portfolio(10_000.0)
 
     st.session_state.user_orders = set()
     st.session_state.user_order_meta = {}
+    st.session_state.cancelled_orders = set()
 
     st.session_state.run_event = threading.Event()
     st.session_state.thread = None
     st.session_state.basePrice = 100.0
-    st.session_state.base_price_ref = c_float(st.session_state.basePrice)
-
-    st.session_state.processed_trades = set()
-
-    st.session_state.best_bid = 0
-    st.session_state.best_ask = 0
-    st.session_state.midprice = 0
-    st.session_state.obi = 0
-    st.session_state.relative_spread = 0
-    st.session_state.depth_bid = 0
-    st.session_state.depth_ask = 0
-    st.session_state.vwap_bid = 0
-    st.session_state.vwap_ask = 0
-    st.session_state.ofi = 0
-    st.session_state.queue_pressure = 0
-    st.session_state.microprice = 0
+    st.session_state.base_price_ref = c_double(st.session_state.basePrice)
+
+    # Recent trades (from the trade log) and order events (from the event
+    # journal), each read from its own cursor.
+    st.session_state.trade_seq = 0
+    st.session_state.event_seq = 0
+    st.session_state.trade_df = pd.DataFrame(columns=TRADE_COLUMNS)
+    st.session_state.order_event_df = pd.DataFrame(columns=ORDER_EVENT_COLUMNS)
 
     st.session_state.batch_size = 10
     st.session_state.refresh_interval_ms = 1500
-    st.session_state.metrics_every = 3
-    st.session_state.refresh_count = 0
     st.session_state.table_style_limit = 200
 
     st.session_state.anchor_mid = True
@@ -250,25 +281,106 @@ if "initialized" not in st.session_state:
     st.session_state.expiry_seconds = 0
     st.session_state.min_qty = 1
     st.session_state.max_qty = 200
+    st.session_state.arrival_model = "Poisson"
+    st.session_state.hawkes_alpha = 0.5
+    st.session_state.hawkes_beta = 1.0
+    st.session_state.cancel_prob = 0.0
+    st.session_state.modify_prob = 0.0
 
     st.session_state.initialized = True
 
 
-def run_simulation(run_event, book, nextID, base_price_ref, batch_size):
-    while run_event.is_set():
-        for _ in range(batch_size):
-            o = lib.generate_random_order(ctypes.byref(nextID), c_float(base_price_ref.value))
-            lib.add_order(ctypes.cast(book, POINTER(OrderBook)), o)
-        time.sleep(0.5)
+def to_ticks(price: float) -> int:
+    return int(round(price / lib.get_tick_size(ctypes.cast(st.session_state.book, POINTER(OrderBook)))))
+
 
+_event_cols = EventColumns(EVENT_BATCH)
+_trade_cols = TradeColumns(EVENT_BATCH)
+
+
+def _append_rows(df, new_rows, limit=None):
+    # Starting from the new rows when the table is empty keeps their dtypes.
+    out = new_rows if df.empty else pd.concat([df, new_rows], ignore_index=True)
+    if limit is not None:
+        out = out.tail(limit)
+    return out.reset_index(drop=True)
+
+
+def poll_events():
+    """Appends trades and journal events after the session cursors to the
+    trade and order event tables, and books the user's fills into the
+    portfolio.
+
+    Only new rows cross the ABI, as columns written straight into NumPy
+    buffers, so a refresh costs O(new rows) with no per-row Python work.
+    """
+    ss = st.session_state
+    book_ptr = ctypes.cast(ss.book, POINTER(OrderBook))
+    tick = lib.get_tick_size(book_ptr)
+    user_ids = np.fromiter(ss.user_orders, np.int64, len(ss.user_orders))
+
+    t = _trade_cols
+    while True:
+        n = t.fill(book_ptr, ss.trade_seq)
+        if n == 0:
+            break
+        ss.trade_df = _append_rows(ss.trade_df, pd.DataFrame({
+            "TRADE_ID": t.trade_id[:n],
+            "TAKER_ID": t.taker_id[:n],
+            "MAKER_ID": t.maker_id[:n],
+            "SIDE": SIDE_NAMES[t.side[:n]],
+            "PRICE": t.price[:n] * tick,
+            "QUANTITY": t.quantity[:n],
+            "TIME": t.time[:n],
+        }).tail(TABLE_ROWS), TABLE_ROWS)
+        ss.portfolio.consume(t, n, tick)
+        # Trade ids count executions from 1, so the last id is the next index.
+        ss.trade_seq = int(t.trade_id[n - 1])
+        if n < EVENT_BATCH:
+            break
+
+    e = _event_cols
+    while True:
+        n = e.fill(book_ptr, ss.event_seq)
+        if n == 0:
+            break
+        kind = e.kind[:n]
+
+        gone = np.flatnonzero((kind == EVENT_CANCEL) | (kind == EVENT_EXPIRE))
+        if gone.size:
+            ss.order_event_df = _append_rows(ss.order_event_df, pd.DataFrame({
+                "ID": e.order_id[gone],
+                "SIDE": SIDE_NAMES[e.side[gone]],
+                "PRICE": e.price[gone] * tick,
+                "QUANTITY": e.quantity[gone],
+                "TYPE": "limit",
+                "STATUS": np.where(kind[gone] == EVENT_EXPIRE, "expired", "cancelled"),
+            }), TABLE_ROWS)
+            ss.cancelled_orders.update(e.order_id[gone][np.isin(e.order_id[gone], user_ids)].tolist())
+
+        ss.event_seq = int(e.seq[n - 1])
+        if n < EVENT_BATCH:
+            break
+
+
+def run_simulation(run_event, book, base_price_ref):
+    book_ptr = ctypes.cast(book, POINTER(OrderBook))
+    while run_event.is_set():
+        submit(lib.submit_advance_time, book_ptr, time.time_ns())
+        # The tick's flow is generated and matched on the matching thread; its
+        # size follows the arrival model configured on the book's generator.
+        submit(lib.submit_flow, book_ptr, c_double(TICK_SECONDS), MAX_TICK_EVENTS,
+               c_double(base_price_ref.value))
+        time.sleep(TICK_SECONDS)
 
 
 st.sidebar.header("Simulation Controls")
+st.sidebar.caption(f"Session journal: `{st.session_state.journal_path}`")
 
 batch_size = st.sidebar.slider(
     "Orders per tick",
     min_value=1,
-    max_value=50,
+    max_value=5000,
     value=int(st.session_state.batch_size),
     step=1,
 )
@@ -283,15 +395,6 @@ refresh_interval_ms = st.sidebar.slider(
 )
 st.session_state.refresh_interval_ms = refresh_interval_ms
 
-metrics_every = st.sidebar.slider(
-    "Metrics update cadence (ticks)",
-    min_value=1,
-    max_value=10,
-    value=int(st.session_state.metrics_every),
-    step=1,
-)
-st.session_state.metrics_every = metrics_every
-
 table_style_limit = st.sidebar.slider(
     "Row limit for table styling",
     min_value=50,
@@ -303,25 +406,18 @@ st.session_state.table_style_limit = table_style_limit
 
 st_autorefresh(interval=st.session_state.refresh_interval_ms, key="refresh")
 
-can_change_cash = (
-    len(st.session_state.processed_trades) == 0
-    and st.session_state.position_qty == 0
-)
+portfolio = st.session_state.portfolio
+can_change_cash = portfolio.fills == 0 and portfolio.position == 0
 
 starting_cash = st.sidebar.number_input(
     "Starting Cash",
     min_value=0.0,
-    value=float(st.session_state.starting_cash),
+    value=float(portfolio.starting_cash),
     step=100.0,
     disabled=not can_change_cash,
 )
-if can_change_cash and starting_cash != st.session_state.starting_cash:
-    st.session_state.starting_cash = starting_cash
-    st.session_state.cash = starting_cash
-    st.session_state.position_qty = 0
-    st.session_state.avg_cost = 0.0
-    st.session_state.realized_pnl = 0.0
-    st.session_state.processed_trades = set()
+if can_change_cash and starting_cash != portfolio.starting_cash:
+    portfolio.reset(starting_cash)
 
 base_price = st.sidebar.number_input(
     "Base Price", min_value=1.0, value=st.session_state.basePrice
@@ -392,14 +488,72 @@ max_qty = st.sidebar.number_input(
 st.session_state.min_qty = min_qty
 st.session_state.max_qty = max_qty
 
-lib.set_random_config(
-    c_float(st.session_state.tick_size),
-    c_float(st.session_state.price_sigma),
-    c_float(st.session_state.market_prob),
-    c_float(st.session_state.cross_prob),
-    c_int(st.session_state.expiry_seconds),
-    c_int(st.session_state.min_qty),
-    c_int(st.session_state.max_qty),
+arrival_model = st.sidebar.selectbox(
+    "Arrival Model",
+    list(ARRIVAL_MODELS),
+    index=list(ARRIVAL_MODELS).index(st.session_state.arrival_model),
+)
+st.session_state.arrival_model = arrival_model
+
+if arrival_model == "Hawkes":
+    hawkes_beta = st.sidebar.number_input(
+        "Hawkes Decay (1/s)",
+        min_value=0.1,
+        value=float(st.session_state.hawkes_beta),
+        step=0.1,
+    )
+    hawkes_alpha = st.sidebar.slider(
+        "Hawkes Excitation (share of decay)",
+        min_value=0.0,
+        max_value=0.95,
+        value=min(0.95, float(st.session_state.hawkes_alpha / st.session_state.hawkes_beta)),
+        step=0.05,
+    ) * hawkes_beta
+    st.session_state.hawkes_beta = hawkes_beta
+    st.session_state.hawkes_alpha = hawkes_alpha
+
+cancel_prob = st.sidebar.slider(
+    "Cancel %",
+    min_value=0,
+    max_value=50,
+    value=int(st.session_state.cancel_prob * 100),
+    step=1,
+)
+st.session_state.cancel_prob = cancel_prob / 100.0
+
+modify_prob = st.sidebar.slider(
+    "Modify %",
+    min_value=0,
+    max_value=50,
+    value=int(st.session_state.modify_prob * 100),
+    step=1,
+)
+st.session_state.modify_prob = modify_prob / 100.0
+
+# "Orders per tick" is the mean event count per tick; for Hawkes flow the
+# baseline is scaled down so self-excitation brings it back to that mean.
+flow_rate = st.session_state.batch_size / TICK_SECONDS
+if arrival_model == "Hawkes":
+    flow_rate *= 1.0 - st.session_state.hawkes_alpha / st.session_state.hawkes_beta
+lib.set_flow_config(
+    ctypes.cast(st.session_state.book, POINTER(OrderBook)),
+    FlowConfig(
+        tick_size=st.session_state.tick_size,
+        price_sigma=st.session_state.price_sigma,
+        market_prob=st.session_state.market_prob,
+        cross_prob=st.session_state.cross_prob,
+        size_mu=3.0,
+        size_sigma=0.6,
+        rate=flow_rate,
+        hawkes_alpha=st.session_state.hawkes_alpha,
+        hawkes_beta=st.session_state.hawkes_beta,
+        cancel_prob=st.session_state.cancel_prob,
+        modify_prob=st.session_state.modify_prob,
+        expiry_seconds=st.session_state.expiry_seconds,
+        min_qty=st.session_state.min_qty,
+        max_qty=st.session_state.max_qty,
+        arrival=ARRIVAL_MODELS[arrival_model],
+    ),
 )
 
 c1, c2 = st.sidebar.columns(2)
@@ -407,14 +561,12 @@ c1, c2 = st.sidebar.columns(2)
 if c1.button("▶ Start"):
     st.session_state.run_event.set()
     book = st.session_state.book
-    nextID = st.session_state.nextID
     base_price_ref = st.session_state.base_price_ref
-    batch_size = st.session_state.batch_size
 
     if not st.session_state.thread or not st.session_state.thread.is_alive():
         st.session_state.thread = Thread(
             target=run_simulation,
-            args=(st.session_state.run_event, book, nextID, base_price_ref, batch_size),
+            args=(st.session_state.run_event, book, base_price_ref),
             daemon=True,
         )
         st.session_state.thread.start()
@@ -434,23 +586,23 @@ if st.sidebar.button("Submit Order"):
     qty_int = int(qty)
     price_f = float(price)
 
-    if side_lower == "sell" and qty_int > st.session_state.position_qty:
+    if side_lower == "sell" and qty_int > portfolio.position:
         st.warning("You cannot sell more than your current holdings!")
         st.stop()
 
     if side_lower == "buy" and otype == "limit":
         cost_est = price_f * qty_int
-        if cost_est > st.session_state.cash:
+        if cost_est > portfolio.cash:
             st.warning(
                 f"Not enough cash. Needed ≈ {cost_est:.2f}, "
-                f"available {st.session_state.cash:.2f}"
+                f"available {portfolio.cash:.2f}"
             )
             st.stop()
 
-    oid = st.session_state.nextID.value
-    st.session_state.nextID.value += 1
+    oid = lib.next_order_id(ctypes.cast(st.session_state.book, POINTER(OrderBook)))
 
     st.session_state.user_orders.add(oid)
+    portfolio.track(oid)
     st.session_state.user_order_meta[oid] = {
         "side": side_lower,
         "price": price_f,
@@ -458,16 +610,59 @@ if st.sidebar.button("Submit Order"):
         "type": otype,
     }
 
-    uo_ptr = lib.make_user_order(
-        oid, side_lower.encode(), qty_int, price_f, otype.encode()
+    user_order = order()
+    lib.make_user_order(
+        oid, side_lower.encode(), qty_int, to_ticks(price_f), otype.encode(), ctypes.byref(user_order)
+    )
+    submit(lib.submit_order, ctypes.cast(st.session_state.book, POINTER(OrderBook)), ctypes.byref(user_order))
+
+st.sidebar.subheader("Cancel / Modify Order")
+
+open_user_orders = [
+    oid for oid in sorted(st.session_state.user_orders)
+    if oid not in st.session_state.cancelled_orders
+    and st.session_state.user_order_meta[oid]["type"] == "limit"
+]
+if open_user_orders:
+    target_oid = st.sidebar.selectbox("Order ID", open_user_orders)
+    target_meta = st.session_state.user_order_meta[target_oid]
+    new_qty = st.sidebar.number_input("New Open Quantity", 0, 100, step=1)
+    new_price = st.sidebar.number_input(
+        "New Price", 1.0, 1000.0, value=float(target_meta["price"]), step=1.0
     )
-    lib.add_order(ctypes.cast(st.session_state.book, POINTER(OrderBook)), uo_ptr)
+    m1, m2 = st.sidebar.columns(2)
+
+    # Cancels and amendments are queued for the matching thread; one that
+    # arrives after the order has filled is a no-op.
+    if m1.button("Cancel"):
+        submit(lib.submit_cancel, ctypes.cast(st.session_state.book, POINTER(OrderBook)), target_oid)
+
+    if m2.button("Modify"):
+        submit(
+            lib.submit_modify,
+            ctypes.cast(st.session_state.book, POINTER(OrderBook)),
+            target_oid,
+            int(new_qty),
+            to_ticks(float(new_price)),
+        )
+        if int(new_qty) > 0:
+            target_meta["qty"] = portfolio.filled(target_oid) + int(new_qty)
+            target_meta["price"] = float(new_price)
+else:
+    st.sidebar.caption("No open user limit orders.")
+
+st.sidebar.subheader("Checkpoint")
+if st.session_state.restored:
+    st.sidebar.caption("This session started from the saved checkpoint.")
+if st.sidebar.button("Save Checkpoint"):
+    CHECKPOINT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    if lib.save_checkpoint(ctypes.cast(st.session_state.book, POINTER(OrderBook)), str(CHECKPOINT_PATH).encode()):
+        st.sidebar.success(f"Saved to {CHECKPOINT_PATH.name}; new sessions will start from it.")
+    else:
+        st.sidebar.error("Could not write the checkpoint.")
 
 
-snapshot_ptr = lib.get_orderbook_snapshot(
-    ctypes.cast(st.session_state.book, POINTER(OrderBook))
-)
-snapshot = snapshot_ptr.decode("utf-8")
+poll_events()
 
 
 def highlight_user_orders(row):
@@ -480,17 +675,9 @@ def highlight_user_orders(row):
     return [""] * len(row)
 
 
-if snapshot.strip():
-    df = pd.read_csv(StringIO(snapshot))
-    df["ID"] = df["ID"].astype(int)
-
-    buy_df = df[df["SIDE"].str.lower() == "buy"].sort_values(
-        "PRICE", ascending=False
-    )
-    sell_df = df[df["SIDE"].str.lower() == "sell"].sort_values(
-        "PRICE", ascending=True
-    )
+buy_df, sell_df = export_book(st.session_state.book)
 
+if not buy_df.empty or not sell_df.empty:
     st.markdown('<div class="section-card"><div class="section-title">Order Book</div>', unsafe_allow_html=True)
     col1, col2 = st.columns(2)
     with col1:
@@ -506,106 +693,26 @@ if snapshot.strip():
         else:
             st.dataframe(sell_df, use_container_width=True)
     st.markdown("</div>", unsafe_allow_html=True)
-    has_bid = not buy_df.empty
-    has_ask = not sell_df.empty
-
-    local_best_bid = buy_df.iloc[0]["PRICE"] if has_bid else 0
-    local_best_ask = sell_df.iloc[0]["PRICE"] if has_ask else 0
+else:
+    st.info("Order book is empty.")
 
-    st.session_state.best_bid = local_best_bid if has_bid else 0
-    st.session_state.best_ask = local_best_ask if has_ask else 0
+# Metrics come from the engine's level aggregates, so they are O(1) however
+# deep the book is.
+metrics = top_of_book(st.session_state.book)
 
-    if st.session_state.anchor_mid and has_bid and has_ask:
-        st.session_state.base_price_ref.value = float(
-            (local_best_bid + local_best_ask) / 2
-        )
-    else:
-        st.session_state.base_price_ref.value = float(st.session_state.basePrice)
-
-    st.session_state.refresh_count += 1
-    if st.session_state.refresh_count % st.session_state.metrics_every == 0:
-        if has_bid:
-            st.session_state.depth_bid = buy_df["QTY"].sum()
-            st.session_state.queue_pressure = buy_df.iloc[0]["QTY"] / st.session_state.depth_bid
-            st.session_state.vwap_bid = (buy_df["PRICE"] * buy_df["QTY"]).sum() / st.session_state.depth_bid
-        else:
-            st.session_state.depth_bid = 0
-            st.session_state.queue_pressure = 0
-            st.session_state.vwap_bid = 0
-
-        if has_ask:
-            st.session_state.depth_ask = sell_df["QTY"].sum()
-            st.session_state.vwap_ask = (sell_df["PRICE"] * sell_df["QTY"]).sum() / st.session_state.depth_ask
-        else:
-            st.session_state.depth_ask = 0
-            st.session_state.vwap_ask = 0
-
-        if has_bid and has_ask:
-            bid = local_best_bid
-            ask = local_best_ask
-
-            st.session_state.midprice = (bid + ask) / 2
-            total_depth = st.session_state.depth_bid + st.session_state.depth_ask
-            if total_depth > 0:
-                st.session_state.obi = (
-                    st.session_state.depth_bid - st.session_state.depth_ask
-                ) / total_depth
-            else:
-                st.session_state.obi = 0
-            st.session_state.relative_spread = (ask - bid) / st.session_state.midprice
-            st.session_state.ofi = bid * buy_df.iloc[0]["QTY"] - ask * sell_df.iloc[0]["QTY"]
-            st.session_state.microprice = (
-                ask * buy_df.iloc[0]["QTY"] + bid * sell_df.iloc[0]["QTY"]
-            ) / (buy_df.iloc[0]["QTY"] + sell_df.iloc[0]["QTY"])
-        else:
-            st.session_state.midprice = 0
-            st.session_state.obi = 0
-            st.session_state.relative_spread = 0
-            st.session_state.ofi = 0
-            st.session_state.microprice = 0
+if st.session_state.anchor_mid and metrics.bid_levels and metrics.ask_levels:
+    st.session_state.base_price_ref.value = metrics.midprice
 else:
-    st.info("Order book is empty.")
+    st.session_state.base_price_ref.value = float(st.session_state.basePrice)
 
-st.markdown('<div class="section-card"><div class="section-title">Market Snapshot</div>', unsafe_allow_html=True)
-c1, c2, c3, c4 = st.columns(4)
-with c1:
-    st.metric("Best Bid", f"${st.session_state.best_bid:.4f}")
-    st.metric("Best Ask", f"${st.session_state.best_ask:.4f}")
-    st.metric("Midprice", f"${st.session_state.midprice:.4f}")
-with c2:
-    st.metric("OBI", f"{st.session_state.obi:.4f}")
-    st.metric("Relative Spread", f"{st.session_state.relative_spread:.4f}")
-    st.metric("Depth Bid", f"{st.session_state.depth_bid}")
-with c3:
-    st.metric("Depth Ask", f"{st.session_state.depth_ask}")
-    st.metric("VWAP Bid", f"${st.session_state.vwap_bid:.4f}")
-    st.metric("VWAP Ask", f"${st.session_state.vwap_ask:.4f}")
-with c4:
-    st.metric("OFI", f"{st.session_state.ofi:.2f}")
-    st.metric("Queue Pressure", f"{st.session_state.queue_pressure:.4f}")
-    st.metric("Microprice", f"${st.session_state.microprice:.4f}")
-st.markdown("</div>", unsafe_allow_html=True)
+show_market_snapshot(metrics)
+show_depth(st.session_state.book)
 
 st.markdown('<div class="section-card"><div class="section-title">Trades</div>', unsafe_allow_html=True)
 
-trades_ptr = lib.get_trades_snapshot(
-    ctypes.cast(st.session_state.book, POINTER(OrderBook))
-)
-trades = trades_ptr.decode("utf-8")
-
 df_trades = None
-if trades.strip():
-    df_trades = pd.read_csv(StringIO(trades))
-
-    if "TRADE_ID" in df_trades.columns:
-        df_trades["TRADE_ID"] = df_trades["TRADE_ID"].astype(int)
-    if "ORDER_ID" in df_trades.columns:
-        df_trades["ORDER_ID"] = df_trades["ORDER_ID"].astype(int)
-    if "QUANTITY" in df_trades.columns:
-        df_trades["QUANTITY"] = df_trades["QUANTITY"].astype(int)
-    if "PRICE" in df_trades.columns:
-        df_trades["PRICE"] = df_trades["PRICE"].astype(float)
-
+if not st.session_state.trade_df.empty:
+    df_trades = st.session_state.trade_df
     st.dataframe(df_trades)
 else:
     st.info("No trades executed yet.")
@@ -613,160 +720,102 @@ else:
 st.markdown("</div>", unsafe_allow_html=True)
 st.markdown('<div class="section-card"><div class="section-title">Order Events (Cancelled/Expired)</div>', unsafe_allow_html=True)
 
-fulfilled_ptr = lib.get_fulfilled_snapshot(
-    ctypes.cast(st.session_state.book, POINTER(OrderBook))
-)
-fulfilled = fulfilled_ptr.decode("utf-8")
-
 df_fulfilled = None
-if fulfilled.strip():
-    df_fulfilled = pd.read_csv(StringIO(fulfilled))
-
-    if "ID" in df_fulfilled.columns:
-        df_fulfilled["ID"] = df_fulfilled["ID"].astype(int)
-    if "QUANTITY" in df_fulfilled.columns:
-        df_fulfilled["QUANTITY"] = df_fulfilled["QUANTITY"].astype(int)
-    if "PRICE" in df_fulfilled.columns:
-        df_fulfilled["PRICE"] = df_fulfilled["PRICE"].astype(float)
-
+if not st.session_state.order_event_df.empty:
+    df_fulfilled = st.session_state.order_event_df
     st.dataframe(df_fulfilled)
 else:
     st.info("No order events yet.")
 st.markdown("</div>", unsafe_allow_html=True)
 
 
-def update_user_pnl(trade_row: pd.Series):
-    tid = int(trade_row["TRADE_ID"])
-    if tid in st.session_state.processed_trades:
-        return
-
-    st.session_state.processed_trades.add(tid)
-
-    side = str(trade_row["SIDE"]).lower()
-    price = float(trade_row["PRICE"])
-    qty = int(trade_row["QUANTITY"])
-
-    if qty <= 0:
-        return
-
-    if side == "buy":
-        cost = price * qty
-        st.session_state.cash -= cost
-
-        prev_qty = st.session_state.position_qty
-        new_qty = prev_qty + qty
-
-        if new_qty > 0:
-            total_before = st.session_state.avg_cost * prev_qty
-            total_after = total_before + cost
-            st.session_state.avg_cost = total_after / new_qty
-
-        st.session_state.position_qty = new_qty
-
-    else:
-        realized = (price - st.session_state.avg_cost) * qty
-        st.session_state.realized_pnl += realized
-
-        st.session_state.cash += price * qty
-        st.session_state.position_qty -= qty
-
-        if st.session_state.position_qty == 0:
-            st.session_state.avg_cost = 0.0
-
-
 st.markdown('<div class="section-card"><div class="section-title">User Orders & P&L</div>', unsafe_allow_html=True)
 
-user_trades = None
 if df_trades is not None and not df_trades.empty:
-    user_trades = df_trades[df_trades["ORDER_ID"].isin(st.session_state.user_orders)]
-    user_trades = user_trades[user_trades["QUANTITY"] > 0]
-    user_trades = user_trades.sort_values("TRADE_ID")
-
-    for _, t in user_trades.iterrows():
-        update_user_pnl(t)
-
     last_prices = df_trades["PRICE"].tail(5)
-    last_price = float(last_prices.mean()) if len(last_prices) > 0 else st.session_state.avg_cost
+    last_price = float(last_prices.mean()) if len(last_prices) > 0 else portfolio.avg_cost
 
-    unrealized = (last_price - st.session_state.avg_cost) * st.session_state.position_qty
-    total_pnl = st.session_state.realized_pnl + unrealized
+    unrealized = portfolio.unrealized(last_price)
+    total_pnl = portfolio.realized_pnl + unrealized
 
     cA, cB, cC = st.columns(3)
     with cA:
-        st.metric("Cash", f"${st.session_state.cash:,.2f}")
-        st.metric("Position Qty", f"{st.session_state.position_qty}")
+        st.metric("Cash", f"${portfolio.cash:,.2f}")
+        st.metric("Position Qty", f"{portfolio.position}")
     with cB:
-        st.metric("Average Cost", f"${st.session_state.avg_cost:.2f}")
-        st.metric("Realized P&L", f"${st.session_state.realized_pnl:.2f}")
+        st.metric("Average Cost", f"${portfolio.avg_cost:.2f}")
+        st.metric("Realized P&L", f"${portfolio.realized_pnl:.2f}")
     with cC:
         st.metric("Unrealized P&L", f"${unrealized:.2f}")
         st.metric("Total P&L", f"${total_pnl:.2f}")
 else:
     st.info("No trades executed yet.")
 
-rows = []
-order_pnl = {}
-if user_trades is not None and not user_trades.empty:
-    pos_qty = 0
-    avg_cost = 0.0
-    for _, t in user_trades.iterrows():
-        oid = int(t["ORDER_ID"])
-        side = str(t["SIDE"]).lower()
-        price = float(t["PRICE"])
-        qty = int(t["QUANTITY"])
-        if side == "buy":
-            total_before = avg_cost * pos_qty
-            pos_qty += qty
-            avg_cost = (total_before + price * qty) / pos_qty if pos_qty > 0 else 0.0
-        else:
-            realized = (price - avg_cost) * qty
-            order_pnl[oid] = order_pnl.get(oid, 0.0) + realized
-            pos_qty -= qty
-            if pos_qty == 0:
-                avg_cost = 0.0
-
-filled_qty = {}
-avg_fill_price = {}
-if user_trades is not None and not user_trades.empty:
-    grouped = user_trades.groupby("ORDER_ID")
-    filled_qty = grouped["QUANTITY"].sum().to_dict()
-    avg_fill_price = (grouped.apply(lambda g: (g["PRICE"] * g["QUANTITY"]).sum() / g["QUANTITY"].sum())
-                      ).to_dict()
-
-for oid in sorted(st.session_state.user_orders):
-    meta = st.session_state.user_order_meta.get(oid, {})
-    side = meta.get("side", "")
-    qty = int(meta.get("qty", 0))
-    price = float(meta.get("price", 0.0))
-    otype = meta.get("type", "")
-    fqty = int(filled_qty.get(oid, 0))
-    avg_px = float(avg_fill_price.get(oid, 0.0)) if fqty > 0 else 0.0
-    remaining = max(qty - fqty, 0)
-    if fqty == 0:
-        status = "open"
-    elif fqty < qty:
-        status = "partially_filled"
-    else:
-        status = "filled"
-
-    rows.append(
-        {
-            "ORDER_ID": oid,
-            "SIDE": side,
-            "TYPE": otype,
-            "ORDER_QTY": qty,
-            "ORDER_PRICE": price,
-            "FILLED_QTY": fqty,
-            "AVG_FILL_PRICE": avg_px,
-            "REMAINING": remaining,
-            "STATUS": status,
-            "REALIZED_PNL": order_pnl.get(oid, 0.0) if side == "sell" else 0.0,
-        }
-    )
-
-if rows:
-    df_orders = pd.DataFrame(rows)
+if st.session_state.user_orders:
+    # One row per tracked order, built column-wise from the portfolio's
+    # per-order totals and the submitted order details.
+    stats = portfolio.order_stats()
+    ids = stats["ORDER_ID"].to_numpy()
+    meta = pd.DataFrame.from_dict(st.session_state.user_order_meta, orient="index").reindex(ids)
+    filled = stats["FILLED_QTY"].to_numpy()
+    order_qty = meta["qty"].to_numpy(np.int64)
+    cancelled = np.isin(ids, np.fromiter(st.session_state.cancelled_orders, np.int64))
+    df_orders = pd.DataFrame({
+        "ORDER_ID": ids,
+        "SIDE": meta["side"].to_numpy(),
+        "TYPE": meta["type"].to_numpy(),
+        "ORDER_QTY": order_qty,
+        "ORDER_PRICE": meta["price"].to_numpy(),
+        "FILLED_QTY": filled,
+        "AVG_FILL_PRICE": stats["AVG_FILL_PRICE"].to_numpy(),
+        "REMAINING": np.maximum(order_qty - filled, 0),
+        "STATUS": np.select(
+            [cancelled, filled == 0, filled < order_qty],
+            ["cancelled", "open", "partially_filled"],
+            "filled",
+        ),
+        "REALIZED_PNL": stats["REALIZED_PNL"].to_numpy(),
+    })
     st.dataframe(df_orders, use_container_width=True)
 else:
     st.info("No user orders yet.")
 st.markdown("</div>", unsafe_allow_html=True)
+
+st.markdown('<div class="section-card"><div class="section-title">Engine Diagnostics</div>', unsafe_allow_html=True)
+if st.button("Reset Diagnostics"):
+    lib.reset_engine_stats(st.session_state.book)
+stats = engine_stats(st.session_state.book)
+if not stats.enabled:
+    st.info("Instrumentation is compiled out of this build (-DORDERBOOK_NO_STATS).")
+else:
+    # Rates are taken over the interval since the previous render.
+    now = time.monotonic()
+    prev_time, prev_added = st.session_state.get("diag_prev", (now, stats.orders_added))
+    st.session_state.diag_prev = (now, stats.orders_added)
+    orders_per_second = max(0, stats.orders_added - prev_added) / (now - prev_time) if now > prev_time else 0.0
+
+    g1, g2, g3, g4 = st.columns(4)
+    with g1:
+        st.metric("Orders / s", f"{orders_per_second:,.0f}")
+        st.metric("Orders Added", f"{stats.orders_added:,}")
+    with g2:
+        st.metric("Fills", f"{stats.fills:,}")
+        st.metric(
+            "Levels Walked / Match",
+            f"{stats.levels_walked / stats.orders_matched:.2f}" if stats.orders_matched else "-",
+        )
+    with g3:
+        st.metric("Order Erases", f"{stats.order_erases:,}")
+        st.metric("Level Erases", f"{stats.level_erases:,}")
+    with g4:
+        st.metric("Queue Backlog", f"{stats.queue_backlog:,} / {stats.queue_capacity:,}")
+        st.metric("Cancels / Expiries", f"{stats.cancels:,} / {stats.expiries:,}")
+
+    st.dataframe(latency_table(stats), use_container_width=True)
+    hist_op = st.selectbox("Latency histogram", STATS_OPS, key="diag_hist_op")
+    hist = latency_histogram(st.session_state.book, hist_op)
+    if hist.empty:
+        st.caption("Nothing timed yet.")
+    else:
+        st.bar_chart(hist.set_index("UPPER_NS")["COUNT"])
+st.markdown("</div>", unsafe_allow_html=True)
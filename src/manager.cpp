@@ -0,0 +1,188 @@
+#include <algorithm>
+#include <chrono>
+#ifdef __linux__
+#include <pthread.h>
+#include <sched.h>
+#endif
+#include "order.h"
+#include "orderbook.h"
+#include "ingest.h"
+#include "journal.h"
+#include "manager.h"
+
+using namespace std;
+
+namespace {
+    // Pins `t` to one core so a shard's books stay in that core's caches.
+    void pinToCore(thread &t, size_t core) {
+#ifdef __linux__
+        cpu_set_t set;
+        CPU_ZERO(&set);
+        CPU_SET(static_cast<int>(core), &set);
+        pthread_setaffinity_np(t.native_handle(), sizeof(set), &set);
+#else
+        (void)t;
+        (void)core;
+#endif
+    }
+
+    void updateCounters(SymbolCounters &c, const BookView &view, int64_t applied) {
+        c.resting.store(static_cast<int64_t>(view.buy_orders + view.sell_orders), memory_order_relaxed);
+        c.bid_levels.store(static_cast<int64_t>(view.bid_levels.size()), memory_order_relaxed);
+        c.ask_levels.store(static_cast<int64_t>(view.ask_levels.size()), memory_order_relaxed);
+        c.best_bid.store(view.bid_levels.empty() ? 0 : view.bid_levels[0].price, memory_order_relaxed);
+        c.best_ask.store(view.ask_levels.empty() ? 0 : view.ask_levels[0].price, memory_order_relaxed);
+        c.events.store(view.events, memory_order_relaxed);
+        c.trades.store(view.trades, memory_order_relaxed);
+        c.commands.store(c.commands.load(memory_order_relaxed) + applied, memory_order_relaxed);
+    }
+
+    void publishSymbol(BookManager &m, int32_t symbol, int64_t applied) {
+        OrderBook &book = *m.books[symbol];
+        publishView(book);
+        updateCounters(*m.counters[symbol], *atomic_load(&book.ingest->view), applied);
+    }
+
+    // Same drain/publish cycle as a single book's matching thread
+    // (ingest.cpp), over every book of the shard. Only books that received
+    // commands since the last publish are rebuilt.
+    void shardLoop(BookManager *m, Shard *shard) {
+        size_t stride = m->shards.size();
+        vector<int64_t> applied(shard->symbols.size(), 0);
+        vector<int32_t> dirty;
+        RoutedCommand r;
+        auto last_publish = chrono::steady_clock::now();
+        chrono::steady_clock::duration publish_gap{0};
+
+        for (;;) {
+            size_t drained = 0;
+            while (drained < kDrainBatch && shard->ring.try_pop(r)) {
+                applyCommand(*m->books[r.symbol], r.cmd);
+                size_t local = static_cast<size_t>(r.symbol) / stride;
+                if (applied[local]++ == 0) dirty.push_back(r.symbol);
+                ++drained;
+            }
+
+            auto now = chrono::steady_clock::now();
+            auto since = now - last_publish;
+            if (!dirty.empty() && (drained == 0 || (since >= kPublishInterval && since >= publish_gap))) {
+                for (int32_t symbol : dirty) {
+                    size_t local = static_cast<size_t>(symbol) / stride;
+                    if (drained == 0) flushJournal(*m->books[symbol]);
+                    publishSymbol(*m, symbol, applied[local]);
+                    applied[local] = 0;
+                }
+                dirty.clear();
+                last_publish = chrono::steady_clock::now();
+                publish_gap = (last_publish - now) * kPublishCostShare;
+            }
+
+            if (drained == 0) {
+                if (!shard->running.load(memory_order_acquire)) break;
+                this_thread::sleep_for(kIdleSleep);
+            }
+        }
+    }
+}
+
+BookManager::~BookManager() {
+    stopManager(*this);
+}
+
+// Adds a book and returns its symbol id, or -1 while the manager runs.
+int32_t addSymbol(BookManager &manager, double tickSize) {
+    if (!manager.shards.empty()) return -1;
+    manager.books.emplace_back(new OrderBook(tickSize));
+    manager.counters.emplace_back(new SymbolCounters());
+    return static_cast<int32_t>(manager.books.size() - 1);
+}
+
+// Starts the workers, one shard each, pinned to consecutive cores. Books
+// that had their own matching thread are moved onto their shard.
+void startManager(BookManager &manager) {
+    if (!manager.shards.empty() || manager.books.empty()) return;
+    size_t cores = max<size_t>(1, thread::hardware_concurrency());
+    size_t n = manager.workers > 0 ? manager.workers : cores;
+    n = min(n, manager.books.size());
+    for (size_t i = 0; i < n; ++i) manager.shards.emplace_back(new Shard(manager.capacity));
+
+    for (size_t s = 0; s < manager.books.size(); ++s) {
+        OrderBook &book = *manager.books[s];
+        Shard &shard = *manager.shards[s % n];
+        stopIngest(book);
+        book.ingest.reset(new Ingest(2));
+        book.ingest->shard = &shard;
+        book.ingest->symbol = static_cast<int32_t>(s);
+        shard.symbols.push_back(static_cast<int32_t>(s));
+        publishSymbol(manager, static_cast<int32_t>(s), 0);
+    }
+    for (size_t i = 0; i < n; ++i) {
+        Shard &shard = *manager.shards[i];
+        shard.running.store(true, memory_order_release);
+        shard.worker = thread(shardLoop, &manager, &shard);
+        pinToCore(shard.worker, i % cores);
+    }
+    manager.running_shards.store(static_cast<int64_t>(n), memory_order_relaxed);
+}
+
+// Drains every shard, joins the workers and leaves the books in
+// synchronous mode. Producers and view readers must have stopped; the
+// stats calls stay safe throughout.
+void stopManager(BookManager &manager) {
+    for (auto &shard : manager.shards) shard->running.store(false, memory_order_release);
+    for (auto &shard : manager.shards) {
+        if (shard->worker.joinable()) shard->worker.join();
+    }
+    for (auto &shard : manager.shards) {
+        for (int32_t symbol : shard->symbols) manager.books[symbol]->ingest.reset();
+    }
+    manager.shards.clear();
+    manager.running_shards.store(0, memory_order_relaxed);
+}
+
+// Queues a command for the book of `symbol`; returns false if its shard's
+// queue is full or the symbol is unknown. While the manager is stopped the
+// command is applied immediately.
+bool routeCommand(BookManager &manager, int32_t symbol, const Command &cmd) {
+    if (symbol < 0 || static_cast<size_t>(symbol) >= manager.books.size()) return false;
+    if (manager.shards.empty()) {
+        applyCommand(*manager.books[symbol], cmd);
+        return true;
+    }
+    return routeCommand(*manager.shards[symbol % manager.shards.size()], symbol, cmd);
+}
+
+bool routeCommand(Shard &shard, int32_t symbol, const Command &cmd) {
+    return shard.ring.try_push(RoutedCommand{symbol, cmd});
+}
+
+// Figures as of the book's last published view.
+void symbolStats(const BookManager &manager, int32_t symbol, SymbolStats &out) {
+    const SymbolCounters &c = *manager.counters[symbol];
+    out.resting = c.resting.load(memory_order_relaxed);
+    out.bid_levels = c.bid_levels.load(memory_order_relaxed);
+    out.ask_levels = c.ask_levels.load(memory_order_relaxed);
+    out.best_bid = c.best_bid.load(memory_order_relaxed);
+    out.best_ask = c.best_ask.load(memory_order_relaxed);
+    out.events = c.events.load(memory_order_relaxed);
+    out.trades = c.trades.load(memory_order_relaxed);
+    out.commands = c.commands.load(memory_order_relaxed);
+}
+
+// Sums the per-book counters without stopping any worker, so the totals
+// may mix books published at slightly different instants.
+void managerStats(const BookManager &manager, ManagerStats &out) {
+    out = ManagerStats{};
+    out.books = static_cast<int64_t>(manager.books.size());
+    out.shards = manager.running_shards.load(memory_order_relaxed);
+    SymbolStats s;
+    for (size_t i = 0; i < manager.books.size(); ++i) {
+        symbolStats(manager, static_cast<int32_t>(i), s);
+        out.resting += s.resting;
+        out.bid_levels += s.bid_levels;
+        out.ask_levels += s.ask_levels;
+        out.events += s.events;
+        out.trades += s.trades;
+        out.commands += s.commands;
+    }
+}
@@ -1,90 +1,238 @@
 #include <iostream>
 #include <algorithm>
-#include <ctime>
 #include <random>
-#include <chrono>
 #include <cmath>
 #include "order.h"
 #include "orderbook.h"
 using namespace std;
 
 namespace {
-    struct RandomConfig {
-        float tick_size = 0.01f;
-        float price_sigma = 1.5f;
-        float market_prob = 0.1f;
-        float cross_prob = 0.15f;
-        int expiry_seconds = 0; // 0 = GTC
-        int min_qty = 1;
-        int max_qty = 200;
-    };
-
-    RandomConfig g_cfg;
-
-    float snap_to_tick(float price, float tick) {
-        if (tick <= 0.0f) return price;
-        return roundf(price / tick) * tick;
+    // Cap on the live orders a generator remembers as cancel/modify targets.
+    const size_t kMaxLive = size_t(1) << 16;
+    // Bound on |size_mu|; exp(20) is already past any int32 quantity.
+    const double kMaxSizeMu = 20.0;
+
+    // Snaps a decimal price to the generator's tick, expressed as a whole
+    // number of book ticks (the generator tick is rounded to a multiple of it).
+    int64_t snap_to_ticks(double price, double tick, double bookTick) {
+        int64_t step = max<int64_t>(1, llround(tick / bookTick));
+        int64_t ticks = llround(price / (bookTick * step)) * step;
+        return max(step, ticks);
     }
 
-    int clamp_qty(int qty, int min_qty, int max_qty) {
-        if (qty < min_qty) return min_qty;
+    // Clamps in double, so an out-of-range or NaN draw never reaches the
+    // int conversion.
+    int clamp_qty(double qty, int min_qty, int max_qty) {
+        if (!(qty >= min_qty)) return min_qty;
         if (qty > max_qty) return max_qty;
-        return qty;
+        return static_cast<int>(qty);
     }
 }
 
-void setRandomConfig(float tick_size,
-                     float price_sigma,
-                     float market_prob,
-                     float cross_prob,
-                     int expiry_seconds,
-                     int min_qty,
-                     int max_qty) {
-    if (tick_size > 0.0f) g_cfg.tick_size = tick_size;
-    if (price_sigma > 0.0f) g_cfg.price_sigma = price_sigma;
-    if (market_prob >= 0.0f && market_prob <= 1.0f) g_cfg.market_prob = market_prob;
-    if (cross_prob >= 0.0f && cross_prob <= 1.0f) g_cfg.cross_prob = cross_prob;
-    if (expiry_seconds >= 0) g_cfg.expiry_seconds = expiry_seconds;
-    if (min_qty > 0) g_cfg.min_qty = min_qty;
-    if (max_qty >= g_cfg.min_qty) g_cfg.max_qty = max_qty;
-}
-
-order randomOrder(int &nextID, float basePrice){
-    static thread_local mt19937 generator(random_device{}());
-    normal_distribution<float> price_dist(0.0f, g_cfg.price_sigma);
-    lognormal_distribution<float> size_dist(3.0f, 0.6f);
-    order newOrder;
-    newOrder.id = nextID++;
-    string side;
-    int randint = rand()%2;
-    side = (randint == 0) ? "buy" : "sell";
-    newOrder.side = side;
-    int qty = static_cast<int>(size_dist(generator));
-    newOrder.quantity = clamp_qty(qty, g_cfg.min_qty, g_cfg.max_qty);
-
-    float base = max(g_cfg.tick_size, basePrice);
-    float offset = fabs(price_dist(generator));
-    float r_cross = std::generate_canonical<float, 10>(generator);
-    bool cross = r_cross < g_cfg.cross_prob;
-    float raw_price;
-    if (side == "buy") {
-        raw_price = cross ? (base + offset) : (base - offset);
-    } else {
-        raw_price = cross ? (base - offset) : (base + offset);
+const char* sideName(Side side) {
+    return side == Side::Buy ? "buy" : "sell";
+}
+
+const char* typeName(OrderType type) {
+    return type == OrderType::Market ? "market" : "limit";
+}
+
+const char* statusName(OrderStatus status) {
+    switch (status) {
+        case OrderStatus::Open: return "open";
+        case OrderStatus::Closed: return "closed";
+        case OrderStatus::Expired: return "expired";
+        case OrderStatus::Cancelled: return "cancelled";
+    }
+    return "unknown";
+}
+
+Side parseSide(const char* side) {
+    return (side && string(side) == "sell") ? Side::Sell : Side::Buy;
+}
+
+OrderType parseType(const char* type) {
+    return (type && string(type) == "market") ? OrderType::Market : OrderType::Limit;
+}
+
+FlowGenerator::FlowGenerator(uint64_t seed) : rng(seed), cfg(make_shared<FlowConfig>()) {}
+
+void FlowGenerator::seed(uint64_t seed) {
+    rng.seed(seed);
+    normal.reset();
+    exponential.reset();
+    uniform.reset();
+    t = 0.0;
+    window_end = 0.0;
+    excitation = 0.0;
+    pending = -1.0;
+    live.clear();
+}
+
+void FlowGenerator::setConfig(const FlowConfig &in) {
+    FlowConfig c = config();
+    if (in.tick_size > 0.0) c.tick_size = in.tick_size;
+    if (in.price_sigma > 0.0) c.price_sigma = in.price_sigma;
+    if (in.market_prob >= 0.0 && in.market_prob <= 1.0) c.market_prob = in.market_prob;
+    if (in.cross_prob >= 0.0 && in.cross_prob <= 1.0) c.cross_prob = in.cross_prob;
+    if (isfinite(in.size_mu)) c.size_mu = min(kMaxSizeMu, max(-kMaxSizeMu, in.size_mu));
+    if (in.size_sigma >= 0.0 && isfinite(in.size_sigma)) c.size_sigma = in.size_sigma;
+    if (in.rate > 0.0) c.rate = in.rate;
+    // A Hawkes process only stays stationary while alpha < beta.
+    if (in.hawkes_beta > 0.0) c.hawkes_beta = in.hawkes_beta;
+    if (in.hawkes_alpha >= 0.0 && in.hawkes_alpha < c.hawkes_beta) c.hawkes_alpha = in.hawkes_alpha;
+    if (c.hawkes_alpha >= c.hawkes_beta) c.hawkes_alpha = 0.5 * c.hawkes_beta;
+    if (in.cancel_prob >= 0.0 && in.modify_prob >= 0.0 && in.cancel_prob + in.modify_prob <= 1.0) {
+        c.cancel_prob = in.cancel_prob;
+        c.modify_prob = in.modify_prob;
+    }
+    if (in.expiry_seconds >= 0) c.expiry_seconds = in.expiry_seconds;
+    if (in.min_qty > 0) c.min_qty = in.min_qty;
+    if (in.max_qty >= c.min_qty) c.max_qty = in.max_qty;
+    if (c.max_qty < c.min_qty) c.max_qty = c.min_qty;
+    if (in.arrival <= ArrivalModel::Hawkes) c.arrival = in.arrival;
+    restoreConfig(c);
+}
+
+void FlowGenerator::restoreConfig(const FlowConfig &c) {
+    atomic_store(&cfg, shared_ptr<const FlowConfig>(make_shared<FlowConfig>(c)));
+}
+
+FlowConfig FlowGenerator::config() const {
+    return *atomic_load(&cfg);
+}
+
+size_t FlowGenerator::generate(FlowEvent *out, size_t n, int64_t &nextID, double basePrice,
+                               double bookTick, int64_t now) {
+    shared_ptr<const FlowConfig> c = atomic_load(&cfg);
+    for (size_t i = 0; i < n; ++i) {
+        out[i].arrival = pending >= 0.0 ? pending : nextArrival(*c);
+        pending = -1.0;
+        nextEvent(*c, out[i], nextID, basePrice, bookTick, now);
     }
-    float snapped = snap_to_tick(raw_price, g_cfg.tick_size);
-    newOrder.price = max(g_cfg.tick_size, snapped);
-    newOrder.time = time(0);
-    if (g_cfg.expiry_seconds > 0) {
-        newOrder.expiry = newOrder.time + g_cfg.expiry_seconds;
-    } else {
-        newOrder.expiry = 0;
+    if (n > 0) window_end = max(window_end, out[n - 1].arrival);
+    return n;
+}
+
+size_t FlowGenerator::generateWindow(double window, FlowEvent *out, size_t max, int64_t &nextID,
+                                     double basePrice, double bookTick, int64_t now) {
+    size_t n = drawWindow(window, out, max);
+    fillEvents(out, n, nextID, basePrice, bookTick, now);
+    return n;
+}
+
+size_t FlowGenerator::drawWindow(double window, FlowEvent *out, size_t max) {
+    shared_ptr<const FlowConfig> c = atomic_load(&cfg);
+    window_end += window;
+    size_t n = 0;
+    while (n < max) {
+        if (pending < 0.0) pending = nextArrival(*c);
+        if (pending >= window_end) break;
+        out[n++].arrival = pending;
+        pending = -1.0;
+    }
+    return n;
+}
+
+void FlowGenerator::fillEvents(FlowEvent *out, size_t n, int64_t &nextID, double basePrice,
+                               double bookTick, int64_t now) {
+    shared_ptr<const FlowConfig> c = atomic_load(&cfg);
+    for (size_t i = 0; i < n; ++i) nextEvent(*c, out[i], nextID, basePrice, bookTick, now);
+}
+
+order FlowGenerator::nextOrder(int64_t &nextID, double basePrice, double bookTick, int64_t now) {
+    shared_ptr<const FlowConfig> c = atomic_load(&cfg);
+    return makeOrder(*c, nextID, basePrice, bookTick, now);
+}
+
+double FlowGenerator::nextArrival(const FlowConfig &c) {
+    switch (c.arrival) {
+        case ArrivalModel::Regular:
+            t += 1.0 / c.rate;
+            return t;
+        case ArrivalModel::Poisson:
+            t += exponential(rng) / c.rate;
+            return t;
+        case ArrivalModel::Hawkes:
+            // Ogata thinning: propose at the current (upper bound) intensity,
+            // decay the excitation to the proposal and accept in proportion.
+            for (;;) {
+                double bound = c.rate + excitation;
+                double wait = exponential(rng) / bound;
+                t += wait;
+                excitation *= exp(-c.hawkes_beta * wait);
+                if (uniform(rng) * bound <= c.rate + excitation) {
+                    excitation += c.hawkes_alpha;
+                    return t;
+                }
+            }
     }
+    return t;
+}
 
-    float r = std::generate_canonical<float, 10>(generator);
-    newOrder.type = (r < g_cfg.market_prob) ? "market" : "limit";
-    newOrder.status = "open";
+void FlowGenerator::nextEvent(const FlowConfig &c, FlowEvent &e, int64_t &nextID,
+                              double basePrice, double bookTick, int64_t now) {
+    double u = uniform(rng);
+    if (!live.empty() && u < c.cancel_prob + c.modify_prob) {
+        size_t k = static_cast<size_t>(uniform(rng) * live.size());
+        if (k >= live.size()) k = live.size() - 1;
+        Live &target = live[k];
+        e.o = order{};
+        e.o.id = target.id;
+        e.o.side = target.side;
+        if (u < c.cancel_prob) {
+            e.action = FlowAction::Cancel;
+            e.o.price = target.price;
+            target = live.back();
+            live.pop_back();
+        } else {
+            // Half the modifies keep their price (an amend when the size
+            // shrinks), the rest move to a new passive price.
+            e.action = FlowAction::Modify;
+            e.o.quantity = drawQuantity(c);
+            if (uniform(rng) >= 0.5) target.price = drawPrice(c, target.side, false, basePrice, bookTick);
+            e.o.price = target.price;
+            e.o.time = now;
+        }
+        return;
+    }
+    e.action = FlowAction::Add;
+    e.o = makeOrder(c, nextID, basePrice, bookTick, now);
+    if (e.o.type == OrderType::Limit) {
+        Live entry{e.o.id, e.o.price, e.o.side};
+        if (live.size() < kMaxLive) {
+            live.push_back(entry);
+        } else {
+            live[static_cast<size_t>(uniform(rng) * (kMaxLive - 1))] = entry;
+        }
+    }
+}
 
+// Draws the next order from this generator's stream only. `now` is the
+// engine clock (ns).
+order FlowGenerator::makeOrder(const FlowConfig &c, int64_t &nextID, double basePrice,
+                               double bookTick, int64_t now) {
+    order newOrder{};
+    newOrder.id = nextID++;
+    Side side = uniform(rng) < 0.5 ? Side::Buy : Side::Sell;
+    newOrder.side = side;
+    newOrder.quantity = drawQuantity(c);
+    bool cross = uniform(rng) < c.cross_prob;
+    newOrder.price = drawPrice(c, side, cross, basePrice, bookTick);
+    newOrder.time = now;
+    newOrder.expiry = c.expiry_seconds > 0 ? newOrder.time + c.expiry_seconds * kNanosPerSecond : 0;
+    newOrder.type = uniform(rng) < c.market_prob ? OrderType::Market : OrderType::Limit;
+    newOrder.status = OrderStatus::Open;
     return newOrder;
 }
 
+int64_t FlowGenerator::drawPrice(const FlowConfig &c, Side side, bool cross, double basePrice, double bookTick) {
+    double base = max<double>(c.tick_size, basePrice);
+    double offset = fabs(normal(rng) * c.price_sigma);
+    bool above = (side == Side::Buy) == cross;
+    return snap_to_ticks(above ? base + offset : base - offset, c.tick_size, bookTick);
+}
+
+int32_t FlowGenerator::drawQuantity(const FlowConfig &c) {
+    return clamp_qty(exp(c.size_mu + c.size_sigma * normal(rng)), c.min_qty, c.max_qty);
+}
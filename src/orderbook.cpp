@@ -1,193 +1,539 @@
 #include <iostream>
 #include <algorithm>
+#include <cmath>
 #include "order.h"
 #include "orderbook.h"
+#include "ingest.h"
+#include "journal.h"
 
 using namespace std;
 
-static void recordTrade(OrderBook &book, const order &o, int tradedQty, float execPrice) {
+OrderBook::OrderBook(double tick)
+    : tick_size(tick), buy(LadderOrder{true}), sell(LadderOrder{false}) {
+    index.reserve(4096);
+}
+
+OrderBook::~OrderBook() {
+    stopIngest(*this);
+    closeJournal(*this);
+}
+
+static void recordEvent(OrderBook &book, EventKind kind, const order &o,
+                        int32_t quantity, int64_t price, int64_t otherID = 0) {
+    Event e{};
+    e.seq = static_cast<int64_t>(book.events.size()) + 1;
+    e.order_id = o.id;
+    e.other_id = otherID;
+    e.time = book.now;
+    e.price = price;
+    e.quantity = quantity;
+    e.kind = kind;
+    e.side = o.side;
+    book.events.push_back(e);
+}
+
+// Records one execution: a Fill event for each order and a single trade.
+static void recordTrade(OrderBook &book, const order &taker, const order &maker,
+                        int tradedQty, int64_t execPrice) {
     if (tradedQty <= 0) return;
+    recordEvent(book, EventKind::Fill, taker, tradedQty, execPrice, maker.id);
+    recordEvent(book, EventKind::Fill, maker, tradedQty, execPrice, taker.id);
     OrderBook::Trade t;
     t.trade_id = book.next_trade_id++;
-    t.order_id = o.id;
-    t.side = o.side;
+    t.taker_id = taker.id;
+    t.maker_id = maker.id;
+    t.side = taker.side;
     t.price = execPrice;
     t.quantity = tradedQty;
-    t.time = time(0);
+    t.time = book.now;
     book.trades.push_back(t);
 }
 
+// Applies a change of `delta` in open quantity at `level` to the level
+// aggregate and the side totals, and stamps the level as changed. Every
+// change to a level's orders goes through here.
+static void adjustDepth(OrderBook &book, Side side, PriceLevel &level,
+                        int64_t price, int64_t delta) {
+    level.quantity += delta;
+    level.version = ++book.level_version;
+    if (side == Side::Buy) {
+        book.bid_depth += delta;
+        book.bid_notional += delta * price;
+    } else {
+        book.ask_depth += delta;
+        book.ask_notional += delta * price;
+    }
+}
+
+// Walks the opposite ladder from its best level, filling the FIFO queue of
+// each level in turn until the incoming order is done or no longer crosses.
+static void matchAgainst(OrderBook &book, order &newOrder, Ladder &ladder) {
+    while (newOrder.quantity > 0 && !ladder.empty()) {
+        auto level = ladder.begin();
+        // A limit crosses unless it sorts strictly before the best level,
+        // e.g. a buy at 99 against asks starting at 100.
+        bool price_ok =
+            (newOrder.type == OrderType::Market) ||
+            !ladder.key_comp()(newOrder.price, level->first);
 
-void matchOrders(OrderBook &book, order &newOrder) {
-    orderExpiry(book);
-    if (newOrder.quantity <= 0) return;
+        if (!price_ok) {
+            break;
+        }
+        book.stats.levels_walked.add(1);
 
-    if (newOrder.side == "buy") {
-        for (auto it = book.sell.begin();
-             it != book.sell.end() && newOrder.quantity > 0; ) {
+        list<order> &queue = level->second.orders;
+        while (newOrder.quantity > 0 && !queue.empty()) {
+            order &resting = queue.front();
+            int traded = min(newOrder.quantity, resting.quantity);
 
-            bool price_ok =
-                (newOrder.type == "market") ||
-                (newOrder.price >= it->price);
+            int64_t exec_price = level->first;
+            recordTrade(book, newOrder, resting, traded, exec_price);
 
-            if (!price_ok) {
-                break;
-            }
+            newOrder.quantity -= traded;
+            resting.quantity  -= traded;
+            adjustDepth(book, resting.side, level->second, exec_price, -traded);
+            book.stats.fills.add(1);
 
-            int traded = min(newOrder.quantity, it->quantity);
-            if (traded <= 0) {
-                ++it;
-                continue;
+            if (resting.quantity <= 0) {
+                resting.status = OrderStatus::Closed;
+                book.index.erase(resting.id);
+                queue.pop_front();
+                book.stats.order_erases.add(1);
             }
+        }
 
-            float exec_price = it->price;
-            recordTrade(book, newOrder, traded, exec_price);
-            recordTrade(book, *it,      traded, exec_price);
+        if (queue.empty()) {
+            ladder.erase(level);
+            book.stats.level_erases.add(1);
+        }
+    }
+}
 
-            newOrder.quantity -= traded;
-            it->quantity      -= traded;
+void matchOrders(OrderBook &book, order &newOrder) {
+    if (newOrder.quantity <= 0) return;
 
-            //cout << "Traded quantity " << traded << "\n";
+    if (newOrder.side == Side::Buy) {
+        matchAgainst(book, newOrder, book.sell);
+    } else {
+        matchAgainst(book, newOrder, book.buy);
+    }
 
-            if (it->quantity == 0) {
-                it->status = "closed";
-                it = book.sell.erase(it);
-                //cout << "Resting sell order fully filled and removed\n";
-            } else {
-                ++it;
-            }
-        }
-    } else { 
-        for (auto it = book.buy.begin();
-             it != book.buy.end() && newOrder.quantity > 0; ) {
+    if (newOrder.type == OrderType::Market) {
+        newOrder.quantity = 0;
+        newOrder.status   = OrderStatus::Closed;
+    }
+}
 
-            bool price_ok =
-                (newOrder.type == "market") ||
-                (newOrder.price <= it->price);
+// Auction mode: the order is collected, unseen by the book, until the next
+// auction.
+static void collectOrder(OrderBook &book, order &newOrder) {
+    book.stats.orders_added.add(1);
+    if (newOrder.quantity <= 0) {
+        newOrder.status = OrderStatus::Closed;
+        return;
+    }
+    book.auction_index[newOrder.id] = book.auction_orders.size();
+    book.auction_orders.push_back(newOrder);
+}
 
-            if (!price_ok) {
-                break;
-            }
+void addOrder(OrderBook &book, order &newOrder) {
+    orderExpiry(book);
+    int64_t started = book.stats.sampler.start();
+    if (book.match_mode == MatchMode::Auction) {
+        collectOrder(book, newOrder);
+        LatencySampler::finish(book.stats.add, started);
+        return;
+    }
+    int64_t fills = book.stats.fills.get();
+    matchOrders(book, newOrder);
+    bool traded = book.stats.fills.get() != fills;
+    book.stats.orders_added.add(1);
+    if (traded) book.stats.orders_matched.add(1);
 
-            int traded = min(newOrder.quantity, it->quantity);
-            if (traded <= 0) {
-                ++it;
-                continue;
-            }
+    if (newOrder.type == OrderType::Market || newOrder.quantity <= 0) {
+        newOrder.status = OrderStatus::Closed;
+    } else {
+        restOrder(book, newOrder);
+        recordEvent(book, EventKind::Add, newOrder, newOrder.quantity, newOrder.price);
+    }
+    LatencySampler::finish(traded ? book.stats.match : book.stats.add, started);
+}
 
-            float exec_price = it->price;
-            recordTrade(book, newOrder, traded, exec_price);
-            recordTrade(book, *it,      traded, exec_price);
+// Puts an order on the book without matching it or emitting an event, e.g.
+// when restoring a checkpoint. Orders at one price must arrive in queue order.
+void restOrder(OrderBook &book, const order &o) {
+    if (o.expiry > 0) book.expiries.push({o.expiry, o.id});
+    // Appending to the level's queue keeps FIFO order at that price.
+    Ladder &ladder = (o.side == Side::Buy) ? book.buy : book.sell;
+    auto level = ladder.try_emplace(o.price).first;
+    list<order> &queue = level->second.orders;
+    queue.push_back(o);
+    adjustDepth(book, o.side, level->second, o.price, o.quantity);
+    book.index[o.id] = OrderLocation{level, prev(queue.end())};
+}
 
-            newOrder.quantity -= traded;
-            it->quantity      -= traded;
+// Takes a resting order out of its queue and the index, dropping its level
+// if it was the last order there.
+static void unlinkResting(OrderBook &book, OrderLocation loc) {
+    Ladder &ladder = (loc.it->side == Side::Buy) ? book.buy : book.sell;
+    adjustDepth(book, loc.it->side, loc.level->second, loc.it->price, -loc.it->quantity);
+    book.index.erase(loc.it->id);
+    loc.level->second.orders.erase(loc.it);
+    book.stats.order_erases.add(1);
+    if (loc.level->second.orders.empty()) {
+        ladder.erase(loc.level);
+        book.stats.level_erases.add(1);
+    }
+}
 
-            //cout << "Traded quantity " << traded << "\n";
+// Moves a resting order to the fulfilled list with `status`.
+static void removeResting(OrderBook &book, OrderLocation loc, OrderStatus status) {
+    loc.it->status = status;
+    book.fulfilled.push_back(*loc.it);
+    recordEvent(book, status == OrderStatus::Expired ? EventKind::Expire : EventKind::Cancel,
+                *loc.it, loc.it->quantity, loc.it->price);
+    unlinkResting(book, loc);
+}
 
-            if (it->quantity == 0) {
-                it->status = "closed";
-                it = book.buy.erase(it);
-                //cout << "Resting buy order fully filled and removed\n";
-            } else {
-                ++it;
-            }
-        }
+// An order collected for the next auction, or null.
+static order* findCollected(OrderBook &book, int64_t orderID) {
+    auto found = book.auction_index.find(orderID);
+    return found == book.auction_index.end() ? nullptr : &book.auction_orders[found->second];
+}
+
+// Takes an order out of the next auction; its slot is left with quantity 0.
+static void dropCollected(OrderBook &book, order &o) {
+    book.auction_index.erase(o.id);
+    o.quantity = 0;
+}
+
+bool cancelOrder(OrderBook &book, int64_t orderID){
+    int64_t started = book.stats.sampler.start();
+    auto found = book.index.find(orderID);
+    if (found != book.index.end()) {
+        removeResting(book, found->second, OrderStatus::Cancelled);
+    } else if (order *collected = findCollected(book, orderID)) {
+        collected->status = OrderStatus::Cancelled;
+        book.fulfilled.push_back(*collected);
+        recordEvent(book, EventKind::Cancel, *collected, collected->quantity, collected->price);
+        dropCollected(book, *collected);
+    } else {
+        return false;
     }
+    book.stats.cancels.add(1);
+    LatencySampler::finish(book.stats.cancel, started);
+    return true;
+}
 
-    if (newOrder.type == "market") {
-        if (newOrder.quantity > 0) {
-            //cout << "Market order " << newOrder.id
-              //   << " not fully filled, leftover " << newOrder.quantity
-                // << " discarded\n";
+// Cancel/replace. Reducing the quantity at the same price amends the order in
+// place and keeps its queue position; any other change re-submits it under the
+// same id at the back of the queue (and may trade if the new price crosses).
+// An order collected for the next auction is changed the same way, with its
+// arrival order standing in for the queue position.
+bool modifyOrder(OrderBook &book, int64_t orderID, int quantity, int64_t price){
+    auto found = book.index.find(orderID);
+    order *collected = found == book.index.end() ? findCollected(book, orderID) : nullptr;
+    if (found == book.index.end() && !collected) return false;
+    if (quantity <= 0) return cancelOrder(book, orderID);
+
+    order &current = collected ? *collected : *found->second.it;
+    if (price == current.price && quantity <= current.quantity) {
+        if (!collected) {
+            adjustDepth(book, current.side, found->second.level->second, price,
+                        quantity - current.quantity);
         }
-        newOrder.quantity = 0;
-        newOrder.status   = "closed";
+        current.quantity = quantity;
+        recordEvent(book, EventKind::Amend, current, quantity, price);
+        return true;
     }
+
+    order replacement = current;
+    recordEvent(book, EventKind::Replace, current, current.quantity, current.price);
+    if (collected) {
+        dropCollected(book, *collected);
+    } else {
+        unlinkResting(book, found->second);
+    }
+    replacement.quantity = quantity;
+    replacement.price = price;
+    replacement.time = book.now;
+    addOrder(book, replacement);
+    return true;
 }
 
-void addOrder(OrderBook &book, order &newOrder) {
-    orderExpiry(book);
-    matchOrders(book, newOrder);
+double ticksToPrice(const OrderBook &book, int64_t ticks){
+    return ticks * book.tick_size;
+}
 
-    if (newOrder.type == "market" || newOrder.quantity <= 0) {
-        newOrder.status = "closed";
-        return;
+int64_t priceToTicks(const OrderBook &book, double price){
+    return llround(price / book.tick_size);
+}
+
+// Bounds the in-memory trade, fulfilled and event history to the newest
+// `records` records each. Older records are appended to trades.seg,
+// fulfilled.seg and events.seg under `spillDir`, or dropped if it is empty.
+// Only valid before the book has any history.
+bool setRetention(OrderBook &book, size_t records, const string &spillDir){
+    string prefix = spillDir.empty() ? "" : spillDir + "/";
+    return book.trades.set_retention(records, spillDir.empty() ? "" : prefix + "trades.seg") &&
+           book.fulfilled.set_retention(records, spillDir.empty() ? "" : prefix + "fulfilled.seg") &&
+           book.events.set_retention(records, spillDir.empty() ? "" : prefix + "events.seg");
+}
+
+TopOfBook topOfBook(const OrderBook &book){
+    TopOfBook m{};
+    m.bid_levels = static_cast<int64_t>(book.buy.size());
+    m.ask_levels = static_cast<int64_t>(book.sell.size());
+    m.depth_bid = book.bid_depth;
+    m.depth_ask = book.ask_depth;
+    if (!book.buy.empty()) {
+        const auto &best = *book.buy.begin();
+        m.best_bid = ticksToPrice(book, best.first);
+        m.best_bid_qty = best.second.quantity;
+        m.queue_pressure = static_cast<double>(m.best_bid_qty) / book.bid_depth;
+        m.vwap_bid = book.bid_notional * book.tick_size / book.bid_depth;
+    }
+    if (!book.sell.empty()) {
+        const auto &best = *book.sell.begin();
+        m.best_ask = ticksToPrice(book, best.first);
+        m.best_ask_qty = best.second.quantity;
+        m.vwap_ask = book.ask_notional * book.tick_size / book.ask_depth;
     }
+    if (!book.buy.empty() && !book.sell.empty()) {
+        double bid = m.best_bid, ask = m.best_ask;
+        double bidQty = static_cast<double>(m.best_bid_qty);
+        double askQty = static_cast<double>(m.best_ask_qty);
+        m.midprice = (bid + ask) / 2;
+        m.relative_spread = (ask - bid) / m.midprice;
+        m.obi = static_cast<double>(m.depth_bid - m.depth_ask) / (m.depth_bid + m.depth_ask);
+        m.ofi = bid * bidQty - ask * askQty;
+        m.microprice = (ask * bidQty + bid * askQty) / (bidQty + askQty);
+    }
+    return m;
+}
 
-    if (newOrder.side == "buy") {
-        size_t i = 0;
-        for (; i < book.buy.size(); ++i) {
-            if (newOrder.price > book.buy[i].price) {
-                break;
-            }
-        }
-        for (; i < book.buy.size(); ++i) {
-            if (newOrder.price != book.buy[i].price) {
-                break;
-            }
-        }
-        book.buy.insert(book.buy.begin() + i, newOrder);
-    } else { 
-        size_t i = 0;
-        for (; i < book.sell.size(); ++i) {
-            if (newOrder.price < book.sell[i].price) {
-                break;
-            }
-        }
-        for (; i < book.sell.size(); ++i) {
-            if (newOrder.price != book.sell[i].price) {
-                break;
-            }
-        }
-        book.sell.insert(book.sell.begin() + i, newOrder);
+// Copies up to `levels` aggregated levels of one side, best first, into
+// `out` and returns how many were copied. O(levels).
+size_t l2Depth(const OrderBook &book, Side side, size_t levels, DepthLevel *out){
+    const Ladder &ladder = (side == Side::Buy) ? book.buy : book.sell;
+    size_t n = 0;
+    for (auto it = ladder.begin(); it != ladder.end() && n < levels; ++it, ++n) {
+        out[n] = DepthLevel{it->first, it->second.quantity,
+                            static_cast<int64_t>(it->second.orders.size())};
     }
+    return n;
 }
 
-void cancelOrder(OrderBook &book, int orderID){
-    for (auto it = book.buy.begin(); it!=book.buy.end();){
-        if (it->id==orderID){
-            it->status = "cancelled";
-            book.fulfilled.push_back(*it);
-            it = book.buy.erase(it);
-        }
-        else{
-            ++it;
+// Copies up to `max` events with sequence numbers after `seq` into `out` and
+// returns how many were copied. Safe to call while the matching thread runs.
+// Events already spilled out of memory are skipped; the seq numbers show
+// the gap.
+size_t eventsSince(const OrderBook &book, int64_t seq, Event *out, size_t max){
+    size_t end = book.events.size();
+    size_t start = std::max(seq > 0 ? static_cast<size_t>(seq) : 0, book.events.first());
+    size_t n = 0;
+    for (size_t i = start; i < end && n < max; ++i) {
+        if (book.events.read(i, out[n])) ++n;
+    }
+    return n;
+}
+
+static const int64_t kNoPrice = INT64_MIN;
+
+// One side of an auction in priority order: market orders, then by price,
+// with resting orders ahead of collected ones at the same price (they
+// arrived first).
+struct AuctionSide {
+    OrderBook &book;
+    Ladder &ladder;
+    // This side's collected orders as (sort key, auction_orders slot),
+    // sorted: the key puts market orders first and better prices before
+    // worse, and the slot keeps arrival order within a price.
+    vector<pair<int64_t, size_t>> collected;
+    size_t next = 0;            // position in `collected`
+    bool resting = false;       // whether front() came from the ladder
+
+    AuctionSide(OrderBook &b, Ladder &l) : book(b), ladder(l) {}
+
+    void add(const order &o, size_t slot) {
+        int64_t key = o.type == OrderType::Market ? INT64_MIN
+                    : ladder.key_comp().descending ? -o.price : o.price;
+        collected.emplace_back(key, slot);
+    }
+
+    order *collectedAt(size_t i) { return &book.auction_orders[collected[i].second]; }
+
+    // Best order with quantity left, or null.
+    order *front() {
+        while (next < collected.size() && collectedAt(next)->quantity <= 0) ++next;
+        order *c = next < collected.size() ? collectedAt(next) : nullptr;
+        resting = !ladder.empty() &&
+                  (!c || (c->type == OrderType::Limit &&
+                          !ladder.key_comp()(c->price, ladder.begin()->first)));
+        return resting ? &ladder.begin()->second.orders.front() : c;
+    }
+
+    // Takes `traded` off the order front() returned; a resting order leaves
+    // the book once it is filled.
+    void fill(order &o, int traded) {
+        o.quantity -= traded;
+        if (!resting) return;
+        auto level = ladder.begin();
+        adjustDepth(book, o.side, level->second, level->first, -traded);
+        if (o.quantity > 0) return;
+        o.status = OrderStatus::Closed;
+        book.index.erase(o.id);
+        level->second.orders.pop_front();
+        book.stats.order_erases.add(1);
+        if (level->second.orders.empty()) {
+            ladder.erase(level);
+            book.stats.level_erases.add(1);
         }
     }
-    for (auto it = book.sell.begin(); it!=book.sell.end();){
-        if (it->id==orderID){
-            it->status = "cancelled";
-            book.fulfilled.push_back(*it);
-            it = book.sell.erase(it);
+
+    // Price of the best limit order left once unfilled market orders lapse.
+    int64_t nextLimit() {
+        for (size_t i = next; i < collected.size() && collected[i].first == INT64_MIN; ++i) {
+            collectedAt(i)->quantity = 0;
         }
-        else{
-            ++it;
+        order *o = front();
+        return o ? o->price : kNoPrice;
+    }
+};
+
+// Uniform price of an auction, from the last bid and ask prices that traded
+// (kNoPrice for a side that only traded market orders) and the best bid and
+// ask left afterwards (kNoPrice for none). Any price from the last ask to
+// the last bid clears the volume; the range is narrowed to where no order
+// left would still cross, and the midpoint taken. If that leaves nothing,
+// the price goes to the side with quantity left at its last price. Either
+// way every executed bid is at or above the price, every executed ask at or
+// below it, and no bid left is above it nor ask below it. Returns kNoPrice
+// if nothing bounds the price on either side.
+static int64_t clearingPrice(int64_t lastBid, int64_t nextBid, int64_t lastAsk, int64_t nextAsk) {
+    int64_t lo = lastAsk == kNoPrice ? INT64_MIN : lastAsk;
+    int64_t hi = lastBid == kNoPrice ? INT64_MAX : lastBid;
+    if (nextBid != kNoPrice) lo = max(lo, nextBid + 1);
+    if (nextAsk != kNoPrice) hi = min(hi, nextAsk - 1);
+    if (lo > hi) return (lastAsk != kNoPrice && nextAsk == lastAsk) ? lo : hi;
+    if (hi == INT64_MAX) return lo == INT64_MIN ? kNoPrice : lo;
+    if (lo == INT64_MIN) return hi;
+    return lo + (hi - lo) / 2;
+}
+
+// Runs one frequent batch auction over the collected orders and the book,
+// in a single pass: the collected orders are sorted once, then both sides
+// are walked in priority order, pairing bid and ask quantity while they
+// still cross. That executes the most volume any single price can clear,
+// all at the price clearingPrice picks; each pair is one trade, with the
+// later arrival as the taker. Collected limit orders with quantity left
+// then rest in arrival order, and unfilled market orders lapse, as they do
+// in continuous mode. Returns the quantity traded.
+int64_t runAuction(OrderBook &book) {
+    struct Pair {
+        order taker;
+        order maker;
+        int quantity;
+    };
+    static thread_local vector<Pair> pairs;
+    pairs.clear();
+
+    AuctionSide bids(book, book.buy);
+    AuctionSide asks(book, book.sell);
+    for (size_t i = 0; i < book.auction_orders.size(); ++i) {
+        const order &o = book.auction_orders[i];
+        if (o.quantity > 0) (o.side == Side::Buy ? bids : asks).add(o, i);
+    }
+    sort(bids.collected.begin(), bids.collected.end());
+    sort(asks.collected.begin(), asks.collected.end());
+
+    int64_t lastBid = kNoPrice, lastAsk = kNoPrice, volume = 0;
+    for (;;) {
+        order *bid = bids.front();
+        order *ask = asks.front();
+        if (!bid || !ask) break;
+        if (bid->type == OrderType::Limit && ask->type == OrderType::Limit && bid->price < ask->price) break;
+        int traded = min(bid->quantity, ask->quantity);
+        bool bidTakes = bid->time != ask->time ? bid->time > ask->time : bid->id > ask->id;
+        pairs.push_back(bidTakes ? Pair{*bid, *ask, traded} : Pair{*ask, *bid, traded});
+        if (bid->type == OrderType::Limit) lastBid = bid->price;
+        if (ask->type == OrderType::Limit) lastAsk = ask->price;
+        volume += traded;
+        bids.fill(*bid, traded);
+        asks.fill(*ask, traded);
+    }
+
+    int64_t price = clearingPrice(lastBid, bids.nextLimit(), lastAsk, asks.nextLimit());
+    // Without a price only market orders were paired, and they lapse.
+    if (price == kNoPrice) volume = 0;
+    for (const Pair &p : pairs) {
+        if (price == kNoPrice) break;
+        recordTrade(book, p.taker, p.maker, p.quantity, price);
+        book.stats.fills.add(1);
+    }
+
+    for (order &o : book.auction_orders) {
+        if (o.type == OrderType::Limit && o.quantity > 0) {
+            restOrder(book, o);
+            recordEvent(book, EventKind::Add, o, o.quantity, o.price);
         }
     }
+    book.auction_orders.clear();
+    book.auction_index.clear();
+    return volume;
+}
+
+// Switches the matching mode; call while the book is idle. Auction mode
+// needs an interval (ns) > 0, and the first auction falls on the next
+// multiple of it. Switching back to Continuous runs one last auction, so
+// orders never match on arrival against a crossed book.
+bool setMatchMode(OrderBook &book, MatchMode mode, int64_t interval) {
+    if (mode == MatchMode::Auction) {
+        if (interval <= 0) return false;
+        book.match_mode = mode;
+        book.auction_interval = interval;
+        book.next_auction = (book.now / interval + 1) * interval;
+        return true;
+    }
+    if (book.match_mode == MatchMode::Auction) runAuction(book);
+    book.match_mode = MatchMode::Continuous;
+    book.auction_interval = 0;
+    book.next_auction = 0;
+    return true;
 }
 
 void orderExpiry(OrderBook &book){
-    time_t now = time(0);
-    for (auto it = book.buy.begin(); it!=book.buy.end();){
-        if (it->expiry > 0 && it->expiry<=now){
-            it->status = "expired";
-            book.fulfilled.push_back(*it);
-            it = book.buy.erase(it);
-        }
-        else{
-            ++it;
+    advanceTime(book, book.now);
+}
+
+// Expires every resting order due at or before `now`. Only due heap entries
+// are touched, so the call is O(1) when nothing has expired.
+static void expireDue(OrderBook &book, int64_t now){
+    if (book.expiries.empty() || book.expiries.top().first > now) return;
+    int64_t started = statsClock();
+    int64_t expired = 0;
+    while (!book.expiries.empty() && book.expiries.top().first <= now) {
+        OrderBook::ExpiryEntry due = book.expiries.top();
+        book.expiries.pop();
+        auto found = book.index.find(due.second);
+        if (found == book.index.end() || found->second.it->expiry != due.first) {
+            continue;
         }
+        removeResting(book, found->second, OrderStatus::Expired);
+        ++expired;
     }
+    if (expired > 0) {
+        book.stats.expiries.add(expired);
+        book.stats.expire.record(statsClock() - started);
+    }
+}
 
-    for (auto it = book.sell.begin(); it!=book.sell.end();){
-        if (it->expiry > 0 && it->expiry<=now){
-            it->status = "expired";
-            it->quantity = 0;
-            book.fulfilled.push_back(*it);
-            it = book.sell.erase(it);
-        }
-        else{
-            ++it;
-        }   
+// Moves the book to `now`: expires due orders, then runs the auction if one
+// is due.
+void advanceTime(OrderBook &book, int64_t now){
+    expireDue(book, now);
+    if (book.match_mode == MatchMode::Auction && now >= book.next_auction) {
+        runAuction(book);
+        book.next_auction = (now / book.auction_interval + 1) * book.auction_interval;
     }
 }
@@ -0,0 +1,153 @@
+"""Portfolio accounting for the user's orders.
+
+A ``Portfolio`` follows the engine's trade log from a cursor: each call to
+``consume`` books only the trades after the last one it saw, and only
+those naming a tracked order as taker or maker. It keeps cash, position,
+average cost and realized P&L for the account, and filled quantity,
+notional and realized P&L per order.
+
+Everything is done on NumPy columns. Order ids are found with a binary
+search over a sorted id array, per-order totals are scattered with
+``np.add.at``, and average cost is carried across runs of same-side fills
+with one vectorized step per run. A refresh costs O(new trades) however
+long the session has run. Replaying a whole trade log through ``consume``
+rebuilds the account the same way.
+
+Accounting rules: a buy that leaves the position long moves the average
+cost to the quantity-weighted mean of the position and the fill. A sell
+realizes ``(price - average cost) * quantity`` and leaves the average cost
+alone, unless it flattens the position, which resets it to 0.
+"""
+import numpy as np
+import pandas as pd
+
+# Engine side codes (Side::Buy / Side::Sell).
+BUY = 0
+SELL = 1
+
+
+class Portfolio:
+    def __init__(self, starting_cash=0.0):
+        self._ids = np.empty(0, np.int64)         # tracked order ids, sorted
+        self._filled = np.empty(0, np.int64)
+        self._notional = np.empty(0, np.float64)
+        self._realized = np.empty(0, np.float64)
+        self.reset(starting_cash)
+
+    def reset(self, starting_cash):
+        """Clears the account (not the tracked orders) and starts over with
+        `starting_cash`."""
+        self.starting_cash = float(starting_cash)
+        self.cash = float(starting_cash)
+        self.position = 0
+        self.avg_cost = 0.0
+        self.realized_pnl = 0.0
+        self.fills = 0
+        self.last_trade_id = 0
+        self._filled[:] = 0
+        self._notional[:] = 0.0
+        self._realized[:] = 0.0
+
+    def track(self, order_id):
+        """Starts booking the fills of `order_id`."""
+        i = int(np.searchsorted(self._ids, order_id))
+        if i < self._ids.size and self._ids[i] == order_id:
+            return
+        self._ids = np.insert(self._ids, i, order_id)
+        self._filled = np.insert(self._filled, i, 0)
+        self._notional = np.insert(self._notional, i, 0.0)
+        self._realized = np.insert(self._realized, i, 0.0)
+
+    def _slots(self, ids):
+        # Index of each id in the tracked array, and whether it is tracked.
+        if self._ids.size == 0:
+            return np.zeros(ids.size, np.intp), np.zeros(ids.size, bool)
+        slots = np.minimum(np.searchsorted(self._ids, ids), self._ids.size - 1)
+        return slots, self._ids[slots] == ids
+
+    def consume(self, trades, n, tick):
+        """Books rows [0, n) of a TradeColumns export (prices in ticks of
+        `tick`). Rows at or before the last trade already booked are
+        skipped, so overlapping exports are harmless. Returns the number of
+        fills booked; a trade between two tracked orders is two fills,
+        taker first."""
+        if n == 0:
+            return 0
+        trade_id = trades.trade_id[:n]
+        fresh = trade_id > self.last_trade_id
+        self.last_trade_id = max(self.last_trade_id, int(trade_id[n - 1]))
+        taker_slot, taker = self._slots(trades.taker_id[:n])
+        maker_slot, maker = self._slots(trades.maker_id[:n])
+        taker &= fresh
+        maker &= fresh
+        if not (taker.any() or maker.any()):
+            return 0
+
+        t_rows, m_rows = np.flatnonzero(taker), np.flatnonzero(maker)
+        rows = np.concatenate([t_rows, m_rows])
+        # Trade order, with the taker's fill before the maker's.
+        order = np.lexsort((np.repeat([0, 1], [t_rows.size, m_rows.size]), rows))
+        rows = rows[order]
+        slots = np.concatenate([taker_slot[t_rows], maker_slot[m_rows]])[order]
+        # `side` is the aggressor's; the maker traded the other way.
+        buy = np.concatenate([trades.side[t_rows] == BUY, trades.side[m_rows] != BUY])[order]
+        price = trades.price[rows] * tick
+        qty = trades.quantity[rows].astype(np.int64)
+        self._book(slots, buy, price, qty)
+        return int(rows.size)
+
+    def _book(self, slots, buy, price, qty):
+        signed = np.where(buy, qty, -qty)
+        after = self.position + np.cumsum(signed)
+        before = after - signed
+        realized = np.zeros(qty.size)
+
+        # Average cost only changes on buys (and on a sell that flattens),
+        # so it is carried run by run of same-side fills.
+        avg = self.avg_cost
+        starts = np.flatnonzero(np.r_[True, buy[1:] != buy[:-1]])
+        ends = np.r_[starts[1:], qty.size]
+        for s, e in zip(starts, ends):
+            if buy[s]:
+                # The position only grows within a buy run; the average
+                # moves from the first fill that leaves it long.
+                long = np.flatnonzero(after[s:e] > 0)
+                if long.size:
+                    f = s + long[0]
+                    avg = (avg * before[f] + np.dot(price[f:e], qty[f:e])) / after[e - 1]
+            else:
+                cost = np.full(e - s, avg)
+                flat = np.flatnonzero(after[s:e] == 0)
+                if flat.size:
+                    cost[flat[0] + 1:] = 0.0
+                    avg = 0.0
+                realized[s:e] = (price[s:e] - cost) * qty[s:e]
+
+        self.cash -= float(np.dot(signed, price))
+        self.position = int(after[-1])
+        self.avg_cost = float(avg)
+        self.realized_pnl += float(realized.sum())
+        self.fills += int(qty.size)
+        np.add.at(self._filled, slots, qty)
+        np.add.at(self._notional, slots, price * qty)
+        np.add.at(self._realized, slots, realized)
+
+    def unrealized(self, last_price):
+        return (last_price - self.avg_cost) * self.position
+
+    def filled(self, order_id):
+        """Filled quantity of a tracked order (0 if untracked)."""
+        slots, hit = self._slots(np.array([order_id], np.int64))
+        return int(self._filled[slots[0]]) if hit[0] else 0
+
+    def order_stats(self):
+        """Per tracked order: ORDER_ID, FILLED_QTY, AVG_FILL_PRICE (0 while
+        unfilled) and REALIZED_PNL, sorted by order id."""
+        vwap = np.divide(self._notional, self._filled, out=np.zeros(self._ids.size),
+                         where=self._filled > 0)
+        return pd.DataFrame({
+            "ORDER_ID": self._ids,
+            "FILLED_QTY": self._filled,
+            "AVG_FILL_PRICE": vwap,
+            "REALIZED_PNL": self._realized,
+        })
@@ -0,0 +1,336 @@
+// CPython extension `_orderbook`: typed entry points for the calls the
+// Python layer makes on every tick. It is linked into the same shared
+// library as the C ABI (see src/build_native.py), so a book created through
+// ctypes can be driven from here and the other way round.
+//
+// A `Book` wraps the address of such a book and does not own it. Arguments
+// are parsed straight from Python ints and floats (no ctypes conversion),
+// column exports write into caller-owned buffers (e.g. NumPy arrays) through
+// the buffer protocol, and the calls that generate and match flow release
+// the GIL while they run.
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <cstdint>
+#include "order.h"
+#include "orderbook.h"
+#include "ingest.h"
+using namespace std;
+
+// C ABI of wrapper.cpp, linked into the same library.
+extern "C" {
+    void run_batch(OrderBook* book, long long n, double basePrice, int64_t &nextID);
+    long long run_flow(OrderBook* book, double window, long long max_events, double basePrice);
+    long long get_resting_count(OrderBook* book);
+    void get_top_of_book_metrics(OrderBook* book, TopOfBook* out);
+    long long export_trades_columns(OrderBook* book, long long start, long long max,
+                                    int64_t* trade_ids, int64_t* taker_ids, int64_t* maker_ids,
+                                    int64_t* prices, int32_t* quantities, uint8_t* sides, int64_t* times);
+    long long export_events_columns(OrderBook* book, long long seq, long long max,
+                                    int64_t* seqs, int64_t* order_ids, int64_t* other_ids,
+                                    int64_t* times, int64_t* prices, int32_t* quantities,
+                                    uint8_t* kinds, uint8_t* sides);
+}
+
+namespace {
+    struct BookObject {
+        PyObject_HEAD
+        OrderBook* book;
+    };
+
+    PyTypeObject *TopOfBookType = nullptr;
+
+    PyStructSequence_Field kTopOfBookFields[] = {
+        {"bid_levels", nullptr}, {"ask_levels", nullptr},
+        {"best_bid_qty", nullptr}, {"best_ask_qty", nullptr},
+        {"depth_bid", nullptr}, {"depth_ask", nullptr},
+        {"best_bid", nullptr}, {"best_ask", nullptr},
+        {"midprice", nullptr}, {"relative_spread", nullptr},
+        {"obi", nullptr}, {"ofi", nullptr},
+        {"queue_pressure", nullptr}, {"microprice", nullptr},
+        {"vwap_bid", nullptr}, {"vwap_ask", nullptr},
+        {nullptr, nullptr},
+    };
+    PyStructSequence_Desc kTopOfBookDesc = {
+        "_orderbook.TopOfBook", "Market metrics of a book (see TopOfBook in orderbook.h).",
+        kTopOfBookFields, 16,
+    };
+
+    bool checkArgs(const char *name, Py_ssize_t nargs, Py_ssize_t expected) {
+        if (nargs == expected) return true;
+        PyErr_Format(PyExc_TypeError, "%s() takes %zd arguments (%zd given)", name, expected, nargs);
+        return false;
+    }
+
+    // Python int / float arguments; callers check PyErr_Occurred() once.
+    long long toInt(PyObject *o) { return PyLong_AsLongLong(o); }
+    double toFloat(PyObject *o) { return PyFloat_AsDouble(o); }
+
+    // Writable, C-contiguous views of the output columns of an export.
+    // Every buffer must have the item size of its column; the row capacity
+    // is the shortest of them.
+    struct Columns {
+        Py_buffer views[8];
+        int count = 0;
+        Py_ssize_t rows = PY_SSIZE_T_MAX;
+
+        bool add(PyObject *obj, Py_ssize_t itemsize) {
+            Py_buffer &v = views[count];
+            if (PyObject_GetBuffer(obj, &v, PyBUF_WRITABLE | PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0) return false;
+            ++count;
+            if (v.itemsize != itemsize) {
+                PyErr_Format(PyExc_TypeError, "column %d: expected %zd-byte items, got %zd",
+                             count - 1, itemsize, v.itemsize);
+                return false;
+            }
+            rows = min(rows, v.len / itemsize);
+            return true;
+        }
+
+        template <class T>
+        T *data(int i) { return static_cast<T *>(views[i].buf); }
+
+        ~Columns() {
+            for (int i = 0; i < count; ++i) PyBuffer_Release(&views[i]);
+        }
+    };
+
+    // The address is taken here rather than in __init__, so no Book exists
+    // without a book behind it (e.g. from Book.__new__(Book)).
+    PyObject *Book_new(PyTypeObject *type, PyObject *args, PyObject *kwargs) {
+        unsigned long long address = 0;
+        static const char *kwlist[] = {"address", nullptr};
+        if (!PyArg_ParseTupleAndKeywords(args, kwargs, "K", const_cast<char **>(kwlist), &address)) return nullptr;
+        if (address == 0) {
+            PyErr_SetString(PyExc_ValueError, "null book");
+            return nullptr;
+        }
+        BookObject *self = reinterpret_cast<BookObject *>(type->tp_alloc(type, 0));
+        if (self) self->book = reinterpret_cast<OrderBook *>(address);
+        return reinterpret_cast<PyObject *>(self);
+    }
+
+    PyObject *Book_address(BookObject *self, void *) {
+        return PyLong_FromVoidPtr(self->book);
+    }
+
+    Command addCommand(PyObject *const *args) {
+        Command cmd{};
+        cmd.kind = CommandKind::Add;
+        cmd.o.id = toInt(args[0]);
+        cmd.o.side = toInt(args[1]) ? Side::Sell : Side::Buy;
+        cmd.o.quantity = static_cast<int32_t>(toInt(args[2]));
+        cmd.o.price = toInt(args[3]);
+        cmd.o.type = toInt(args[4]) ? OrderType::Market : OrderType::Limit;
+        cmd.o.status = OrderStatus::Open;
+        cmd.o.time = wallNanos();       // the book stamps its own clock
+        return cmd;
+    }
+
+    PyObject *Book_add_order(BookObject *self, PyObject *const *args, Py_ssize_t nargs) {
+        if (!checkArgs("add_order", nargs, 5)) return nullptr;
+        Command cmd = addCommand(args);
+        if (PyErr_Occurred()) return nullptr;
+        applyCommand(*self->book, cmd);
+        Py_RETURN_NONE;
+    }
+
+    PyObject *Book_submit_order(BookObject *self, PyObject *const *args, Py_ssize_t nargs) {
+        if (!checkArgs("submit_order", nargs, 5)) return nullptr;
+        Command cmd = addCommand(args);
+        if (PyErr_Occurred()) return nullptr;
+        return PyBool_FromLong(submitCommand(*self->book, cmd));
+    }
+
+    PyObject *Book_cancel_order(BookObject *self, PyObject *arg) {
+        Command cmd{};
+        cmd.kind = CommandKind::Cancel;
+        cmd.id = toInt(arg);
+        if (PyErr_Occurred()) return nullptr;
+        return PyBool_FromLong(applyCommand(*self->book, cmd));
+    }
+
+    PyObject *Book_submit_cancel(BookObject *self, PyObject *arg) {
+        Command cmd{};
+        cmd.kind = CommandKind::Cancel;
+        cmd.id = toInt(arg);
+        if (PyErr_Occurred()) return nullptr;
+        return PyBool_FromLong(submitCommand(*self->book, cmd));
+    }
+
+    PyObject *Book_modify_order(BookObject *self, PyObject *const *args, Py_ssize_t nargs) {
+        if (!checkArgs("modify_order", nargs, 3)) return nullptr;
+        Command cmd{};
+        cmd.kind = CommandKind::Modify;
+        cmd.id = toInt(args[0]);
+        cmd.quantity = static_cast<int32_t>(toInt(args[1]));
+        cmd.price = toInt(args[2]);
+        if (PyErr_Occurred()) return nullptr;
+        return PyBool_FromLong(applyCommand(*self->book, cmd));
+    }
+
+    PyObject *Book_advance_time(BookObject *self, PyObject *arg) {
+        Command cmd{};
+        cmd.kind = CommandKind::AdvanceTime;
+        cmd.now = toInt(arg);
+        if (PyErr_Occurred()) return nullptr;
+        applyCommand(*self->book, cmd);
+        Py_RETURN_NONE;
+    }
+
+    PyObject *Book_run_flow(BookObject *self, PyObject *const *args, Py_ssize_t nargs) {
+        if (!checkArgs("run_flow", nargs, 3)) return nullptr;
+        double window = toFloat(args[0]);
+        long long max_events = toInt(args[1]);
+        double base_price = toFloat(args[2]);
+        if (PyErr_Occurred()) return nullptr;
+        long long n;
+        Py_BEGIN_ALLOW_THREADS
+        n = run_flow(self->book, window, max_events, base_price);
+        Py_END_ALLOW_THREADS
+        return PyLong_FromLongLong(n);
+    }
+
+    // Returns the next free order id.
+    PyObject *Book_run_batch(BookObject *self, PyObject *const *args, Py_ssize_t nargs) {
+        if (!checkArgs("run_batch", nargs, 3)) return nullptr;
+        long long n = toInt(args[0]);
+        double base_price = toFloat(args[1]);
+        int64_t next_id = toInt(args[2]);
+        if (PyErr_Occurred()) return nullptr;
+        Py_BEGIN_ALLOW_THREADS
+        run_batch(self->book, n, base_price, next_id);
+        Py_END_ALLOW_THREADS
+        return PyLong_FromLongLong(next_id);
+    }
+
+    PyObject *Book_top_of_book(BookObject *self, PyObject *) {
+        TopOfBook t;
+        get_top_of_book_metrics(self->book, &t);
+        PyObject *out = PyStructSequence_New(TopOfBookType);
+        if (!out) return nullptr;
+        const int64_t ints[] = {t.bid_levels, t.ask_levels, t.best_bid_qty, t.best_ask_qty,
+                                t.depth_bid, t.depth_ask};
+        const double floats[] = {t.best_bid, t.best_ask, t.midprice, t.relative_spread, t.obi,
+                                 t.ofi, t.queue_pressure, t.microprice, t.vwap_bid, t.vwap_ask};
+        Py_ssize_t i = 0;
+        for (int64_t v : ints) PyStructSequence_SET_ITEM(out, i++, PyLong_FromLongLong(v));
+        for (double v : floats) PyStructSequence_SET_ITEM(out, i++, PyFloat_FromDouble(v));
+        return out;
+    }
+
+    PyObject *Book_trade_count(BookObject *self, PyObject *) {
+        return PyLong_FromSize_t(self->book->trades.size());
+    }
+
+    PyObject *Book_resting_count(BookObject *self, PyObject *) {
+        return PyLong_FromLongLong(get_resting_count(self->book));
+    }
+
+    PyObject *Book_last_event_seq(BookObject *self, PyObject *) {
+        return PyLong_FromSize_t(self->book->events.size());
+    }
+
+    // export_trades(start, trade_ids, taker_ids, maker_ids, prices,
+    //               quantities, sides, times) -> rows written
+    PyObject *Book_export_trades(BookObject *self, PyObject *const *args, Py_ssize_t nargs) {
+        if (!checkArgs("export_trades", nargs, 8)) return nullptr;
+        long long start = toInt(args[0]);
+        if (PyErr_Occurred()) return nullptr;
+        Columns c;
+        const Py_ssize_t sizes[] = {8, 8, 8, 8, 4, 1, 8};
+        for (int i = 0; i < 7; ++i) {
+            if (!c.add(args[i + 1], sizes[i])) return nullptr;
+        }
+        long long n;
+        Py_BEGIN_ALLOW_THREADS
+        n = export_trades_columns(self->book, start, c.rows, c.data<int64_t>(0), c.data<int64_t>(1),
+                                  c.data<int64_t>(2), c.data<int64_t>(3), c.data<int32_t>(4),
+                                  c.data<uint8_t>(5), c.data<int64_t>(6));
+        Py_END_ALLOW_THREADS
+        return PyLong_FromLongLong(n);
+    }
+
+    // export_events(seq, seqs, order_ids, other_ids, times, prices,
+    //               quantities, kinds, sides) -> rows written
+    PyObject *Book_export_events(BookObject *self, PyObject *const *args, Py_ssize_t nargs) {
+        if (!checkArgs("export_events", nargs, 9)) return nullptr;
+        long long seq = toInt(args[0]);
+        if (PyErr_Occurred()) return nullptr;
+        Columns c;
+        const Py_ssize_t sizes[] = {8, 8, 8, 8, 8, 4, 1, 1};
+        for (int i = 0; i < 8; ++i) {
+            if (!c.add(args[i + 1], sizes[i])) return nullptr;
+        }
+        long long n;
+        Py_BEGIN_ALLOW_THREADS
+        n = export_events_columns(self->book, seq, c.rows, c.data<int64_t>(0), c.data<int64_t>(1),
+                                  c.data<int64_t>(2), c.data<int64_t>(3), c.data<int64_t>(4),
+                                  c.data<int32_t>(5), c.data<uint8_t>(6), c.data<uint8_t>(7));
+        Py_END_ALLOW_THREADS
+        return PyLong_FromLongLong(n);
+    }
+
+    PyMethodDef kBookMethods[] = {
+        {"add_order", (PyCFunction)(void (*)(void))Book_add_order, METH_FASTCALL,
+         "add_order(id, side, quantity, price, type): applies a new order (side and type 0/1, price in ticks)."},
+        {"submit_order", (PyCFunction)(void (*)(void))Book_submit_order, METH_FASTCALL,
+         "submit_order(id, side, quantity, price, type) -> False if the command queue is full."},
+        {"cancel_order", (PyCFunction)Book_cancel_order, METH_O, "cancel_order(id) -> True if it was resting."},
+        {"submit_cancel", (PyCFunction)Book_submit_cancel, METH_O, "submit_cancel(id) -> False if the queue is full."},
+        {"modify_order", (PyCFunction)(void (*)(void))Book_modify_order, METH_FASTCALL,
+         "modify_order(id, quantity, price) -> True if it was resting."},
+        {"advance_time", (PyCFunction)Book_advance_time, METH_O, "advance_time(now_ns): expires due orders."},
+        {"run_flow", (PyCFunction)(void (*)(void))Book_run_flow, METH_FASTCALL,
+         "run_flow(window, max_events, base_price) -> events applied. Releases the GIL."},
+        {"run_batch", (PyCFunction)(void (*)(void))Book_run_batch, METH_FASTCALL,
+         "run_batch(n, base_price, next_id) -> next free id. Releases the GIL."},
+        {"top_of_book", (PyCFunction)Book_top_of_book, METH_NOARGS, "top_of_book() -> TopOfBook."},
+        {"trade_count", (PyCFunction)Book_trade_count, METH_NOARGS, nullptr},
+        {"resting_count", (PyCFunction)Book_resting_count, METH_NOARGS, nullptr},
+        {"last_event_seq", (PyCFunction)Book_last_event_seq, METH_NOARGS, nullptr},
+        {"export_trades", (PyCFunction)(void (*)(void))Book_export_trades, METH_FASTCALL,
+         "export_trades(start, trade_ids, taker_ids, maker_ids, prices, quantities, sides, times) -> rows."},
+        {"export_events", (PyCFunction)(void (*)(void))Book_export_events, METH_FASTCALL,
+         "export_events(seq, seqs, order_ids, other_ids, times, prices, quantities, kinds, sides) -> rows."},
+        {nullptr, nullptr, 0, nullptr},
+    };
+
+    PyGetSetDef kBookGetSet[] = {
+        {"address", (getter)Book_address, nullptr, "Address of the wrapped OrderBook.", nullptr},
+        {nullptr, nullptr, nullptr, nullptr, nullptr},
+    };
+
+    PyType_Slot kBookSlots[] = {
+        {Py_tp_new, reinterpret_cast<void *>(Book_new)},
+        {Py_tp_doc, const_cast<char *>("Book(address): view of a book created through the C ABI (not owned).")},
+        {Py_tp_methods, kBookMethods},
+        {Py_tp_getset, kBookGetSet},
+        {0, nullptr},
+    };
+    PyType_Spec kBookSpec = {
+        "_orderbook.Book", static_cast<int>(sizeof(BookObject)), 0, Py_TPFLAGS_DEFAULT, kBookSlots,
+    };
+
+    PyModuleDef kModule = {
+        PyModuleDef_HEAD_INIT, "_orderbook",
+        "Typed bindings for the order book engine's per-tick calls.", -1,
+        nullptr, nullptr, nullptr, nullptr, nullptr,
+    };
+}
+
+PyMODINIT_FUNC PyInit__orderbook(void) {
+    PyObject *bookType = PyType_FromSpec(&kBookSpec);
+    if (!bookType) return nullptr;
+    TopOfBookType = PyStructSequence_NewType(&kTopOfBookDesc);
+    if (!TopOfBookType) return nullptr;
+
+    PyObject *m = PyModule_Create(&kModule);
+    if (!m) return nullptr;
+    Py_INCREF(TopOfBookType);
+    if (PyModule_AddObject(m, "Book", bookType) < 0 ||
+        PyModule_AddObject(m, "TopOfBook", reinterpret_cast<PyObject *>(TopOfBookType)) < 0) {
+        Py_DECREF(m);
+        return nullptr;
+    }
+    return m;
+}
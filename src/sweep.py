@@ -0,0 +1,168 @@
+"""Parallel parameter sweeps over headless runs.
+
+Every combination of a grid of flow settings (FlowConfig fields such as
+``price_sigma``, ``market_prob``, ``cross_prob``, ``expiry_seconds``,
+``min_qty``/``max_qty``) and seeds is simulated by ``headless.run`` in a
+process pool, each run with its own native book and generator. The grid
+may also vary ``auction_interval`` (seconds between batch auctions, 0 for
+continuous matching). The summary of every run comes back as one row of a
+DataFrame.
+
+Usage::
+
+    python src/sweep.py --grid price_sigma=0.5,1.5,3 --grid market_prob=0.05,0.2 --seeds 4
+    python src/sweep.py --grid expiry_seconds=5,30 --grid max_qty=50,200 --out sweep.csv
+    python src/sweep.py --clock virtual --grid auction_interval=0,0.001,0.01 --grid cross_prob=0.15,0.5
+
+From Python::
+
+    from sweep import grid, sweep
+    df = sweep(grid(price_sigma=[0.5, 1.5], cross_prob=[0.05, 0.3]), seeds=range(4))
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import os
+from pathlib import Path
+import tempfile
+
+import pandas as pd
+
+import headless
+
+DEFAULT_EVENTS = 200_000
+
+# Status fields reported per run, in column order.
+METRIC_COLUMNS = [
+    "events",
+    "elapsed",
+    "sim_seconds",
+    "events_per_second",
+    "trades",
+    "traded_quantity",
+    "posted_quantity",
+    "fill_rate",
+    "mean_relative_spread",
+    "relative_spread",
+    "mean_depth_bid",
+    "mean_depth_ask",
+    "resting",
+]
+
+
+def grid(**axes):
+    """Returns the cartesian product of `axes` (field name -> values) as a
+    list of config dicts."""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def _run_one(task):
+    # Runs in a pool worker: the process loads its own copy of the library.
+    index, params, seed, options, out_dir = task
+    config = dict(params)
+    if "auction_interval" in config:
+        # 0 on the grid stands for continuous matching.
+        options = dict(options, auction_interval=config.pop("auction_interval") or None)
+    if out_dir is None:
+        with tempfile.TemporaryDirectory(prefix="sweep-") as tmp:
+            status = headless.run(tmp, seed=seed, config=config, journal=False, **options)
+    else:
+        run_dir = Path(out_dir) / f"run{index:04d}"
+        status = headless.run(run_dir, seed=seed, config=config, **options)
+    row = {"run": index, **params, "seed": seed}
+    row.update({name: status[name] for name in METRIC_COLUMNS})
+    return row
+
+
+def sweep(
+    params,
+    seeds=(0,),
+    *,
+    events=DEFAULT_EVENTS,
+    duration=None,
+    rate=None,
+    batch=headless.DEFAULT_BATCH,
+    base_price=100.0,
+    anchor_mid=True,
+    clock="wall",
+    auction_interval=None,
+    workers=None,
+    out_dir=None,
+):
+    """Runs one headless simulation per (config, seed) pair and returns a
+    DataFrame with one row per run: its parameters, seed and summary metrics.
+
+    `params` is a list of FlowConfig overrides (see `grid`). Runs are spread
+    over `workers` processes (default: one per core). With `out_dir`, each
+    run keeps its files (journal, checkpoint, status.json, trades.npz) in
+    `out_dir/runNNNN`; otherwise they go to a temporary directory that is
+    removed when the run ends. `clock` and `auction_interval` are passed to
+    `headless.run`; use a "virtual" clock to sweep `expiry_seconds` or
+    `auction_interval` over flat-out runs.
+    """
+    options = {
+        "events": events,
+        "duration": duration,
+        "rate": rate,
+        "batch": batch,
+        "base_price": base_price,
+        "anchor_mid": anchor_mid,
+        "clock": clock,
+        "auction_interval": auction_interval,
+        "checkpoint_every": float("inf"),
+    }
+    tasks = [
+        (i, dict(p), seed, options, out_dir)
+        for i, (p, seed) in enumerate(itertools.product(params, seeds))
+    ]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        rows = list(pool.map(_run_one, tasks))
+    return pd.DataFrame(rows)
+
+
+def _parse_axis(text):
+    name, _, values = text.partition("=")
+    if name not in headless.FLOW_FIELDS + ["arrival", "auction_interval"] or not values:
+        raise argparse.ArgumentTypeError(
+            f"expected FIELD=V1,V2,... with a FlowConfig field or auction_interval, got {text!r}")
+    kind = str if name == "arrival" else int if name in ("expiry_seconds", "min_qty", "max_qty") else float
+    return name, [kind(v) for v in values.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--grid", type=_parse_axis, action="append", default=[],
+                        metavar="FIELD=V1,V2,...", help="values of one flow field (repeatable)")
+    parser.add_argument("--seeds", type=int, default=1, help="seeds 0 .. N-1 per setting")
+    parser.add_argument("--events", type=int, default=DEFAULT_EVENTS, help="flow events per run")
+    parser.add_argument("--duration", type=float, help="seconds per run (instead of --events)")
+    parser.add_argument("--rate", type=float, help="target events per second (default: flat out)")
+    parser.add_argument("--clock", choices=list(headless.CLOCK_MODES), default="wall",
+                        help="engine clock of every run")
+    parser.add_argument("--auction-interval", type=float, metavar="SECONDS",
+                        help="batch auction interval of every run (default: continuous matching)")
+    parser.add_argument("--workers", type=int, help="processes (default: one per core)")
+    parser.add_argument("--keep", metavar="DIR", help="keep every run's files under DIR")
+    parser.add_argument("--out", help="write the results to this CSV file")
+    args = parser.parse_args(argv)
+
+    df = sweep(
+        grid(**dict(args.grid)),
+        seeds=range(args.seeds),
+        events=None if args.duration is not None else args.events,
+        duration=args.duration,
+        rate=args.rate,
+        clock=args.clock,
+        auction_interval=args.auction_interval,
+        workers=args.workers,
+        out_dir=args.keep,
+    )
+    if args.out:
+        df.to_csv(args.out, index=False)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(df)
+
+
+if __name__ == "__main__":
+    main()
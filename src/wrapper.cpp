@@ -1,50 +1,752 @@
 #include <iostream>
+#include <algorithm>
 #include <sstream>
-#include <ctime>
+#include <cmath>
+#include <iomanip>
 #include "order.h"
 #include "orderbook.h"
+#include "ingest.h"
+#include "journal.h"
+#include "checkpoint.h"
+#include "manager.h"
 using namespace std;
 
+namespace {
+    // `log` argument of the history calls.
+    enum HistoryLog { kTradesLog = 0, kFulfilledLog = 1, kEventsLog = 2 };
+
+    // Number of decimals needed to print any multiple of `tick` exactly.
+    int priceDecimals(double tick) {
+        int decimals = 0;
+        double scaled = tick;
+        while (decimals < 10 && fabs(scaled - llround(scaled)) > 1e-9) {
+            scaled *= 10.0;
+            ++decimals;
+        }
+        return decimals;
+    }
+}
+
+// Ownership: books are created with creatBook/create_book and freed with
+// destroy_book. Orders never cross the ABI as heap objects: the caller owns
+// the `order` storage it passes in, and add_order copies it into the book.
 extern "C"{
     OrderBook* creatBook(){
         return new OrderBook();
     }
 
-    order* generate_random_order(int &nextID, float basePrice){
-        return new order(randomOrder(nextID, basePrice));
+    OrderBook* create_book(double tick_size){
+        return new OrderBook(tick_size > 0.0 ? tick_size : 0.0001);
+    }
+
+    void destroy_book(OrderBook* book){
+        delete book;
+    }
+
+    double get_tick_size(OrderBook* book){
+        return book->tick_size;
+    }
+
+    // Uses the book's generator: synchronous mode only, like add_order.
+    void generate_random_order(OrderBook* book, int64_t &nextID, double basePrice, order* out){
+        *out = book->generator.nextOrder(nextID, basePrice, book->tick_size, book->clock.now());
     }
 
-    void set_random_config(float tick_size,
-                           float price_sigma,
-                           float market_prob,
-                           float cross_prob,
-                           int expiry_seconds,
-                           int min_qty,
-                           int max_qty) {
-        setRandomConfig(tick_size, price_sigma, market_prob, cross_prob, expiry_seconds, min_qty, max_qty);
+    // Restarts the book's order flow from `seed`. Together with the flow
+    // config this makes generated flow reproducible. Call while no batch is
+    // running.
+    void seed_random(OrderBook* book, unsigned long long seed){
+        book->generator.seed(seed);
+        book->flow_clock = 0.0;
     }
 
+    // Engine clock. mode 0 = wall clock (ns since the Unix epoch), 1 =
+    // virtual: starts at `start_ns`, or where the engine clock last stood
+    // if start_ns is negative (e.g. after a replay), and then moves only
+    // with advance_time, generated flow and replay. Call while the book is
+    // idle (no matching thread). Returns 0 for an unknown mode.
+    int set_clock(OrderBook* book, int mode, long long start_ns){
+        if (mode != 0 && mode != 1) return 0;
+        book->clock.mode = static_cast<ClockMode>(mode);
+        book->clock.virtual_ns.store(start_ns >= 0 ? start_ns : book->now, memory_order_relaxed);
+        if (mode == 1) book->now = book->clock.now();
+        return 1;
+    }
+
+    int get_clock_mode(OrderBook* book){
+        return static_cast<int>(book->clock.mode);
+    }
+
+    // Current engine clock in ns; safe from any thread.
+    long long get_clock(OrderBook* book){
+        return book->clock.now();
+    }
+
+    // Match mode. mode 0 = continuous, 1 = frequent batch auctions every
+    // `interval_ns` of engine time (ignored for mode 0). Leaving auction
+    // mode runs a last auction. Call while the book is idle, and before
+    // open_journal so the journal records the mode. Returns 0 for an unknown
+    // mode or an interval <= 0.
+    int set_match_mode(OrderBook* book, int mode, long long interval_ns){
+        if (mode != 0 && mode != 1) return 0;
+        return setMatchMode(*book, static_cast<MatchMode>(mode), interval_ns) ? 1 : 0;
+    }
+
+    int get_match_mode(OrderBook* book){
+        return static_cast<int>(book->match_mode);
+    }
+
+    long long get_auction_interval(OrderBook* book){
+        return book->auction_interval;
+    }
+
+    // Safe from any thread; batches pick the new config up at their start.
+    void set_flow_config(OrderBook* book, const FlowConfig* cfg){
+        book->generator.setConfig(*cfg);
+    }
+
+    void get_flow_config(OrderBook* book, FlowConfig* out){
+        *out = book->generator.config();
+    }
+
+    // Standalone generators, independent of any book, for producing flow in
+    // bulk (e.g. into a NumPy structured array) and feeding it with
+    // apply_flow. Freed with destroy_generator.
+    FlowGenerator* create_generator(unsigned long long seed, const FlowConfig* cfg){
+        FlowGenerator *gen = new FlowGenerator(seed);
+        if (cfg) gen->setConfig(*cfg);
+        return gen;
+    }
+
+    void destroy_generator(FlowGenerator* gen){
+        delete gen;
+    }
+
+    void set_generator_config(FlowGenerator* gen, const FlowConfig* cfg){
+        gen->setConfig(*cfg);
+    }
+
+    // Fills out[0..n) with the next `n` events; new order ids come from
+    // *next_id, prices are in ticks of `book_tick`.
+    long long generate_flow(FlowGenerator* gen, FlowEvent* out, long long n, int64_t* next_id,
+                            double base_price, double book_tick, long long now){
+        return static_cast<long long>(gen->generate(out, static_cast<size_t>(n), *next_id,
+                                                    base_price, book_tick, now));
+    }
+
+    // Events arriving in the next `window` seconds of generator time, at
+    // most `max`.
+    long long generate_flow_window(FlowGenerator* gen, double window, FlowEvent* out, long long max,
+                                   int64_t* next_id, double base_price, double book_tick, long long now){
+        return static_cast<long long>(gen->generateWindow(window, out, static_cast<size_t>(max), *next_id,
+                                                          base_price, book_tick, now));
+    }
+
+    // The synchronous calls below all go through applyCommand, so they are
+    // stamped with the engine clock and recorded by an open journal.
     void add_order(OrderBook* book, order* newOrder){
-        addOrder(*book, *newOrder);
-    }    
+        Command cmd{};
+        cmd.kind = CommandKind::Add;
+        cmd.o = *newOrder;
+        applyCommand(*book, cmd);
+    }
+
+    // Expires every order due at or before `now` (ns); a virtual clock is
+    // moved forward to `now` first.
+    void advance_time(OrderBook* book, long long now){
+        Command cmd{};
+        cmd.kind = CommandKind::AdvanceTime;
+        cmd.now = now;
+        applyCommand(*book, cmd);
+    }
+
+    // Generates and applies `n` flow events from the book's generator in
+    // one native call.
+    void run_batch(OrderBook* book, long long n, double basePrice, int64_t &nextID){
+        FlowEvent flow[256];
+        while (n > 0) {
+            size_t chunk = static_cast<size_t>(min<long long>(n, 256));
+            book->generator.generate(flow, chunk, nextID, basePrice, book->tick_size, book->clock.now());
+            applyGenerated(*book, flow, chunk);
+            n -= static_cast<long long>(chunk);
+        }
+    }
 
+    // Synchronous counterpart of submit_flow (window 0 = exactly
+    // max_events): generates and applies the flow in one native call and
+    // returns how many events it applied.
+    long long run_flow(OrderBook* book, double window, long long max_events, double basePrice){
+        Command cmd{};
+        cmd.kind = CommandKind::Batch;
+        cmd.count = max_events;
+        cmd.window = window;
+        cmd.base_price = basePrice;
+        return static_cast<long long>(applyBatch(*book, cmd));
+    }
+
+    // Applies a contiguous array of flow events (e.g. from generate_flow)
+    // in order.
+    void apply_flow(OrderBook* book, const FlowEvent* events, long long n){
+        applyFlow(*book, events, static_cast<size_t>(n));
+    }
+
+    // Submits a contiguous array of order records (same layout as `order`,
+    // e.g. a NumPy structured array) in submission order.
+    void add_orders(OrderBook* book, const order* records, long long n){
+        Command cmd{};
+        cmd.kind = CommandKind::Add;
+        for (long long i = 0; i < n; ++i) {
+            cmd.o = records[i];
+            applyCommand(*book, cmd);
+        }
+    }
+
+    int cancel_order(OrderBook* book, long long orderID){
+        Command cmd{};
+        cmd.kind = CommandKind::Cancel;
+        cmd.id = orderID;
+        return applyCommand(*book, cmd) ? 1 : 0;
+    }
+
+    int modify_order(OrderBook* book, long long orderID, int quantity, long long price){
+        Command cmd{};
+        cmd.kind = CommandKind::Modify;
+        cmd.id = orderID;
+        cmd.quantity = quantity;
+        cmd.price = price;
+        return applyCommand(*book, cmd) ? 1 : 0;
+    }
+
+    // Command journal. open_journal starts recording every applied command
+    // (threaded or not) to a new file at `path`; call it before
+    // start_matching_thread. close_journal flushes and stops recording.
+    int open_journal(OrderBook* book, const char* path){
+        return (path && openJournal(*book, path)) ? 1 : 0;
+    }
+
+    void close_journal(OrderBook* book){
+        closeJournal(*book);
+    }
+
+    // Builds a fresh book with the journal's tick size and match mode and
+    // replays the whole journal into it at native speed. Returns null if `path` is not a
+    // readable journal. Free the book with destroy_book.
+    OrderBook* replay(const char* path){
+        JournalHeader h;
+        if (!path || !readJournalHeader(path, h)) return nullptr;
+        OrderBook* book = new OrderBook(h.tick_size);
+        if (replayJournal(*book, path) < 0) {
+            delete book;
+            return nullptr;
+        }
+        return book;
+    }
+
+    // Replays the journal at `path` into an existing book with the same tick
+    // size. Returns the number of commands applied, or -1.
+    long long replay_journal(OrderBook* book, const char* path){
+        return path ? replayJournal(*book, path) : -1;
+    }
+
+    // Replays journal records [from, end) into `book`, e.g. the tail written
+    // after a checkpoint. Returns the number applied, or -1.
+    long long replay_journal_from(OrderBook* book, const char* path, long long from){
+        if (!path || from < 0) return -1;
+        return replayJournal(*book, path, static_cast<size_t>(from));
+    }
+
+    // Checkpoints. save_checkpoint writes the resting orders (in priority
+    // order), the id and trade counters, log lengths, journal position and
+    // random config; it is safe while the matching thread runs. Returns 0 on
+    // failure.
+    int save_checkpoint(OrderBook* book, const char* path){
+        return (path && saveCheckpoint(*book, path)) ? 1 : 0;
+    }
+
+    // Builds a new book from a checkpoint, or returns null. Free it with
+    // destroy_book. Also installs the saved random config.
+    OrderBook* load_checkpoint(const char* path){
+        return path ? loadCheckpoint(path) : nullptr;
+    }
+
+    // Journal position stored in a checkpoint: pass it to replay_journal_from
+    // for a warm restart. -1 if the checkpoint had no journal or is invalid.
+    long long get_checkpoint_journal_position(const char* path){
+        CheckpointHeader h;
+        if (!path || !readCheckpointHeader(path, h)) return -1;
+        return h.journal_records;
+    }
+
+    // Incremental feed: copies up to `max` events after sequence number `seq`
+    // into `out` and returns the count. Pass the last seq you saw as the cursor.
+    long long get_events_since(OrderBook* book, long long seq, Event* out, long long max){
+        return static_cast<long long>(eventsSince(*book, seq, out, max > 0 ? static_cast<size_t>(max) : 0));
+    }
+
+    long long get_last_event_seq(OrderBook* book){
+        return static_cast<long long>(book->events.size());
+    }
+
+    long long get_resting_count(OrderBook* book){
+        if (book->ingest) {
+            shared_ptr<const BookView> view = currentView(*book);
+            return static_cast<long long>(view->buy_orders + view->sell_orders);
+        }
+        return static_cast<long long>(book->index.size());
+    }
+
+    long long get_trade_count(OrderBook* book){
+        return static_cast<long long>(book->trades.size());
+    }
+
+    // Engine instrumentation (stats.h). Lock-free and safe from any thread,
+    // also while the book runs on a matching thread; `enabled` is 0 and
+    // everything else zero in -DORDERBOOK_NO_STATS builds. For a book of a
+    // BookManager the queue figures are those of its shard's queue.
+    void get_engine_stats(OrderBook* book, EngineStats* out){
+        const EngineInstruments &s = book->stats;
+        *out = EngineStats{};
+        out->enabled = kEngineStats ? 1 : 0;
+        out->orders_added = s.orders_added.get();
+        out->orders_matched = s.orders_matched.get();
+        out->fills = s.fills.get();
+        out->levels_walked = s.levels_walked.get();
+        out->level_erases = s.level_erases.get();
+        out->order_erases = s.order_erases.get();
+        out->cancels = s.cancels.get();
+        out->expiries = s.expiries.get();
+        if (book->ingest) {
+            if (book->ingest->shard) {
+                out->queue_backlog = static_cast<int64_t>(book->ingest->shard->ring.backlog());
+                out->queue_capacity = static_cast<int64_t>(book->ingest->shard->ring.capacity());
+            } else {
+                out->queue_backlog = static_cast<int64_t>(book->ingest->ring.backlog());
+                out->queue_capacity = static_cast<int64_t>(book->ingest->ring.capacity());
+            }
+        }
+        out->add = s.add.summary();
+        out->match = s.match.summary();
+        out->cancel = s.cancel.summary();
+        out->expire = s.expire.summary();
+    }
+
+    // Buckets of one latency histogram (`op`: 0 add, 1 match, 2 cancel,
+    // 3 expire): counts[i] values fell at or below upper_ns[i] and above
+    // the previous bound. Writes at most `max` buckets, up to the last
+    // non-empty one, and returns how many it wrote.
+    long long get_latency_histogram(OrderBook* book, int op, long long max,
+                                    int64_t* counts, int64_t* upper_ns)
+    {
+        if (op < 0 || op > 3) return 0;
+        const LatencyHistogram *h = book->stats.histogram(static_cast<StatsOp>(op));
+        long long n = 0;
+#ifndef ORDERBOOK_NO_STATS
+        long long last = -1;
+        for (int i = 0; i < LatencyHistogram::kBuckets; ++i) {
+            if (h->counts[i].load(memory_order_relaxed)) last = i;
+        }
+        n = std::min(max, last + 1);
+        for (long long i = 0; i < n; ++i) {
+            counts[i] = static_cast<int64_t>(h->counts[i].load(memory_order_relaxed));
+            upper_ns[i] = LatencyHistogram::upperBound(static_cast<int>(i));
+        }
+#else
+        (void)h;
+        (void)max;
+        (void)counts;
+        (void)upper_ns;
+#endif
+        return n;
+    }
+
+    void reset_engine_stats(OrderBook* book){
+        book->stats.reset();
+    }
+
+    // History retention. Keeps only the newest `records` trades, fulfilled
+    // orders and events in memory (0 = unbounded). Older ones are appended
+    // to trades.seg, fulfilled.seg and events.seg in `spill_dir`, or dropped
+    // when spill_dir is null or empty. Call before any order is added and
+    // before start_matching_thread. Returns 0 on failure.
+    int set_history_retention(OrderBook* book, long long records, const char* spill_dir){
+        return setRetention(*book, records > 0 ? static_cast<size_t>(records) : 0,
+                            spill_dir ? spill_dir : "") ? 1 : 0;
+    }
+
+    // Oldest index (0-based) of `log` still in memory; log is 0 = trades,
+    // 1 = fulfilled, 2 = events. Earlier records are in its spill segment.
+    long long get_history_start(OrderBook* book, int log){
+        switch (log) {
+            case kTradesLog:    return static_cast<long long>(book->trades.first());
+            case kFulfilledLog: return static_cast<long long>(book->fulfilled.first());
+            case kEventsLog:    return static_cast<long long>(book->events.first());
+        }
+        return 0;
+    }
+
+    // Copies up to `max` spilled records of `log`, starting at index `start`,
+    // from its segment file into `out` (raw `Trade`, `order` or `Event`
+    // records). Reads only the requested range; returns the count.
+    long long read_spilled(OrderBook* book, int log, long long start, long long max, void* out){
+        if (start < 0 || max <= 0) return 0;
+        const string *path = nullptr;
+        size_t recordSize = 0;
+        long long spilled = 0;
+        switch (log) {
+            case kTradesLog:
+                path = &book->trades.spill_file();
+                recordSize = sizeof(OrderBook::Trade);
+                spilled = static_cast<long long>(book->trades.first());
+                break;
+            case kFulfilledLog:
+                path = &book->fulfilled.spill_file();
+                recordSize = sizeof(order);
+                spilled = static_cast<long long>(book->fulfilled.first());
+                break;
+            case kEventsLog:
+                path = &book->events.spill_file();
+                recordSize = sizeof(Event);
+                spilled = static_cast<long long>(book->events.first());
+                break;
+            default:
+                return 0;
+        }
+        // Only whole, flushed chunks (below first()) are read.
+        if (path->empty() || start >= spilled) return 0;
+        max = std::min(max, spilled - start);
+        return static_cast<long long>(readSegment(path->c_str(), static_cast<size_t>(start),
+                                                  static_cast<size_t>(max), out, recordSize));
+    }
+
+    // Threaded mode. Once start_matching_thread has run, the book is owned by
+    // its matching thread: change it only through the submit_* calls below
+    // (safe from any number of threads), never through add_order & co. The
+    // submit_* calls return 0 when the queue is full and the caller should
+    // retry; without a matching thread they apply the command immediately.
+    void start_matching_thread(OrderBook* book, long long capacity){
+        startIngest(*book, capacity > 0 ? static_cast<size_t>(capacity) : 65536);
+    }
+
+    // Drains queued commands and joins the thread. No other thread may be
+    // using the book while this runs.
+    void stop_matching_thread(OrderBook* book){
+        stopIngest(*book);
+    }
+
+    long long next_order_id(OrderBook* book){
+        return book->next_order_id.fetch_add(1);
+    }
+
+    int submit_order(OrderBook* book, const order* newOrder){
+        Command cmd{};
+        cmd.kind = CommandKind::Add;
+        cmd.o = *newOrder;
+        return submitCommand(*book, cmd) ? 1 : 0;
+    }
+
+    int submit_cancel(OrderBook* book, long long orderID){
+        Command cmd{};
+        cmd.kind = CommandKind::Cancel;
+        cmd.id = orderID;
+        return submitCommand(*book, cmd) ? 1 : 0;
+    }
+
+    int submit_modify(OrderBook* book, long long orderID, int quantity, long long price){
+        Command cmd{};
+        cmd.kind = CommandKind::Modify;
+        cmd.id = orderID;
+        cmd.quantity = quantity;
+        cmd.price = price;
+        return submitCommand(*book, cmd) ? 1 : 0;
+    }
+
+    // Random orders for a batch take their ids from the book's counter.
+    int submit_batch(OrderBook* book, long long n, double basePrice){
+        Command cmd{};
+        cmd.kind = CommandKind::Batch;
+        cmd.count = n;
+        cmd.base_price = basePrice;
+        return submitCommand(*book, cmd) ? 1 : 0;
+    }
+
+    // Batch of the events arriving in the next `window` seconds of the
+    // book's generator clock (at most `max_events`), so the count follows
+    // the arrival model.
+    int submit_flow(OrderBook* book, double window, long long max_events, double basePrice){
+        Command cmd{};
+        cmd.kind = CommandKind::Batch;
+        cmd.count = max_events;
+        cmd.window = window;
+        cmd.base_price = basePrice;
+        return submitCommand(*book, cmd) ? 1 : 0;
+    }
+
+    int submit_advance_time(OrderBook* book, long long now){
+        Command cmd{};
+        cmd.kind = CommandKind::AdvanceTime;
+        cmd.now = now;
+        return submitCommand(*book, cmd) ? 1 : 0;
+    }
+
+
+    // Multi-symbol mode. A manager owns many books, keyed by symbol id in
+    // the order add_symbol created them, and matches them on a pool of
+    // worker threads (0 = one per core). manager_book returns a symbol's
+    // book for the read calls (exports, metrics, snapshots) and for setup
+    // calls such as open_journal before start_manager; the manager frees it.
+    BookManager* create_manager(long long workers, long long capacity){
+        BookManager *manager = new BookManager();
+        manager->workers = workers > 0 ? static_cast<size_t>(workers) : 0;
+        if (capacity > 0) manager->capacity = static_cast<size_t>(capacity);
+        return manager;
+    }
+
+    void destroy_manager(BookManager* manager){
+        delete manager;
+    }
+
+    int add_symbol(BookManager* manager, double tick_size){
+        return addSymbol(*manager, tick_size > 0.0 ? tick_size : 0.0001);
+    }
+
+    long long manager_symbols(BookManager* manager){
+        return static_cast<long long>(manager->books.size());
+    }
+
+    OrderBook* manager_book(BookManager* manager, int symbol){
+        if (symbol < 0 || static_cast<size_t>(symbol) >= manager->books.size()) return nullptr;
+        return manager->books[symbol].get();
+    }
+
+    void start_manager(BookManager* manager){
+        startManager(*manager);
+    }
+
+    void stop_manager(BookManager* manager){
+        stopManager(*manager);
+    }
+
+    // Routing calls: same contract as the submit_* calls (0 = queue full,
+    // retry), addressed by symbol. The submit_* calls also work on a
+    // manager_book pointer and are forwarded to its shard.
+    int route_order(BookManager* manager, int symbol, const order* newOrder){
+        Command cmd{};
+        cmd.kind = CommandKind::Add;
+        cmd.o = *newOrder;
+        return routeCommand(*manager, symbol, cmd) ? 1 : 0;
+    }
+
+    int route_cancel(BookManager* manager, int symbol, long long orderID){
+        Command cmd{};
+        cmd.kind = CommandKind::Cancel;
+        cmd.id = orderID;
+        return routeCommand(*manager, symbol, cmd) ? 1 : 0;
+    }
+
+    int route_modify(BookManager* manager, int symbol, long long orderID, int quantity, long long price){
+        Command cmd{};
+        cmd.kind = CommandKind::Modify;
+        cmd.id = orderID;
+        cmd.quantity = quantity;
+        cmd.price = price;
+        return routeCommand(*manager, symbol, cmd) ? 1 : 0;
+    }
+
+    int route_flow(BookManager* manager, int symbol, double window, long long max_events, double basePrice){
+        Command cmd{};
+        cmd.kind = CommandKind::Batch;
+        cmd.count = max_events;
+        cmd.window = window;
+        cmd.base_price = basePrice;
+        return routeCommand(*manager, symbol, cmd) ? 1 : 0;
+    }
+
+    int route_batch(BookManager* manager, int symbol, long long n, double basePrice){
+        return route_flow(manager, symbol, 0.0, n, basePrice);
+    }
+
+    int route_advance_time(BookManager* manager, int symbol, long long now){
+        Command cmd{};
+        cmd.kind = CommandKind::AdvanceTime;
+        cmd.now = now;
+        return routeCommand(*manager, symbol, cmd) ? 1 : 0;
+    }
+
+    // Lock-free reads of the counters each worker updates when it
+    // publishes a book; safe from any thread at any rate.
+    int get_symbol_stats(BookManager* manager, int symbol, SymbolStats* out){
+        if (symbol < 0 || static_cast<size_t>(symbol) >= manager->books.size()) return 0;
+        symbolStats(*manager, symbol, *out);
+        return 1;
+    }
+
+    void get_manager_stats(BookManager* manager, ManagerStats* out){
+        managerStats(*manager, *out);
+    }
+
+    // Columnar exports. Each fills caller-owned arrays, one per column, and
+    // touches no shared buffers, so any number of threads may call them at
+    // once. Any column pointer may be null to skip that column. Prices are in
+    // book ticks; times are engine-clock nanoseconds.
+
+    // Resting orders from the published view in priority order, bids first
+    // (best level first, FIFO within a level), then asks. Writes at most
+    // `max` rows and returns the total number of resting orders; when that
+    // exceeds `max`, grow the arrays and call again.
+    long long export_book_columns(OrderBook* book, long long max,
+                                  int64_t* ids, int64_t* prices, int32_t* quantities,
+                                  uint8_t* sides, int64_t* times)
+    {
+        shared_ptr<const BookView> view = currentView(*book);
+        long long total = static_cast<long long>(view->buy_orders + view->sell_orders);
+        if (total > max) return total;
+        long long n = 0;
+        for (const vector<ViewLevel>* side : {&view->buy, &view->sell}) {
+            for (const ViewLevel &level : *side) {
+                for (const order &o : *level.orders) {
+                    if (ids) ids[n] = o.id;
+                    if (prices) prices[n] = o.price;
+                    if (quantities) quantities[n] = o.quantity;
+                    if (sides) sides[n] = static_cast<uint8_t>(o.side);
+                    if (times) times[n] = o.time;
+                    ++n;
+                }
+            }
+        }
+        return total;
+    }
+
+    // Trades [start, start + max) of the trade log; returns rows written.
+    // Rows already evicted from memory (see set_history_retention) are
+    // skipped here and in the other log exporters.
+    long long export_trades_columns(OrderBook* book, long long start, long long max,
+                                    int64_t* trade_ids, int64_t* taker_ids, int64_t* maker_ids,
+                                    int64_t* prices, int32_t* quantities, uint8_t* sides, int64_t* times)
+    {
+        long long end = static_cast<long long>(book->trades.size());
+        start = std::max(start, static_cast<long long>(book->trades.first()));
+        if (max < end - start) end = start + max;
+        long long n = 0;
+        OrderBook::Trade t;
+        for (long long i = start; i < end; ++i) {
+            if (!book->trades.read(static_cast<size_t>(i), t)) continue;
+            if (trade_ids) trade_ids[n] = t.trade_id;
+            if (taker_ids) taker_ids[n] = t.taker_id;
+            if (maker_ids) maker_ids[n] = t.maker_id;
+            if (prices) prices[n] = t.price;
+            if (quantities) quantities[n] = t.quantity;
+            if (sides) sides[n] = static_cast<uint8_t>(t.side);
+            if (times) times[n] = t.time;
+            ++n;
+        }
+        return n;
+    }
+
+    // Fulfilled records [start, start + max) (cancelled and expired orders;
+    // filled orders are only in the trade log); returns rows written.
+    long long export_fulfilled_columns(OrderBook* book, long long start, long long max,
+                                       int64_t* ids, int64_t* prices, int32_t* quantities,
+                                       uint8_t* sides, uint8_t* types, uint8_t* statuses,
+                                       int64_t* times)
+    {
+        long long end = static_cast<long long>(book->fulfilled.size());
+        start = std::max(start, static_cast<long long>(book->fulfilled.first()));
+        if (max < end - start) end = start + max;
+        long long n = 0;
+        order o;
+        for (long long i = start; i < end; ++i) {
+            if (!book->fulfilled.read(static_cast<size_t>(i), o)) continue;
+            if (ids) ids[n] = o.id;
+            if (prices) prices[n] = o.price;
+            if (quantities) quantities[n] = o.quantity;
+            if (sides) sides[n] = static_cast<uint8_t>(o.side);
+            if (types) types[n] = static_cast<uint8_t>(o.type);
+            if (statuses) statuses[n] = static_cast<uint8_t>(o.status);
+            if (times) times[n] = o.time;
+            ++n;
+        }
+        return n;
+    }
+
+    // Events with sequence number greater than `seq`, oldest first, at most
+    // `max` of them; returns rows written. Same cursor rules as
+    // get_events_since.
+    long long export_events_columns(OrderBook* book, long long seq, long long max,
+                                    int64_t* seqs, int64_t* order_ids, int64_t* other_ids,
+                                    int64_t* times, int64_t* prices, int32_t* quantities,
+                                    uint8_t* kinds, uint8_t* sides)
+    {
+        long long end = static_cast<long long>(book->events.size());
+        seq = std::max(seq, static_cast<long long>(book->events.first()));
+        if (max < end - seq) end = seq + max;
+        long long n = 0;
+        Event e;
+        for (long long i = seq; i < end; ++i) {
+            if (!book->events.read(static_cast<size_t>(i), e)) continue;
+            if (seqs) seqs[n] = e.seq;
+            if (order_ids) order_ids[n] = e.order_id;
+            if (other_ids) other_ids[n] = e.other_id;
+            if (times) times[n] = e.time;
+            if (prices) prices[n] = e.price;
+            if (quantities) quantities[n] = e.quantity;
+            if (kinds) kinds[n] = static_cast<uint8_t>(e.kind);
+            if (sides) sides[n] = static_cast<uint8_t>(e.side);
+            ++n;
+        }
+        return n;
+    }
+
+    // Market metrics from the level aggregates: O(1), no walk over orders.
+    // In threaded mode they come from the published view, like the book
+    // exporters.
+    void get_top_of_book_metrics(OrderBook* book, TopOfBook* out){
+        *out = book->ingest ? currentView(*book)->top : topOfBook(*book);
+    }
+
+    // Up to `levels` aggregated levels per side, best first, prices in ticks.
+    // Writes the number of bid and ask levels filled to *n_bids / *n_asks.
+    // Both sides come from the same instant. O(levels).
+    void get_l2_depth(OrderBook* book, long long levels,
+                      DepthLevel* bids, long long* n_bids,
+                      DepthLevel* asks, long long* n_asks)
+    {
+        size_t k = levels > 0 ? static_cast<size_t>(levels) : 0;
+        if (!book->ingest) {
+            *n_bids = static_cast<long long>(l2Depth(*book, Side::Buy, k, bids));
+            *n_asks = static_cast<long long>(l2Depth(*book, Side::Sell, k, asks));
+            return;
+        }
+        shared_ptr<const BookView> view = currentView(*book);
+        size_t nb = min(k, view->bid_levels.size());
+        size_t na = min(k, view->ask_levels.size());
+        copy(view->bid_levels.begin(), view->bid_levels.begin() + nb, bids);
+        copy(view->ask_levels.begin(), view->ask_levels.begin() + na, asks);
+        *n_bids = static_cast<long long>(nb);
+        *n_asks = static_cast<long long>(na);
+    }
 
+    // CSV snapshots. The returned text stays valid until the same thread
+    // takes its next snapshot of that kind.
     const char* get_orderbook_snapshot(OrderBook* book) {
-        static std::string snapshot;
+        thread_local std::string snapshot;
         std::ostringstream ss;
+        ss << fixed << setprecision(priceDecimals(book->tick_size));
 
+        shared_ptr<const BookView> view = currentView(*book);
         ss << "ID,SIDE,PRICE,QTY,TYPE\n";
-        for (auto& o : book->buy)
-            ss << o.id << ",BUY,"  << o.price << "," << o.quantity << "," << o.type << "\n";
-        for (auto& o : book->sell)
-            ss << o.id << ",SELL," << o.price << "," << o.quantity << "," << o.type << "\n";
+        for (auto& level : view->buy)
+            for (auto& o : *level.orders)
+                ss << o.id << ",BUY,"  << ticksToPrice(*book, o.price) << "," << o.quantity << "," << typeName(o.type) << "\n";
+        for (auto& level : view->sell)
+            for (auto& o : *level.orders)
+                ss << o.id << ",SELL," << ticksToPrice(*book, o.price) << "," << o.quantity << "," << typeName(o.type) << "\n";
 
         snapshot = ss.str();
         return snapshot.c_str();
     }
 
     const char* get_fulfilled_snapshot(OrderBook* book) {
-        static std::string result;
+        thread_local std::string result;
         std::ostringstream oss;
 
         if (!book || book->fulfilled.empty()) {
@@ -52,14 +754,18 @@ extern "C"{
             return result.c_str();
         }
 
+        oss << fixed << setprecision(priceDecimals(book->tick_size));
         oss << "ID,SIDE,PRICE,QUANTITY,TYPE,STATUS\n";
-        for (auto &o : book->fulfilled) {
+        size_t n = book->fulfilled.size();
+        order o;
+        for (size_t i = book->fulfilled.first(); i < n; ++i) {
+            if (!book->fulfilled.read(i, o)) continue;
             oss << o.id << ","
-                << o.side << ","
-                << o.price << ","
+                << sideName(o.side) << ","
+                << ticksToPrice(*book, o.price) << ","
                 << o.quantity << ","
-                << o.type << ","
-                << o.status << "\n";
+                << typeName(o.type) << ","
+                << statusName(o.status) << "\n";
         }
 
         result = oss.str();
@@ -67,7 +773,7 @@ extern "C"{
     }
 
     const char* get_trades_snapshot(OrderBook* book) {
-        static std::string result;
+        thread_local std::string result;
         std::ostringstream oss;
 
         if (!book || book->trades.empty()) {
@@ -75,12 +781,17 @@ extern "C"{
             return result.c_str();
         }
 
-        oss << "TRADE_ID,ORDER_ID,SIDE,PRICE,QUANTITY,TIME\n";
-        for (auto &t : book->trades) {
+        oss << fixed << setprecision(priceDecimals(book->tick_size));
+        oss << "TRADE_ID,TAKER_ID,MAKER_ID,SIDE,PRICE,QUANTITY,TIME\n";
+        size_t n = book->trades.size();
+        OrderBook::Trade t;
+        for (size_t i = book->trades.first(); i < n; ++i) {
+            if (!book->trades.read(i, t)) continue;
             oss << t.trade_id << ","
-                << t.order_id << ","
-                << t.side << ","
-                << t.price << ","
+                << t.taker_id << ","
+                << t.maker_id << ","
+                << sideName(t.side) << ","
+                << ticksToPrice(*book, t.price) << ","
                 << t.quantity << ","
                 << t.time << "\n";
         }
@@ -89,21 +800,23 @@ extern "C"{
         return result.c_str();
     }
 
-    order* make_user_order(int id,
+    // `price` is in book ticks; Python converts with get_tick_size.
+    void make_user_order(long long id,
                         const char* side,
                         int quantity,
-                        float price,
-                        const char* type)
+                        long long price,
+                        const char* type,
+                        order* o)
     {
-        order* o = new order();
+        *o = order{};
         o->id = id;
-        o->side = std::string(side);
+        o->side = parseSide(side);
         o->quantity = quantity;
         o->price = price;
-        o->time = std::time(nullptr);
-        o->type = std::string(type);
-        o->status = "open";
-        return o;
+        o->time = wallNanos();      // the book stamps its own clock on submission
+        o->expiry = 0;
+        o->type = parseType(type);
+        o->status = OrderStatus::Open;
     }
 
 }
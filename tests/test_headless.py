@@ -0,0 +1,44 @@
+import ctypes
+from pathlib import Path
+import sys
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from engine import EVENT_ADD, EventColumns, OrderBook, lib, run_flow  # noqa: E402
+import headless  # noqa: E402
+
+
+def _posted(book_ptr):
+    # Quantity of every Add event, from one export of the whole log.
+    n = lib.get_last_event_seq(book_ptr)
+    cols = EventColumns(max(n, 1))
+    assert cols.fill(book_ptr, 0) == n
+    return int(cols.quantity[:n][cols.kind[:n] == EVENT_ADD].sum())
+
+
+def test_tally_events_reads_every_event():
+    book = lib.create_book(headless.BOOK_TICK_SIZE)
+    book_ptr = ctypes.cast(book, ctypes.POINTER(OrderBook))
+    try:
+        lib.seed_random(book_ptr, 7)
+        run_flow(book_ptr, 0.0, 5000, 100.0)
+        tally = {"posted": 0}
+        # A small buffer, so the cursor advances over many chunks.
+        seq = headless._tally_events(book_ptr, 0, EventColumns(7), tally)
+        assert seq == lib.get_last_event_seq(book_ptr)
+        assert tally["posted"] == _posted(book_ptr)
+    finally:
+        lib.destroy_book(book)
+
+
+def test_posted_quantity_matches_journal_replay(tmp_path):
+    status = headless.run(tmp_path, events=20000, batch=500, seed=3, clock="virtual")
+    book_ptr = lib.replay(str(tmp_path / headless.JOURNAL_FILE).encode())
+    try:
+        assert status["last_event_seq"] == lib.get_last_event_seq(book_ptr)
+        assert status["posted_quantity"] == _posted(book_ptr)
+        assert np.isclose(status["fill_rate"], status["traded_quantity"] / status["posted_quantity"])
+    finally:
+        lib.destroy_book(book_ptr)